@@ -0,0 +1,17 @@
+from django.contrib import admin
+
+from .models import RollupWatermark, SalesRollup
+
+
+@admin.register(SalesRollup)
+class SalesRollupAdmin(admin.ModelAdmin):
+    list_display = ('grain', 'period_start', 'branch', 'variant', 'manufacturer', 'order_count', 'units_ordered',
+                    'revenue', 'units_sold')
+    list_select_related = ('branch__company', 'variant__product', 'variant__dosage_form', 'manufacturer')
+    list_filter = ('grain',)
+    raw_id_fields = ('branch', 'variant', 'manufacturer')
+
+
+@admin.register(RollupWatermark)
+class RollupWatermarkAdmin(admin.ModelAdmin):
+    list_display = ('source', 'last_id', 'updated_at')
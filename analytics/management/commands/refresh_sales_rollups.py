@@ -0,0 +1,24 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from analytics.rollups import rebuild_rollups, refresh_rollups
+
+
+class Command(BaseCommand):
+    help = "Folds new orders and sale movements into the sales rollups, or rebuilds a date range (backfill)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', nargs=2, metavar=('START', 'END'),
+                            help="Recompute the days START (inclusive) to END (exclusive), as YYYY-MM-DD.")
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            try:
+                start, end = (datetime.date.fromisoformat(value) for value in options['rebuild'])
+            except ValueError as exc:
+                raise CommandError(exc)
+            written = rebuild_rollups(start, end)
+        else:
+            written = refresh_rollups()
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} rollup row(s)."))
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('catalog', '0002_search_indexes'),
+        ('inventory', '0008_branch_address'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=50, unique=True, verbose_name='Source')),
+                ('last_id', models.BigIntegerField(default=0, verbose_name='Last Processed Id')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Last Updated')),
+            ],
+            options={
+                'verbose_name': 'Rollup Watermark',
+                'verbose_name_plural': 'Rollup Watermarks',
+            },
+        ),
+        migrations.CreateModel(
+            name='SalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('grain', models.CharField(choices=[('hour', 'Hourly'), ('day', 'Daily')], max_length=4, verbose_name='Grain')),
+                ('period_start', models.DateTimeField(verbose_name='Period Start')),
+                ('order_count', models.IntegerField(default=0, verbose_name='Orders')),
+                ('units_ordered', models.IntegerField(default=0, verbose_name='Units Ordered')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Revenue')),
+                ('units_sold', models.IntegerField(default=0, verbose_name='Units Sold (Ledger)')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Last Updated')),
+                ('branch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_rollups', to='inventory.branch', verbose_name='Branch')),
+                ('manufacturer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_rollups', to='catalog.manufacturer', verbose_name='Manufacturer')),
+                ('variant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_rollups', to='catalog.productvariant', verbose_name='Product Variant')),
+            ],
+            options={
+                'verbose_name': 'Sales Rollup',
+                'verbose_name_plural': 'Sales Rollups',
+                'indexes': [models.Index(fields=['grain', 'branch', 'period_start'], name='analytics_rollup_branch_idx'), models.Index(fields=['grain', 'manufacturer', 'period_start'], name='analytics_rollup_mfr_idx')],
+                'unique_together': {('grain', 'period_start', 'branch', 'variant')},
+            },
+        ),
+    ]
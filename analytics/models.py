@@ -0,0 +1,56 @@
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+
+# ========================
+# SALES ROLLUPS (REPORTING LAYER)
+#  Maintained incrementally by analytics.rollups; dashboards read these instead of Order/OrderItem/
+#  InventoryMovement so reporting never scans the checkout tables.
+# ========================
+
+class SalesRollup(models.Model):
+    """Sales of one variant at one branch during one hour or day."""
+    GRAIN_CHOICES = (
+        ('hour', _('Hourly')),
+        ('day', _('Daily')),
+    )
+
+    grain = models.CharField(max_length=4, choices=GRAIN_CHOICES, verbose_name=_("Grain"))
+    period_start = models.DateTimeField(verbose_name=_("Period Start"))
+    branch = models.ForeignKey('inventory.Branch', on_delete=models.CASCADE, related_name='sales_rollups',
+                               verbose_name=_("Branch"))
+    variant = models.ForeignKey('catalog.ProductVariant', on_delete=models.CASCADE, related_name='sales_rollups',
+                                verbose_name=_("Product Variant"))
+    # Denormalized from variant.product so manufacturer reports need no joins
+    manufacturer = models.ForeignKey('catalog.Manufacturer', on_delete=models.CASCADE, related_name='sales_rollups',
+                                     verbose_name=_("Manufacturer"))
+
+    order_count = models.IntegerField(default=0, verbose_name=_("Orders"))
+    units_ordered = models.IntegerField(default=0, verbose_name=_("Units Ordered"))
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name=_("Revenue"))
+    # Net units out of stock according to the 'sale' movements of the ledger
+    units_sold = models.IntegerField(default=0, verbose_name=_("Units Sold (Ledger)"))
+    updated_at = models.DateTimeField(auto_now=True, verbose_name=_("Last Updated"))
+
+    class Meta:
+        verbose_name = _("Sales Rollup")
+        verbose_name_plural = _("Sales Rollups")
+        unique_together = ('grain', 'period_start', 'branch', 'variant')
+        indexes = [
+            models.Index(fields=['grain', 'branch', 'period_start'], name='analytics_rollup_branch_idx'),
+            models.Index(fields=['grain', 'manufacturer', 'period_start'], name='analytics_rollup_mfr_idx'),
+        ]
+
+
+class RollupWatermark(models.Model):
+    """Highest source row id already folded into the rollups (one row per source table)."""
+    source = models.CharField(max_length=50, unique=True, verbose_name=_("Source"))
+    last_id = models.BigIntegerField(default=0, verbose_name=_("Last Processed Id"))
+    updated_at = models.DateTimeField(auto_now=True, verbose_name=_("Last Updated"))
+
+    class Meta:
+        verbose_name = _("Rollup Watermark")
+        verbose_name_plural = _("Rollup Watermarks")
+
+    def __str__(self):
+        return f"{self.source} @ {self.last_id}"
@@ -0,0 +1,230 @@
+import datetime
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Sum
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+
+from inventory.models import InventoryMovement
+from orders.models import Order, OrderItem
+
+from .models import RollupWatermark, SalesRollup
+
+# Rows younger than this are left for the next run, so transactions still in flight when a run
+# starts (and whose ids are below ids already committed) are not skipped by the watermark
+SAFETY_LAG = datetime.timedelta(minutes=2)
+UPSERT_BATCH_SIZE = 2000
+ORDER_METRICS = ('order_count', 'units_ordered', 'revenue')
+MOVEMENT_METRICS = ('units_sold',)
+METRICS = ORDER_METRICS + MOVEMENT_METRICS
+REPORT_GROUPS = {'branch': 'branch_id', 'variant': 'variant_id', 'manufacturer': 'manufacturer_id'}
+
+
+# ==========================
+# 1. SOURCE AGGREGATES (HOURLY, COMPUTED IN THE DATABASE)
+#  Each returns {(hour, branch_id, variant_id): (manufacturer_id, {metric: value})}
+# ==========================
+
+def _order_aggregates(low_id, high_id, start=None, end=None, order_ids=None):
+    # Cancelled orders never count; those cancelled after being folded are taken out by reverse_orders()
+    items = OrderItem.objects.filter(order_id__gt=low_id, order_id__lte=high_id).exclude(order__status='cancelled')
+    if order_ids is not None:
+        items = items.filter(order_id__in=order_ids)
+    if start is not None:
+        items = items.filter(order__placed_at__gte=start, order__placed_at__lt=end)
+    rows = (
+        items.annotate(hour=TruncHour('order__placed_at'))
+        .values('hour', 'order__branch_id', 'variant_id', 'variant__product__manufacturer_id')
+        .annotate(
+            order_count=Count('order_id', distinct=True),
+            units_ordered=Sum('quantity'),
+            revenue=Sum(ExpressionWrapper(F('quantity') * F('unit_price'),
+                                          output_field=DecimalField(max_digits=14, decimal_places=2))),
+        )
+        .order_by()
+    )
+    return {
+        (row['hour'], row['order__branch_id'], row['variant_id']): (
+            row['variant__product__manufacturer_id'],
+            {metric: row[metric] for metric in ORDER_METRICS},
+        )
+        for row in rows
+    }
+
+
+def _movement_aggregates(low_id, high_id, start=None, end=None):
+    movements = InventoryMovement.objects.filter(type='sale', pk__gt=low_id, pk__lte=high_id)
+    if start is not None:
+        movements = movements.filter(created_at__gte=start, created_at__lt=end)
+    rows = (
+        movements.annotate(hour=TruncHour('created_at'))
+        .values('hour', 'batch__branch_id', 'batch__variant_id', 'batch__variant__product__manufacturer_id')
+        .annotate(units_sold=Sum(-F('delta_qty')))
+        .order_by()
+    )
+    return {
+        (row['hour'], row['batch__branch_id'], row['batch__variant_id']): (
+            row['batch__variant__product__manufacturer_id'], {'units_sold': row['units_sold']},
+        )
+        for row in rows
+    }
+
+
+# Watermarked sources: name -> (aggregate function, rows settled before a cutoff)
+SOURCES = {
+    'orders': (_order_aggregates, lambda cutoff: Order.objects.filter(placed_at__lte=cutoff)),
+    'movements': (_movement_aggregates,
+                  lambda cutoff: InventoryMovement.objects.filter(type='sale', created_at__lte=cutoff)),
+}
+
+
+def _newest_settled_id(source, cutoff):
+    """Highest source id whose row is older than ``cutoff`` (0 when there is none)."""
+    settled = SOURCES[source][1]
+    return settled(cutoff).order_by('-pk').values_list('pk', flat=True).first() or 0
+
+
+# ==========================
+# 2. FOLDING INTO THE ROLLUPS
+# ==========================
+
+def _day_of(hour):
+    return timezone.localtime(hour).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _by_grain(aggregates):
+    """Adds up the hourly aggregates into {(grain, period, branch, variant): (manufacturer, metrics)}."""
+    deltas = {}
+    for (hour, branch_id, variant_id), (manufacturer_id, metrics) in aggregates.items():
+        for grain, period in (('hour', hour), ('day', _day_of(hour))):
+            key = (grain, period, branch_id, variant_id)
+            totals = deltas.setdefault(key, (manufacturer_id, defaultdict(int)))[1]
+            for metric, value in metrics.items():
+                totals[metric] += value or 0
+    return deltas
+
+
+def _fold(deltas, now):
+    """Adds ``deltas`` to the stored rollups: one locking read of the affected rows, then one upsert."""
+    if not deltas:
+        return 0
+    existing = {
+        (row.grain, row.period_start, row.branch_id, row.variant_id): row
+        for row in SalesRollup.objects.select_for_update().filter(
+            grain__in={key[0] for key in deltas},
+            period_start__in={key[1] for key in deltas},
+            branch_id__in={key[2] for key in deltas},
+            variant_id__in={key[3] for key in deltas},
+        )
+    }
+    rows = []
+    for key, (manufacturer_id, metrics) in deltas.items():
+        grain, period, branch_id, variant_id = key
+        current = existing.get(key)
+        values = {metric: (getattr(current, metric) if current else 0) + metrics.get(metric, 0) for metric in METRICS}
+        values['revenue'] = Decimal(values['revenue']).quantize(Decimal('0.01'))
+        rows.append(SalesRollup(grain=grain, period_start=period, branch_id=branch_id, variant_id=variant_id,
+                                manufacturer_id=manufacturer_id, updated_at=now, **values))
+    SalesRollup.objects.bulk_create(
+        rows, batch_size=UPSERT_BATCH_SIZE, update_conflicts=True,
+        unique_fields=['grain', 'period_start', 'branch', 'variant'],
+        update_fields=[*METRICS, 'manufacturer', 'updated_at'],
+    )
+    return len(rows)
+
+
+def _merge(*aggregates):
+    merged = {}
+    for source in aggregates:
+        for key, (manufacturer_id, metrics) in source.items():
+            merged.setdefault(key, (manufacturer_id, {}))[1].update(metrics)
+    return merged
+
+
+def _watermarks():
+    for source in SOURCES:
+        RollupWatermark.objects.get_or_create(source=source)
+    return {mark.source: mark for mark in RollupWatermark.objects.select_for_update().filter(source__in=SOURCES)}
+
+
+def refresh_rollups(now=None):
+    """
+    Folds every order and sale movement newer than the stored watermarks (and older than
+    SAFETY_LAG) into the hourly and daily rollups, then advances the watermarks, all in one
+    transaction. Re-running is a no-op until new rows settle. Returns the number of rollup rows written.
+    """
+    now = now or timezone.now()
+    cutoff = now - SAFETY_LAG
+    with transaction.atomic():
+        marks = _watermarks()
+        aggregates = []
+        for source, (aggregate, _) in SOURCES.items():
+            mark = marks[source]
+            high = _newest_settled_id(source, cutoff)
+            if high > mark.last_id:
+                aggregates.append(aggregate(mark.last_id, high))
+                mark.last_id = high
+                mark.save(update_fields=['last_id', 'updated_at'])
+        return _fold(_by_grain(_merge(*aggregates)), now)
+
+
+def reverse_orders(order_ids, now=None):
+    """
+    Subtracts orders about to be cancelled from the rollups; call it in the cancelling transaction,
+    before their status changes. Orders above the watermark are not folded yet and will be skipped
+    as cancelled. Locking the watermarks serializes this with refresh_rollups().
+    Returns the number of rollup rows written.
+    """
+    with transaction.atomic():
+        last_id = _watermarks()['orders'].last_id
+        folded = [pk for pk in order_ids if pk <= last_id]
+        if not folded:
+            return 0
+        reversal = {
+            key: (manufacturer_id, {metric: -(value or 0) for metric, value in metrics.items()})
+            for key, (manufacturer_id, metrics) in _order_aggregates(0, last_id, order_ids=folded).items()
+        }
+        return _fold(_by_grain(reversal), now or timezone.now())
+
+
+def _local_midnight(date):
+    return datetime.datetime.combine(date, datetime.time.min, timezone.get_current_timezone())
+
+
+def rebuild_rollups(start_date, end_date, now=None):
+    """
+    Backfill: recomputes the rollups of the local days [start_date, end_date) from scratch, using
+    only source rows below the watermarks (newer rows are left to refresh_rollups), so rebuilding
+    a range any number of times gives the same result.
+    """
+    now = now or timezone.now()
+    start, end = _local_midnight(start_date), _local_midnight(end_date)
+    with transaction.atomic():
+        marks = _watermarks()
+        SalesRollup.objects.filter(period_start__gte=start, period_start__lt=end).delete()
+        aggregates = [
+            aggregate(0, marks[source].last_id, start, end) for source, (aggregate, _) in SOURCES.items()
+        ]
+        return _fold(_by_grain(_merge(*aggregates)), now)
+
+
+# ==========================
+# 3. DASHBOARD QUERIES (ROLLUPS ONLY)
+# ==========================
+
+def sales_report(group, start, end, grain='day', branch_id=None):
+    """
+    Metric totals per ``group`` (branch / variant / manufacturer) and period over the local days
+    [start, end), read from SalesRollup only.
+    """
+    rollups = SalesRollup.objects.filter(grain=grain, period_start__gte=_local_midnight(start),
+                                         period_start__lt=_local_midnight(end))
+    if branch_id is not None:
+        rollups = rollups.filter(branch_id=branch_id)
+    return (
+        rollups.values(REPORT_GROUPS[group], 'period_start')
+        .annotate(**{metric: Sum(metric) for metric in METRICS})
+        .order_by('period_start', REPORT_GROUPS[group])
+    )
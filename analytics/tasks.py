@@ -0,0 +1,9 @@
+from celery import shared_task
+
+from .rollups import refresh_rollups
+
+
+@shared_task
+def refresh_sales_rollups_task():
+    """Periodic (beat) incremental rollup refresh; returns the number of rollup rows written."""
+    return refresh_rollups()
@@ -0,0 +1,138 @@
+import datetime
+import io
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+
+from inventory.models import InventoryMovement
+from inventory.tests import InventoryTestData
+from orders.models import Order
+from orders.transitions import transition_orders
+from pharma_store_v01.query_budget import QueryBudgetTestMixin
+
+from .models import RollupWatermark, SalesRollup
+from .rollups import SAFETY_LAG, rebuild_rollups, refresh_rollups, sales_report
+
+
+class SalesRollupTests(QueryBudgetTestMixin, InventoryTestData):
+
+    def setUp(self):
+        self.batch = self.make_batch(1000, 300)
+        self.now = timezone.now().replace(minute=30, second=0, microsecond=0)
+
+    def sell(self, qty, at):
+        """An order of ``qty`` units placed at ``at`` with its 'sale' movement."""
+        order = self.make_order(qty)
+        movement = InventoryMovement.objects.create(batch=self.batch, type='sale', delta_qty=-qty)
+        Order.objects.filter(pk=order.pk).update(placed_at=at)
+        InventoryMovement.objects.filter(pk=movement.pk).update(created_at=at)
+        return order
+
+    def rollup(self, grain, at):
+        hour = at.replace(minute=0, second=0, microsecond=0)
+        period = hour if grain == 'hour' else timezone.localtime(hour).replace(hour=0)
+        return SalesRollup.objects.get(grain=grain, period_start=period, branch=self.branch, variant=self.variant)
+
+    def test_refresh_folds_new_sales_once(self):
+        earlier = self.now - datetime.timedelta(hours=1)
+        self.sell(2, earlier)
+        self.sell(3, earlier)
+
+        self.assertEqual(refresh_rollups(self.now), 2)
+        hourly = self.rollup('hour', earlier)
+        self.assertEqual((hourly.order_count, hourly.units_ordered, hourly.revenue, hourly.units_sold),
+                         (2, 5, Decimal('40.00'), 5))
+        self.assertEqual(hourly.manufacturer_id, self.product.manufacturer_id)
+        self.assertEqual(RollupWatermark.objects.get(source='orders').last_id, Order.objects.latest('pk').pk)
+
+        # Nothing new: no rollup rows are written again
+        self.assertEqual(refresh_rollups(self.now), 0)
+        self.sell(1, earlier)
+        refresh_rollups(self.now)
+        self.assertEqual(self.rollup('hour', earlier).units_ordered, 6)
+
+    def test_rows_inside_the_safety_lag_wait_for_the_next_run(self):
+        self.sell(4, self.now - SAFETY_LAG / 2)
+
+        self.assertEqual(refresh_rollups(self.now), 0)
+        self.assertFalse(SalesRollup.objects.exists())
+        refresh_rollups(self.now + SAFETY_LAG)
+        self.assertEqual(self.rollup('hour', self.now).units_sold, 4)
+
+    def test_daily_rollup_is_the_sum_of_hourly(self):
+        day_start = timezone.localtime(self.now).replace(hour=0, minute=15)
+        for hours, qty in ((0, 1), (1, 2), (2, 3)):
+            self.sell(qty, day_start + datetime.timedelta(hours=hours))
+        refresh_rollups(day_start + datetime.timedelta(hours=3))
+
+        hourly = SalesRollup.objects.filter(grain='hour')
+        self.assertEqual(hourly.count(), 3)
+        daily = self.rollup('day', day_start)
+        self.assertEqual(daily.units_ordered, sum(hourly.values_list('units_ordered', flat=True)))
+        self.assertEqual(daily.order_count, 3)
+
+    def test_rebuild_matches_incremental_refresh(self):
+        self.sell(2, self.now - datetime.timedelta(days=1))
+        self.sell(5, self.now - datetime.timedelta(hours=1))
+        refresh_rollups(self.now)
+        incremental = sorted(SalesRollup.objects.values_list(
+            'grain', 'period_start', 'order_count', 'units_ordered', 'revenue', 'units_sold'))
+
+        SalesRollup.objects.update(units_ordered=0)
+        today = timezone.localdate(self.now)
+        rebuild_rollups(today - datetime.timedelta(days=2), today + datetime.timedelta(days=1), self.now)
+
+        self.assertEqual(sorted(SalesRollup.objects.values_list(
+            'grain', 'period_start', 'order_count', 'units_ordered', 'revenue', 'units_sold')), incremental)
+
+    def test_cancelled_orders_leave_the_rollups(self):
+        earlier = self.now - datetime.timedelta(hours=1)
+        self.sell(2, earlier)
+        folded = self.sell(3, earlier)
+        refresh_rollups(self.now)
+        unfolded = self.sell(4, earlier)
+
+        transition_orders([folded.pk, unfolded.pk], 'cancelled')
+        refresh_rollups(self.now)
+
+        for grain in ('hour', 'day'):
+            rollup = self.rollup(grain, earlier)
+            self.assertEqual((rollup.order_count, rollup.units_ordered, rollup.revenue), (1, 2, Decimal('16.00')))
+        today = timezone.localdate(self.now)
+        rebuild_rollups(today - datetime.timedelta(days=1), today + datetime.timedelta(days=1), self.now)
+        self.assertEqual(self.rollup('day', earlier).units_ordered, 2)
+
+    def test_report_reads_only_the_rollups(self):
+        self.sell(2, self.now - datetime.timedelta(hours=1))
+        refresh_rollups(self.now)
+        today = timezone.localdate(self.now)
+
+        with self.assertQueryBudget(1):
+            rows = list(sales_report('manufacturer', today, today + datetime.timedelta(days=1)))
+        self.assertEqual([(row['manufacturer_id'], row['units_ordered']) for row in rows],
+                         [(self.product.manufacturer_id, 2)])
+
+    def test_report_endpoint_for_staff_only(self):
+        url = reverse('analytics:sales-report')
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        self.sell(2, self.now - datetime.timedelta(hours=1))
+        refresh_rollups(self.now)
+        self.client.force_login(User.objects.create_superuser('admin', password='x'))
+        today = timezone.localdate(self.now)
+        response = self.client.get(url, {'group': 'branch', 'start': today.isoformat(),
+                                         'end': (today + datetime.timedelta(days=1)).isoformat()})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([(row['branch_id'], row['units_sold']) for row in response.json()], [(self.branch.pk, 2)])
+        self.assertEqual(self.client.get(url, {'group': 'customer'}).status_code, 400)
+
+    def test_command_refreshes(self):
+        self.sell(1, timezone.now() - 2 * SAFETY_LAG)
+        out = io.StringIO()
+        call_command('refresh_sales_rollups', stdout=out)
+        self.assertIn('Wrote 2 rollup row(s).', out.getvalue())
+        self.assertEqual(SalesRollup.objects.filter(grain='day').get().units_ordered, 1)
@@ -0,0 +1,33 @@
+import datetime
+
+from django.utils import timezone
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .rollups import REPORT_GROUPS, sales_report
+
+# Longest range one dashboard request may cover
+MAX_REPORT_DAYS = 366
+
+
+class SalesReportView(APIView):
+    """GET ?group=branch|variant|manufacturer&grain=day|hour&start=YYYY-MM-DD&end=YYYY-MM-DD[&branch=<id>]."""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        params = request.query_params
+        group, grain = params.get('group', 'branch'), params.get('grain', 'day')
+        if group not in REPORT_GROUPS or grain not in ('day', 'hour'):
+            return Response({'detail': 'Unknown group or grain.'}, status=400)
+        try:
+            end = datetime.date.fromisoformat(params['end']) if params.get('end') else timezone.localdate()
+            start = (datetime.date.fromisoformat(params['start']) if params.get('start')
+                     else end - datetime.timedelta(days=30))
+            branch_id = int(params['branch']) if params.get('branch') else None
+        except ValueError:
+            return Response({'detail': 'Invalid start, end or branch.'}, status=400)
+        if not start < end or (end - start).days > MAX_REPORT_DAYS:
+            return Response({'detail': f'start must be before end, at most {MAX_REPORT_DAYS} days apart.'},
+                            status=400)
+        return Response(list(sales_report(group, start, end, grain, branch_id)))
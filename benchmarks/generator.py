@@ -0,0 +1,362 @@
+import datetime
+import random
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from decimal import Decimal
+from itertools import accumulate, islice
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+
+from catalog.models import (
+    ActiveIngredient, ATCClass, DosageForm, Manufacturer, Product, ProductIngredient, ProductVariant,
+)
+from inventory.availability import invalidate_availability
+from inventory.models import Branch, Company, InventoryBatch, InventoryMovement, Prediction
+from inventory.partitions import create_month_partitions, is_partitioned
+from inventory.stock import reconcile_stock_levels
+from orders.models import Cart, CartItem, Order, OrderItem, Review, Shipment
+from users.models import Address, UserProfile
+
+
+# ==========================
+# 1. SCALE PRESETS
+# ==========================
+
+@dataclass(frozen=True)
+class Scale:
+    pharmacies: int
+    branches: int
+    suppliers: int
+    manufacturers: int
+    ingredients: int
+    products: int
+    variants: int
+    customers: int
+    batches_per_branch: int
+    movements: int
+    orders: int
+    carts: int
+    reviews: int
+
+
+SCALES = {
+    'tiny': Scale(pharmacies=2, branches=4, suppliers=2, manufacturers=5, ingredients=15, products=20,
+                  variants=40, customers=10, batches_per_branch=15, movements=300, orders=30, carts=5, reviews=10),
+    'small': Scale(pharmacies=5, branches=20, suppliers=10, manufacturers=50, ingredients=300, products=1_000,
+                   variants=2_000, customers=2_000, batches_per_branch=300, movements=50_000, orders=10_000,
+                   carts=500, reviews=1_000),
+    'medium': Scale(pharmacies=30, branches=100, suppliers=40, manufacturers=300, ingredients=1_500,
+                    products=10_000, variants=20_000, customers=50_000, batches_per_branch=1_000,
+                    movements=1_000_000, orders=100_000, carts=10_000, reviews=20_000),
+    'large': Scale(pharmacies=120, branches=500, suppliers=150, manufacturers=1_000, ingredients=4_000,
+                   products=80_000, variants=200_000, customers=300_000, batches_per_branch=2_000,
+                   movements=10_000_000, orders=1_000_000, carts=50_000, reviews=100_000),
+}
+
+DOSAGE_FORMS = ['Tablet', 'Capsule', 'Syrup', 'Suspension', 'Injection', 'Cream', 'Ointment', 'Drops',
+                'Inhaler', 'Suppository', 'Sachet', 'Gel', 'Spray', 'Lozenge', 'Patch']
+PACK_SIZES = [1, 5, 10, 14, 20, 24, 28, 30, 50, 60, 90, 100]
+SYLLABLES = ['pa', 'na', 'dol', 'ven', 'tor', 'cal', 'zi', 'mox', 'flu', 'ra', 'lex', 'tri', 'cor', 'di',
+             'sen', 'ko', 'mi', 'ol', 'an', 'bro', 'fen', 'ta', 'vo', 'ne', 'ri', 'lo', 'sa', 'xi']
+ORDER_STATUSES = (['delivered'] * 60 + ['shipped'] * 10 + ['packed'] * 5 + ['confirmed'] * 5
+                  + ['pending'] * 10 + ['cancelled'] * 10)
+# Cumulative weights of review ratings 1..5 (mostly positive)
+RATING_CUM_WEIGHTS = list(accumulate([1, 1, 2, 4, 6]))
+# Movements and orders are spread over this many days before now
+HISTORY_DAYS = 365
+# Population centres (lat, lng) customers and branches cluster around
+CITIES = [(30.0444, 31.2357), (31.2001, 29.9187), (30.5965, 32.2715), (27.1783, 31.1859), (25.6872, 32.6396)]
+
+
+@contextmanager
+def historical_timestamps(*fields):
+    """Lets bulk inserts keep generated timestamps instead of auto_now_add overwriting them."""
+    saved = [(field, field.auto_now_add) for field in fields]
+    for field, _ in saved:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, value in saved:
+            field.auto_now_add = value
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+# ==========================
+# 2. GENERATOR
+# ==========================
+
+class SyntheticDataGenerator:
+    """
+    Seeded generator filling every model of the four apps at a given Scale.
+
+    Rows are produced lazily and written with chunked bulk_create, so memory stays proportional
+    to the id lists kept for foreign keys (branches, variants, batches, customers), not to the
+    number of movements or orders. Each chunk commits on its own (run it in autocommit mode), so
+    a large scale never holds one huge transaction open. The same seed and scale always produce
+    the same data set.
+    """
+
+    def __init__(self, scale, seed=42, chunk_size=5000, log=None):
+        self.scale = SCALES[scale] if isinstance(scale, str) else scale
+        self.rng = random.Random(seed)
+        self.seed = seed
+        self.chunk_size = chunk_size
+        self.log = log or (lambda message: None)
+        self.now = timezone.now()
+        self.today = timezone.localdate()
+
+    def generate(self):
+        steps = [
+            self.create_users, self.create_companies, self.create_catalog, self.create_batches,
+            self.create_movements, self.create_orders, self.create_carts, self.create_reviews,
+            self.create_predictions,
+        ]
+        for step in steps:
+            step()
+        reconcile_stock_levels(fix=True)
+        self.log("Stock levels rebuilt from the movement ledger.")
+        return {'seed': self.seed, **asdict(self.scale)}
+
+    def _bulk(self, model, objects, **kwargs):
+        """bulk_create in chunks; returns the created pks in insertion order."""
+        pks = []
+        for chunk in chunked(objects, self.chunk_size):
+            pks.extend(obj.pk for obj in model.objects.bulk_create(chunk, **kwargs))
+        self.log(f"{model._meta.verbose_name_plural}: {len(pks)}")
+        return pks
+
+    def _point(self):
+        lat, lng = self.rng.choice(CITIES)
+        return (Decimal(f"{lat + self.rng.gauss(0, 0.15):.6f}"), Decimal(f"{lng + self.rng.gauss(0, 0.15):.6f}"))
+
+    def _past(self, days):
+        return self.now - datetime.timedelta(seconds=self.rng.randint(0, days * 86400))
+
+    # ----- users -----
+
+    def create_users(self):
+        password = make_password(None)
+        owners = self.scale.pharmacies + self.scale.suppliers
+        self.owner_ids = self._bulk(User, (
+            User(username=f'bench_owner_{i}', password=password) for i in range(owners)
+        ))
+        self.customer_ids = self._bulk(User, (
+            User(username=f'bench_customer_{i}', password=password) for i in range(self.scale.customers)
+        ))
+        self._bulk(UserProfile, (
+            UserProfile(user_id=user_id, full_name=f'Customer {i}', phone=f'01{i:09d}')
+            for i, user_id in enumerate(self.customer_ids)
+        ))
+
+        def addresses():
+            for i, user_id in enumerate(self.customer_ids):
+                lat, lng = self._point()
+                yield Address(user_id=user_id, governorate='Governorate', city=f'City {i % 50}',
+                              district=f'District {i % 400}', street=f'Street {i % 2000}',
+                              building_no=str(i % 300), geo_lat=lat, geo_lng=lng, is_default=True)
+        self.address_ids = self._bulk(Address, addresses())
+
+    # ----- companies & branches -----
+
+    def create_companies(self):
+        pharmacy_owners = self.owner_ids[:self.scale.pharmacies]
+        supplier_owners = self.owner_ids[self.scale.pharmacies:]
+        self.pharmacy_ids = self._bulk(Company, (
+            Company(type='pharmacy', name=f'Pharmacy {i}', owner_id=owner, license_no=f'PH-{i}')
+            for i, owner in enumerate(pharmacy_owners)
+        ))
+        self.supplier_ids = self._bulk(Company, (
+            Company(type='supplier', name=f'Supplier {i}', owner_id=owner, license_no=f'SP-{i}')
+            for i, owner in enumerate(supplier_owners)
+        ))
+
+        def branch_addresses():
+            for i in range(self.scale.branches):
+                lat, lng = self._point()
+                yield Address(governorate='Governorate', city=f'City {i % 50}', district=f'District {i % 400}',
+                              street=f'Branch Street {i}', building_no='1', geo_lat=lat, geo_lng=lng)
+        address_ids = self._bulk(Address, branch_addresses())
+        self.branch_ids = self._bulk(Branch, (
+            Branch(company_id=self.pharmacy_ids[i % len(self.pharmacy_ids)], name=f'Branch {i}',
+                   address_id=address_ids[i], shipping_available=self.rng.random() < 0.8)
+            for i in range(self.scale.branches)
+        ))
+
+    # ----- catalog -----
+
+    def _brand(self, i):
+        word = ''.join(self.rng.choice(SYLLABLES) for _ in range(self.rng.randint(2, 4)))
+        return f'{word.capitalize()} {i}'
+
+    def create_catalog(self):
+        scale = self.scale
+        manufacturer_ids = self._bulk(Manufacturer, (
+            Manufacturer(name=f'Manufacturer {i}') for i in range(scale.manufacturers)
+        ))
+        form_ids = self._bulk(DosageForm, (DosageForm(name=name) for name in DOSAGE_FORMS))
+        ingredient_ids = self._bulk(ActiveIngredient, (
+            ActiveIngredient(name=f'{self._brand(i).split()[0]}ine {i}') for i in range(scale.ingredients)
+        ))
+        atc_ids = self._bulk(ATCClass, (
+            ATCClass(code=f'{letter}{i:02d}', name=f'ATC group {letter}{i:02d}')
+            for letter in 'ABCDGHJLMNPRSV' for i in range(1, 11)
+        ))
+        product_ids = self._bulk(Product, (
+            Product(brand_name=self._brand(i), manufacturer_id=self.rng.choice(manufacturer_ids),
+                    atc_class_id=self.rng.choice(atc_ids), description='Synthetic product')
+            for i in range(scale.products)
+        ))
+        self._bulk(ProductIngredient, (
+            ProductIngredient(product_id=product_id, ingredient_id=ingredient_id,
+                              strength=f'{self.rng.choice([5, 10, 25, 50, 100, 250, 500])} mg')
+            for product_id in product_ids
+            for ingredient_id in self.rng.sample(ingredient_ids, self.rng.randint(1, 3))
+        ))
+
+        def variants():
+            # The remainder goes one extra variant each to the first products, so the total is exact
+            per_product, extra = divmod(scale.variants, scale.products)
+            combos = [(form_index, form_id, pack)
+                      for form_index, form_id in enumerate(form_ids) for pack in PACK_SIZES]
+            for index, product_id in enumerate(product_ids):
+                for form_index, form_id, pack in self.rng.sample(combos, per_product + (index < extra)):
+                    yield ProductVariant(
+                        product_id=product_id, dosage_form_id=form_id, pack_size=pack,
+                        strength_text=f'{self.rng.choice([5, 10, 20, 40, 100, 500])} mg',
+                        barcode_gtin=f'622{index:07d}{pack:03d}{form_index:02d}',
+                        is_prescription_only=self.rng.random() < 0.4, is_otc=self.rng.random() < 0.5,
+                    )
+        self.variant_ids = self._bulk(ProductVariant, variants())
+
+    # ----- inventory -----
+
+    def create_batches(self):
+        per_branch = min(self.scale.batches_per_branch, len(self.variant_ids))
+        # Popular variants are stocked everywhere; the tail only in some branches. Cumulative weights
+        # are computed once: choices() would otherwise accumulate the whole list on every call
+        cum_weights = list(accumulate(1 / (rank + 1) ** 0.6 for rank in range(len(self.variant_ids))))
+
+        def batches():
+            for branch_id in self.branch_ids:
+                variants = set()
+                while len(variants) < per_branch:
+                    variants.update(self.rng.choices(self.variant_ids, cum_weights=cum_weights,
+                                                    k=per_branch - len(variants)))
+                for variant_id in variants:
+                    cost = Decimal(self.rng.randint(500, 50_000)) / 100
+                    yield InventoryBatch(
+                        branch_id=branch_id, variant_id=variant_id,
+                        supplier_id=self.rng.choice(self.supplier_ids),
+                        expiry_date=self.today + datetime.timedelta(days=self.rng.randint(-30, 720)),
+                        qty_on_hand=self.rng.randint(0, 200), cost_price=cost,
+                        sale_price=(cost * Decimal('1.25')).quantize(Decimal('0.01')),
+                        is_available=self.rng.random() < 0.97,
+                    )
+        created = []
+        for chunk in chunked(batches(), self.chunk_size):
+            for batch in InventoryBatch.objects.bulk_create(chunk):
+                created.append((batch.pk, batch.branch_id, batch.variant_id, batch.qty_on_hand, batch.sale_price))
+        self.batches = created
+        invalidate_availability(self.branch_ids)
+        self.batches_by_branch = {}
+        for row in created:
+            self.batches_by_branch.setdefault(row[1], []).append(row)
+        self.log(f"inventory batches: {len(created)}")
+
+    def create_movements(self):
+        """One purchase per batch plus sales/adjustments, summing to the batch's qty_on_hand."""
+        extra_per_batch = max(0, self.scale.movements - len(self.batches)) / max(1, len(self.batches))
+
+        def movements():
+            for batch_id, _, _, qty_on_hand, _ in self.batches:
+                deltas = [-self.rng.randint(1, 5) for _ in range(int(self.rng.random() * 2 * extra_per_batch))]
+                purchased_at = self._past(HISTORY_DAYS)
+                yield InventoryMovement(batch_id=batch_id, type='purchase', created_at=purchased_at,
+                                        delta_qty=qty_on_hand - sum(deltas))
+                for delta in deltas:
+                    kind = 'sale' if self.rng.random() < 0.95 else 'adjustment'
+                    at = purchased_at + (self.now - purchased_at) * self.rng.random()
+                    yield InventoryMovement(batch_id=batch_id, type=kind, delta_qty=delta, created_at=at)
+
+        if is_partitioned():
+            # Back-dated rows would otherwise all land in the default partition
+            create_month_partitions((self.now - datetime.timedelta(days=HISTORY_DAYS)).date(), self.now.date())
+        with historical_timestamps(InventoryMovement._meta.get_field('created_at')):
+            total = sum(len(InventoryMovement.objects.bulk_create(chunk))
+                        for chunk in chunked(movements(), self.chunk_size))
+        self.log(f"inventory movements: {total}")
+
+    # ----- orders -----
+
+    def create_orders(self):
+        customers = list(zip(self.customer_ids, self.address_ids))
+        stocked = [branch for branch in self.branch_ids if self.batches_by_branch.get(branch)]
+        total_orders = 0
+        with historical_timestamps(Order._meta.get_field('placed_at')):
+            for start in range(0, self.scale.orders, self.chunk_size):
+                size = min(self.chunk_size, self.scale.orders - start)
+                orders, lines = [], []
+                for _ in range(size):
+                    customer_id, address_id = self.rng.choice(customers)
+                    branch_id = self.rng.choice(stocked)
+                    picked = self.rng.sample(self.batches_by_branch[branch_id],
+                                             min(self.rng.randint(1, 5), len(self.batches_by_branch[branch_id])))
+                    items = [(batch_id, variant_id, self.rng.randint(1, 3), price)
+                             for batch_id, _, variant_id, _, price in picked]
+                    orders.append(Order(
+                        customer_id=customer_id, branch_id=branch_id, shipping_address_id=address_id,
+                        status=self.rng.choice(ORDER_STATUSES), payment_status='paid',
+                        total=sum(qty * price for _, _, qty, price in items),
+                        placed_at=self._past(HISTORY_DAYS),
+                    ))
+                    lines.append(items)
+                with transaction.atomic():
+                    orders = Order.objects.bulk_create(orders)
+                    OrderItem.objects.bulk_create([
+                        OrderItem(order_id=order.pk, variant_id=variant_id, batch_id=batch_id, quantity=qty,
+                                  unit_price=price)
+                        for order, items in zip(orders, lines) for batch_id, variant_id, qty, price in items
+                    ])
+                    Shipment.objects.bulk_create([
+                        Shipment(order_id=order.pk, tracking_number=f'TRK{order.pk:010d}',
+                                 status='delivered' if order.status == 'delivered' else 'in_transit',
+                                 delivered_at=order.placed_at + datetime.timedelta(days=2)
+                                 if order.status == 'delivered' else None)
+                        for order in orders if order.status in ('shipped', 'delivered')
+                    ])
+                total_orders += len(orders)
+        self.log(f"orders: {total_orders}")
+
+    def create_carts(self):
+        cart_ids = self._bulk(Cart, (Cart() for _ in range(self.scale.carts)))
+        self._bulk(CartItem, (
+            CartItem(cart_id=cart_id, variant_id=variant_id, quantity=self.rng.randint(1, 3),
+                     unit_price_snapshot=Decimal(self.rng.randint(500, 50_000)) / 100)
+            for cart_id in cart_ids
+            for variant_id in self.rng.sample(self.variant_ids, min(len(self.variant_ids), self.rng.randint(1, 4)))
+        ))
+
+    def create_reviews(self):
+        self._bulk(Review, (
+            Review(variant_id=self.rng.choice(self.variant_ids),
+                   rating=self.rng.choices(range(1, 6), cum_weights=RATING_CUM_WEIGHTS)[0], comment='Synthetic review')
+            for _ in range(self.scale.reviews)
+        ))
+
+    def create_predictions(self):
+        self._bulk(Prediction, (
+            Prediction(branch_id=branch_id, variant_id=variant_id, horizon_days=horizon,
+                       predicted_demand=self.rng.randint(0, 500), model_version='synthetic')
+            for branch_id in self.branch_ids
+            for variant_id in self.rng.sample(self.variant_ids, min(len(self.variant_ids), 20))
+            for horizon in (7, 14, 30)
+        ))
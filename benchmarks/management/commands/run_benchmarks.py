@@ -0,0 +1,39 @@
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmarks.suite import BENCHMARKS, DEFAULT_TOLERANCE, compare_results, run_suite
+
+
+class Command(BaseCommand):
+    help = "Runs the performance benchmark suite and writes comparable JSON results."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--only', nargs='+', choices=sorted(BENCHMARKS), help="Benchmarks to run.")
+        parser.add_argument('--iterations', type=int, default=200)
+        parser.add_argument('--warmup', type=int, default=10)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help="Write the JSON results to this file (default: stdout).")
+        parser.add_argument('--compare', help="Baseline JSON file; exits with an error on regressions.")
+        parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                            help="Allowed relative p95 slow-down before it counts as a regression.")
+
+    def handle(self, *args, **options):
+        try:
+            results = run_suite(options['only'], options['iterations'], options['warmup'], options['seed'])
+        except RuntimeError as exc:
+            raise CommandError(str(exc))
+
+        payload = json.dumps(results, indent=2)
+        if options['output']:
+            Path(options['output']).write_text(payload)
+        else:
+            self.stdout.write(payload)
+
+        if options['compare']:
+            baseline = json.loads(Path(options['compare']).read_text())
+            regressions = compare_results(results, baseline, options['tolerance'])
+            if regressions:
+                raise CommandError("Performance regressions:\n" + '\n'.join(regressions))
+            self.stdout.write(self.style.SUCCESS("No regressions against the baseline."))
@@ -0,0 +1,196 @@
+import datetime
+import math
+import platform
+import random
+import time
+from dataclasses import dataclass
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from catalog.models import Product
+from catalog.search import autocomplete_variants, search_variants
+from inventory.models import InventoryMovement, StockLevel
+from inventory.stock import stock_on_hand
+from orders.cart_store import DatabaseCartStore
+from orders.history import customer_order_history
+from orders.placement import place_order
+from pharma_store_v01.query_budget import record_queries
+from users.models import Address
+
+# Sample sizes used to pick benchmark inputs from the seeded data
+SAMPLE_SIZE = 1000
+# Relative p95 slow-down (or query count increase) that counts as a regression
+DEFAULT_TOLERANCE = 0.10
+
+
+# ==========================
+# 1. REGISTRY
+# ==========================
+
+@dataclass
+class Benchmark:
+    name: str
+    func: object
+    # Write benchmarks run inside a transaction that is rolled back after every iteration
+    writes: bool = False
+
+
+BENCHMARKS = {}
+
+
+def benchmark(name, writes=False):
+    def decorator(func):
+        BENCHMARKS[name] = Benchmark(name, func, writes)
+        return func
+    return decorator
+
+
+class BenchmarkContext:
+    """Inputs sampled once from the seeded database so every iteration exercises real rows."""
+
+    def __init__(self, rng):
+        self.rng = rng
+        self.stocked = list(
+            StockLevel.objects.filter(qty_on_hand__gt=10).values_list('branch_id', 'variant_id')[:SAMPLE_SIZE]
+        )
+        self.brands = list(Product.objects.values_list('brand_name', flat=True)[:SAMPLE_SIZE])
+        self.customers = list(
+            Address.objects.filter(user__isnull=False).values_list('user_id', 'pk')[:SAMPLE_SIZE]
+        )
+        self.branches = sorted({branch_id for branch_id, _ in self.stocked})
+
+    def ready(self):
+        return bool(self.stocked and self.brands and self.customers)
+
+
+# ==========================
+# 2. SCENARIOS
+# ==========================
+
+@benchmark('checkout', writes=True)
+def bench_checkout(ctx):
+    """Cart with up to three lines at one branch placed as an order (FEFO split, sale movements)."""
+    branch_id, _ = ctx.rng.choice(ctx.stocked)
+    variants = [variant for branch, variant in ctx.stocked if branch == branch_id][:3]
+    customer_id, address_id = ctx.rng.choice(ctx.customers)
+    store = DatabaseCartStore()
+    cart_id = store.create_cart()
+    for variant_id in variants:
+        store.add_item(cart_id, variant_id, 1, Decimal('1'))
+    place_order(cart_id, User(pk=customer_id), branch_id, address_id, store=store)
+
+
+@benchmark('stock_lookup')
+def bench_stock_lookup(ctx):
+    stock_on_hand(*ctx.rng.choice(ctx.stocked))
+
+
+@benchmark('catalog_search')
+def bench_catalog_search(ctx):
+    list(search_variants(ctx.rng.choice(ctx.brands).split()[0][:6]))
+
+
+@benchmark('catalog_autocomplete')
+def bench_catalog_autocomplete(ctx):
+    list(autocomplete_variants(ctx.rng.choice(ctx.brands)[:3]))
+
+
+@benchmark('order_history')
+def bench_order_history(ctx):
+    customer_id, _ = ctx.rng.choice(ctx.customers)
+    customer_order_history(customer_id)
+
+
+@benchmark('sales_report')
+def bench_sales_report(ctx):
+    """Units sold per variant at one branch over the last 30 days."""
+    since = timezone.now() - datetime.timedelta(days=30)
+    list(
+        InventoryMovement.objects
+        .filter(type='sale', created_at__gte=since, batch__branch_id=ctx.rng.choice(ctx.branches))
+        .values('batch__variant_id').annotate(units=Sum('delta_qty')).order_by('units')[:50]
+    )
+
+
+# ==========================
+# 3. RUNNER
+# ==========================
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[max(0, math.ceil(fraction * len(sorted_values)) - 1)]
+
+
+def _run_once(bench, ctx):
+    with record_queries() as recorder:
+        started = time.perf_counter()
+        if bench.writes:
+            with transaction.atomic():
+                bench.func(ctx)
+                transaction.set_rollback(True)
+        else:
+            bench.func(ctx)
+        elapsed = time.perf_counter() - started
+    return elapsed, recorder.count
+
+
+def run_suite(names=None, iterations=200, warmup=10, seed=0):
+    """
+    Runs the selected benchmarks against the current database and returns a JSON-serializable
+    dict: run metadata plus per-benchmark latency percentiles (ms) and queries per operation.
+    """
+    rng = random.Random(seed)
+    ctx = BenchmarkContext(rng)
+    if not ctx.ready():
+        raise RuntimeError("No benchmark data found; run `manage.py seed_data` first.")
+
+    results = {}
+    for name in names or BENCHMARKS:
+        bench = BENCHMARKS[name]
+        for _ in range(warmup):
+            _run_once(bench, ctx)
+        timings, queries = [], []
+        for _ in range(iterations):
+            elapsed, count = _run_once(bench, ctx)
+            timings.append(elapsed * 1000)
+            queries.append(count)
+        timings.sort()
+        results[name] = {
+            'iterations': iterations,
+            'mean_ms': round(sum(timings) / len(timings), 3),
+            'p50_ms': round(percentile(timings, 0.50), 3),
+            'p95_ms': round(percentile(timings, 0.95), 3),
+            'p99_ms': round(percentile(timings, 0.99), 3),
+            'max_ms': round(timings[-1], 3),
+            'queries_per_op': round(sum(queries) / len(queries), 2),
+        }
+
+    return {
+        'meta': {
+            'timestamp': timezone.now().isoformat(),
+            'seed': seed,
+            'database': connection.vendor,
+            'python': platform.python_version(),
+        },
+        'results': results,
+    }
+
+
+def compare_results(current, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Lists regressions of ``current`` against ``baseline`` (both run_suite() outputs)."""
+    regressions = []
+    for name, result in current['results'].items():
+        previous = baseline.get('results', {}).get(name)
+        if previous is None:
+            continue
+        if previous['p95_ms'] and result['p95_ms'] > previous['p95_ms'] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {previous['p95_ms']}ms -> {result['p95_ms']}ms")
+        if result['queries_per_op'] > previous['queries_per_op']:
+            regressions.append(f"{name}: queries/op {previous['queries_per_op']} -> {result['queries_per_op']}")
+    return regressions
@@ -0,0 +1,70 @@
+import io
+import json
+from dataclasses import replace
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from catalog.models import ProductVariant
+from inventory.models import InventoryBatch, InventoryMovement, StockLevel
+from inventory.stock import reconcile_stock_levels
+from orders.models import Order, OrderItem
+
+from .generator import SCALES, SyntheticDataGenerator
+from .suite import compare_results, percentile, run_suite
+
+
+class SyntheticDataTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        SyntheticDataGenerator('tiny', seed=7).generate()
+
+    def test_every_table_is_filled_consistently(self):
+        self.assertEqual(ProductVariant.objects.count(), 40)
+        self.assertGreater(InventoryMovement.objects.count(), InventoryBatch.objects.count())
+        self.assertEqual(Order.objects.count(), 30)
+        self.assertTrue(OrderItem.objects.exists())
+        self.assertTrue(StockLevel.objects.exists())
+        # Movements sum to the batch quantities, so the ledger and the snapshot agree
+        self.assertEqual(reconcile_stock_levels(fix=False), [])
+
+    def test_suite_outputs_comparable_json(self):
+        results = run_suite(iterations=2, warmup=0)
+
+        self.assertEqual(set(results['results']), {'checkout', 'stock_lookup', 'catalog_search',
+                                                   'catalog_autocomplete', 'order_history', 'sales_report'})
+        json.dumps(results)
+        self.assertEqual(compare_results(results, results), [])
+        # Checkout writes are rolled back
+        self.assertEqual(Order.objects.count(), 30)
+
+    def test_order_history_benchmark_runs_the_history_query(self):
+        with mock.patch('benchmarks.suite.customer_order_history') as history:
+            run_suite(['order_history'], iterations=2, warmup=0)
+        self.assertEqual(history.call_count, 2)
+
+    def test_command_flags_regressions(self):
+        baseline = {'results': {'stock_lookup': {'p95_ms': 0.0001, 'queries_per_op': 100}}}
+        current = run_suite(['stock_lookup'], iterations=2, warmup=0)
+        self.assertEqual(len(compare_results(current, baseline)), 1)
+
+        out = io.StringIO()
+        call_command('run_benchmarks', '--only', 'stock_lookup', '--iterations', '1', stdout=out)
+        self.assertIn('p95_ms', out.getvalue())
+
+
+class CatalogScaleTests(TestCase):
+
+    def test_variant_count_matches_the_scale_when_it_does_not_divide_evenly(self):
+        SyntheticDataGenerator(replace(SCALES['tiny'], products=15, variants=37), seed=7).create_catalog()
+
+        self.assertEqual(ProductVariant.objects.count(), 37)
+
+
+class PercentileTests(TestCase):
+
+    def test_nearest_rank(self):
+        values = list(range(1, 101))
+        self.assertEqual((percentile(values, 0.5), percentile(values, 0.95), percentile(values, 1.0)), (50, 95, 100))
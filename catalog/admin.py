@@ -1,3 +1,72 @@
 from django.contrib import admin
 
-# Register your models here.
+from .lookups import atc_classes, manufacturers
+from .models import ActiveIngredient, ATCClass, DosageForm, Manufacturer, Product, ProductIngredient, ProductVariant
+
+
+# ===============================
+# 1. LOOKUP TABLES
+# ===============================
+
+@admin.register(Manufacturer)
+class ManufacturerAdmin(admin.ModelAdmin):
+    list_display = ('name', 'is_active')
+    list_filter = ('is_active',)
+    search_fields = ('name',)
+
+
+@admin.register(DosageForm)
+class DosageFormAdmin(admin.ModelAdmin):
+    search_fields = ('name',)
+
+
+@admin.register(ActiveIngredient)
+class ActiveIngredientAdmin(admin.ModelAdmin):
+    search_fields = ('name',)
+
+
+@admin.register(ATCClass)
+class ATCClassAdmin(admin.ModelAdmin):
+    list_display = ('code', 'name')
+    search_fields = ('code', 'name')
+
+
+# ===============================
+# 2. PRODUCTS
+# ===============================
+
+class ProductIngredientInline(admin.TabularInline):
+    model = ProductIngredient
+    autocomplete_fields = ('ingredient',)
+    extra = 0
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('ingredient')
+
+
+@admin.register(Product)
+class ProductAdmin(admin.ModelAdmin):
+    list_display = ('brand_name', 'manufacturer_name', 'atc_code')
+    search_fields = ('brand_name',)
+    autocomplete_fields = ('manufacturer', 'atc_class')
+    inlines = (ProductIngredientInline,)
+
+    # Lookup table caches instead of joins
+    @admin.display(description='Manufacturer', ordering='manufacturer__name')
+    def manufacturer_name(self, product):
+        return manufacturers.get_by_id(product.manufacturer_id).name
+
+    @admin.display(description='ATC Class', ordering='atc_class__code')
+    def atc_code(self, product):
+        atc_class = atc_classes.get_by_id(product.atc_class_id)
+        return str(atc_class) if atc_class else None
+
+
+@admin.register(ProductVariant)
+class ProductVariantAdmin(admin.ModelAdmin):
+    # __str__ reads product (the dosage form comes from the lookup cache)
+    list_display = ('__str__', 'pack_size', 'barcode_gtin', 'is_prescription_only', 'is_otc')
+    list_select_related = ('product',)
+    list_filter = ('is_prescription_only', 'is_otc')
+    search_fields = ('product__brand_name', 'barcode_gtin')
+    autocomplete_fields = ('product', 'dosage_form')
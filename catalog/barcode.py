@@ -0,0 +1,67 @@
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+from .caching import LocalLRUCache
+from .models import ProductVariant
+
+# ==========================
+# TWO-TIER BARCODE RESOLUTION (IN-PROCESS LRU -> REDIS -> DATABASE)
+# ==========================
+
+KEY_PREFIX = 'catalog:barcode:v1:'
+# Cached "no such barcode" marker, so repeated scans of unknown codes do not reach the database
+NOT_FOUND = ''
+NOT_FOUND_TIMEOUT = 60
+
+local_cache = LocalLRUCache(maxsize=20_000, ttl=30)
+
+
+def _key(gtin):
+    return f'{KEY_PREFIX}{gtin}'
+
+
+def serialize_variant(variant):
+    """Compact JSON record shown by POS terminals; needs product and dosage_form loaded."""
+    return json.dumps({
+        'id': variant.pk,
+        'gtin': variant.barcode_gtin,
+        'name': str(variant),
+        'brand_name': variant.product.brand_name,
+        'strength': variant.strength_text,
+        'dosage_form': variant.dosage_form.name,
+        'pack_size': variant.pack_size,
+        'rx': variant.is_prescription_only,
+        'otc': variant.is_otc,
+    }, ensure_ascii=False, separators=(',', ':'))
+
+
+def resolve_barcode(gtin):
+    """
+    Returns the pre-serialized JSON record of the variant with this barcode, or None.
+    Tiers: process-local LRU, then the shared cache, then a single joined query.
+    """
+    key = _key(gtin)
+    record = local_cache.get(key)
+    if record is None:
+        record = cache.get(key)
+        if record is None:
+            # Primary, not replica: a lagging read would stay cached for the whole TTL (see db_router)
+            variant = (
+                ProductVariant.objects.using(DEFAULT_DB_ALIAS).select_related('product', 'dosage_form')
+                .filter(barcode_gtin=gtin).first()
+            )
+            record = serialize_variant(variant) if variant else NOT_FOUND
+            cache.set(key, record, settings.BARCODE_CACHE_TIMEOUT if variant else NOT_FOUND_TIMEOUT)
+        local_cache.set(key, record)
+    return record or None
+
+
+def invalidate_barcodes(gtins):
+    """Drops the given barcodes from both tiers (other processes' LRUs expire via their TTL)."""
+    keys = [_key(gtin) for gtin in gtins if gtin]
+    if keys:
+        local_cache.delete_many(keys)
+        cache.delete_many(keys)
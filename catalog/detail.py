@@ -0,0 +1,113 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Avg, Count, Q, Sum
+
+from inventory.models import StockLevel
+from orders.models import Review
+
+from .lookups import atc_classes, dosage_forms, manufacturers
+from .models import ProductIngredient, ProductVariant
+
+# ==========================
+# PRODUCT DETAIL (ASYNC VIEW)
+#  The static card (variant, product, manufacturer, ingredients) is cached in the shared cache,
+#  filled from the primary (see pharma_store_v01.db_router) and dropped by catalog.signals; stock
+#  and rating change constantly and are read live. The parts are gathered, but Django's async ORM
+#  runs every query on the request's one sync thread, so the queries still execute one after the
+#  other; what the async view saves is a worker thread per request while it waits on I/O.
+# ==========================
+
+KEY_PREFIX = 'catalog:detail:v1:'
+# Cached "no such variant" marker (same scheme as the barcode cache)
+NOT_FOUND = {}
+NOT_FOUND_TIMEOUT = 60
+
+
+def _key(variant_id):
+    return f'{KEY_PREFIX}{variant_id}'
+
+
+async def _ingredients(variant_id):
+    return [
+        {'name': name, 'strength': strength}
+        async for name, strength in ProductIngredient.objects.using(DEFAULT_DB_ALIAS)
+        .filter(product__productvariant=variant_id)
+        .order_by('ingredient__name')
+        .values_list('ingredient__name', 'strength')
+    ]
+
+
+async def _variant(variant_id):
+    return await (
+        ProductVariant.objects.using(DEFAULT_DB_ALIAS).select_related('product')
+        .filter(pk=variant_id).afirst()
+    )
+
+
+def _card(variant, ingredients):
+    # fresh: the card is cached for long, so check the lookup versions rather than trust a local copy
+    product = variant.product
+    manufacturer = manufacturers.get_by_id(product.manufacturer_id, fresh=True)
+    atc_class = atc_classes.get_by_id(product.atc_class_id, fresh=True)
+    return {
+        'id': variant.pk,
+        'name': str(variant),
+        'brand_name': product.brand_name,
+        'description': product.description,
+        'manufacturer': {'id': product.manufacturer_id, 'name': manufacturer.name},
+        'atc_code': atc_class.code if atc_class else None,
+        'dosage_form': dosage_forms.get_by_id(variant.dosage_form_id, fresh=True).name,
+        'strength': variant.strength_text,
+        'pack_size': variant.pack_size,
+        'barcode_gtin': variant.barcode_gtin,
+        'is_prescription_only': variant.is_prescription_only,
+        'is_otc': variant.is_otc,
+        'ingredients': ingredients,
+    }
+
+
+async def variant_card(variant_id):
+    """Static part of the detail page: shared cache, else the variant query and the ingredients query."""
+    key = _key(variant_id)
+    card = await cache.aget(key)
+    if card is None:
+        variant, ingredients = await asyncio.gather(_variant(variant_id), _ingredients(variant_id))
+        card = await sync_to_async(_card)(variant, ingredients) if variant else NOT_FOUND
+        await cache.aset(key, card, settings.PRODUCT_DETAIL_CACHE_TIMEOUT if variant else NOT_FOUND_TIMEOUT)
+    return card or None
+
+
+async def variant_stock(variant_id):
+    """Units on hand across all branches and the number of branches holding any (StockLevel snapshot)."""
+    totals = await StockLevel.objects.filter(variant_id=variant_id).aaggregate(
+        units=Sum('qty_on_hand', filter=Q(qty_on_hand__gt=0)),
+        branches=Count('pk', filter=Q(qty_on_hand__gt=0)),
+    )
+    return {'units': totals['units'] or 0, 'branches': totals['branches']}
+
+
+async def variant_rating(variant_id):
+    totals = await Review.objects.filter(variant_id=variant_id).aaggregate(average=Avg('rating'), count=Count('pk'))
+    average = totals['average']
+    return {'average': round(average, 2) if average is not None else None, 'count': totals['count']}
+
+
+async def variant_detail(variant_id):
+    """The full product detail document, or None for an unknown variant."""
+    card, stock, rating = await asyncio.gather(
+        variant_card(variant_id), variant_stock(variant_id), variant_rating(variant_id),
+    )
+    if card is None:
+        return None
+    return {**card, 'stock': stock, 'rating': rating}
+
+
+def invalidate_variant_details(variant_ids):
+    """Drops cached cards; called synchronously from catalog.signals."""
+    keys = [_key(variant_id) for variant_id in variant_ids]
+    if keys:
+        cache.delete_many(keys)
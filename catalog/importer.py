@@ -0,0 +1,262 @@
+import csv
+import json
+import time
+from dataclasses import dataclass
+from itertools import islice
+
+from django.db import DataError, IntegrityError, transaction
+
+from .barcode import invalidate_barcodes
+from .lookups import LOOKUP_CACHES, active_ingredients, atc_classes, dosage_forms, manufacturers
+from .models import (
+    ActiveIngredient, ATCClass, DosageForm, Manufacturer, Product, ProductIngredient, ProductVariant,
+)
+
+# ==========================
+# STREAMING CATALOG IMPORT (NATIONAL DRUG LIST)
+#  One input row = one ProductVariant. Columns / keys:
+#    brand_name, manufacturer, dosage_form, strength_text, pack_size          (required)
+#    barcode_gtin, description, atc_code, atc_name, is_prescription_only, is_otc,
+#    ingredients  -> "Paracetamol:500 mg|Caffeine:65 mg" in CSV, or a list of
+#                    {"name": ..., "strength": ...} objects in NDJSON
+# ==========================
+
+DEFAULT_CHUNK_SIZE = 2000
+REQUIRED_FIELDS = ('brand_name', 'manufacturer', 'dosage_form', 'strength_text', 'pack_size')
+TRUE_VALUES = {'1', 'true', 't', 'yes', 'y'}
+
+
+class ImportRowError(ValueError):
+    """A row that cannot be imported; the importer skips it and keeps going."""
+
+
+@dataclass
+class ChunkStats:
+    number: int
+    rows: int
+    skipped: int
+    seconds: float
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else float('inf')
+
+
+def read_rows(stream, fmt):
+    """
+    Yields raw dict rows one at a time from a CSV or NDJSON text stream. An NDJSON line that is not
+    valid JSON is yielded as the line itself, so clean_row rejects that row alone.
+    """
+    if fmt == 'csv':
+        yield from csv.DictReader(stream)
+    elif fmt == 'ndjson':
+        for line in stream:
+            if line.strip():
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    yield line.strip()
+    else:
+        raise ValueError(f"Unsupported format: {fmt}")
+
+
+def _text(row, name):
+    value = row.get(name)
+    return value.strip() if isinstance(value, str) else value
+
+
+def _flag(value):
+    if isinstance(value, bool):
+        return value
+    return str(value or '').strip().lower() in TRUE_VALUES
+
+
+def _ingredients(value):
+    if not value:
+        return []
+    if isinstance(value, list):
+        return [(item['name'].strip(), str(item.get('strength', '')).strip()) for item in value]
+    pairs = []
+    for part in value.split('|'):
+        name, _, strength = part.partition(':')
+        if name.strip():
+            pairs.append((name.strip(), strength.strip()))
+    return pairs
+
+
+def clean_row(row):
+    """Normalizes one raw row; raises ImportRowError for unusable input."""
+    if not isinstance(row, dict):
+        raise ImportRowError("not a JSON object")
+    try:
+        return _clean(row)
+    except (AttributeError, KeyError, TypeError) as exc:
+        raise ImportRowError(f"malformed value ({exc.__class__.__name__}: {exc})") from exc
+
+
+def _clean(row):
+    missing = [name for name in REQUIRED_FIELDS if not _text(row, name)]
+    if missing:
+        raise ImportRowError(f"missing {', '.join(missing)}")
+    try:
+        pack_size = int(row['pack_size'])
+    except (TypeError, ValueError):
+        raise ImportRowError(f"invalid pack_size {row['pack_size']!r}")
+    return {
+        'brand_name': _text(row, 'brand_name'),
+        'manufacturer': _text(row, 'manufacturer'),
+        'dosage_form': _text(row, 'dosage_form'),
+        'strength_text': _text(row, 'strength_text'),
+        'pack_size': pack_size,
+        'barcode_gtin': _text(row, 'barcode_gtin') or None,
+        'description': _text(row, 'description') or '',
+        'atc_code': _text(row, 'atc_code') or None,
+        'atc_name': _text(row, 'atc_name') or '',
+        'is_prescription_only': _flag(row.get('is_prescription_only')),
+        'is_otc': _flag(row.get('is_otc')),
+        'ingredients': _ingredients(row.get('ingredients')),
+    }
+
+
+class CatalogImporter:
+    """
+    Upserts catalog rows chunk by chunk with a fixed number of queries per chunk.
+
+    Lookup tables (manufacturers, dosage forms, ingredients, ATC classes) are resolved through
+    in-memory name -> id dictionaries that are loaded once and extended as new names appear.
+    Memory use depends on the chunk size and the lookup tables, never on the file size.
+    """
+
+    def __init__(self, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        self.manufacturers = manufacturers.name_to_id()
+        self.dosage_forms = dosage_forms.name_to_id()
+        self.ingredients = active_ingredients.name_to_id()
+        self.atc_classes = atc_classes.name_to_id()
+
+    def run(self, rows, on_error=None):
+        """Imports an iterable of raw rows; yields a ChunkStats after each committed chunk."""
+        rows = iter(rows)
+        number = 0
+        while raw_chunk := list(islice(rows, self.chunk_size)):
+            number += 1
+            started = time.perf_counter()
+            chunk, skipped, failed = [], 0, 0
+            for raw in raw_chunk:
+                try:
+                    chunk.append((raw, clean_row(raw)))
+                except ImportRowError as exc:
+                    skipped += 1
+                    if on_error:
+                        on_error(raw, exc)
+            if chunk:
+                try:
+                    with transaction.atomic():
+                        self._import_chunk([row for _, row in chunk])
+                except (DataError, IntegrityError):
+                    # Some row clashes (e.g. a barcode already used by another variant): find it row by row
+                    failed = self._import_rows(chunk, on_error)
+                    skipped += failed
+            yield ChunkStats(number, len(chunk) - failed, skipped, time.perf_counter() - started)
+
+    def _import_rows(self, chunk, on_error):
+        """Fallback for a rejected chunk: one savepoint per row; returns the number of rows rejected."""
+        failed = 0
+        self._reload_lookups()
+        for raw, row in chunk:
+            try:
+                with transaction.atomic():
+                    self._import_chunk([row])
+            except (DataError, IntegrityError) as exc:
+                failed += 1
+                self._reload_lookups()
+                if on_error:
+                    on_error(raw, ImportRowError(str(exc)))
+        return failed
+
+    def _reload_lookups(self):
+        """
+        Names created inside a rolled-back savepoint are gone again, so go back to the committed
+        tables; names committed since are created again by _resolve() with ignore_conflicts.
+        """
+        self.manufacturers = manufacturers.name_to_id()
+        self.dosage_forms = dosage_forms.name_to_id()
+        self.ingredients = active_ingredients.name_to_id()
+        self.atc_classes = atc_classes.name_to_id()
+
+    # ----- lookup tables -----
+
+    def _resolve(self, model, field, mapping, values, defaults=None):
+        """Creates the names missing from ``mapping`` (one INSERT) and refreshes their ids (one SELECT)."""
+        missing = {value for value in values if value and value not in mapping}
+        if missing:
+            model.objects.bulk_create(
+                [model(**{field: value}, **(defaults(value) if defaults else {})) for value in missing],
+                ignore_conflicts=True,
+            )
+            mapping.update(model.objects.filter(**{f'{field}__in': missing}).values_list(field, 'pk'))
+            transaction.on_commit(LOOKUP_CACHES[model].invalidate)
+
+    def _import_chunk(self, chunk):
+        atc_names = {row['atc_code']: row['atc_name'] or row['atc_code'] for row in chunk if row['atc_code']}
+        self._resolve(Manufacturer, 'name', self.manufacturers, {row['manufacturer'] for row in chunk})
+        self._resolve(DosageForm, 'name', self.dosage_forms, {row['dosage_form'] for row in chunk})
+        self._resolve(ATCClass, 'code', self.atc_classes, atc_names, lambda code: {'name': atc_names[code]})
+        self._resolve(ActiveIngredient, 'name', self.ingredients,
+                      {name for row in chunk for name, _ in row['ingredients']})
+
+        # ----- products (one per brand; the last row of a brand wins) -----
+        products = {}
+        for row in chunk:
+            products[row['brand_name']] = Product(
+                brand_name=row['brand_name'],
+                manufacturer_id=self.manufacturers[row['manufacturer']],
+                atc_class_id=self.atc_classes.get(row['atc_code']),
+                description=row['description'],
+            )
+        Product.objects.bulk_create(
+            products.values(), update_conflicts=True, unique_fields=['brand_name'],
+            update_fields=['manufacturer', 'atc_class', 'description'],
+        )
+        product_ids = dict(Product.objects.filter(brand_name__in=products).values_list('brand_name', 'pk'))
+
+        # Barcodes about to be overwritten must leave the barcode cache as well
+        stale_barcodes = set(
+            ProductVariant.objects.filter(product_id__in=product_ids.values()).values_list('barcode_gtin', flat=True)
+        )
+
+        # ----- variants -----
+        variants = {}
+        for row in chunk:
+            variant = ProductVariant(
+                product_id=product_ids[row['brand_name']],
+                dosage_form_id=self.dosage_forms[row['dosage_form']],
+                strength_text=row['strength_text'],
+                pack_size=row['pack_size'],
+                barcode_gtin=row['barcode_gtin'],
+                is_prescription_only=row['is_prescription_only'],
+                is_otc=row['is_otc'],
+            )
+            variants[(variant.product_id, variant.dosage_form_id, variant.pack_size)] = variant
+        ProductVariant.objects.bulk_create(
+            variants.values(), update_conflicts=True, unique_fields=['product', 'dosage_form', 'pack_size'],
+            update_fields=['strength_text', 'barcode_gtin', 'is_prescription_only', 'is_otc'],
+        )
+
+        # ----- product ingredients -----
+        links = {}
+        for row in chunk:
+            product_id = product_ids[row['brand_name']]
+            for name, strength in row['ingredients']:
+                links[(product_id, self.ingredients[name])] = ProductIngredient(
+                    product_id=product_id, ingredient_id=self.ingredients[name], strength=strength,
+                )
+        if links:
+            ProductIngredient.objects.bulk_create(
+                links.values(), update_conflicts=True, unique_fields=['product', 'ingredient'],
+                update_fields=['strength'],
+            )
+
+        transaction.on_commit(lambda: invalidate_barcodes(
+            stale_barcodes | {variant.barcode_gtin for variant in variants.values()}
+        ))
@@ -0,0 +1,102 @@
+import threading
+import time
+
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+from .models import ActiveIngredient, ATCClass, DosageForm, Manufacturer
+
+# How often (seconds) a process re-checks the shared version key; between checks it serves its own copy
+LOCAL_CHECK_INTERVAL = 5
+SNAPSHOT_TIMEOUT = 24 * 60 * 60
+
+
+class LookupTableCache:
+    """
+    Versioned read-through cache holding a whole (small, near-static) lookup table.
+
+    The table lives as one snapshot in the shared cache under ``<prefix>:v<version>`` and as
+    model instances in process memory. Writes bump the version (see catalog.signals), which
+    makes every process reload the snapshot on its next check instead of deleting keys.
+    """
+
+    def __init__(self, model, name_field='name'):
+        self.model = model
+        self.name_field = name_field
+        self.prefix = f'catalog:lookup:{model._meta.label_lower}'
+        self._fields = [field.attname for field in model._meta.concrete_fields]
+        self._lock = threading.Lock()
+        self._local = None  # (version, by_id, by_name)
+        self._checked_at = 0.0
+
+    @property
+    def version_key(self):
+        return f'{self.prefix}:version'
+
+    def _current_version(self):
+        cache.add(self.version_key, 1, timeout=None)
+        return cache.get(self.version_key) or 1
+
+    def _load(self, version):
+        key = f'{self.prefix}:v{version}'
+        rows = cache.get(key)
+        if rows is None:
+            # Primary, not replica: the snapshot is cached for a day under the new version
+            rows = list(self.model.objects.using(DEFAULT_DB_ALIAS).order_by('pk').values_list(*self._fields))
+            cache.set(key, rows, SNAPSHOT_TIMEOUT)
+        by_id, by_name = {}, {}
+        for row in rows:
+            obj = self.model.from_db(None, self._fields, row)
+            by_id[obj.pk] = obj
+            by_name[getattr(obj, self.name_field)] = obj
+        return by_id, by_name
+
+    def _tables(self, fresh=False):
+        now = time.monotonic()
+        local = self._local
+        if local is not None and not fresh and now - self._checked_at < LOCAL_CHECK_INTERVAL:
+            return local[1], local[2]
+        with self._lock:
+            version = self._current_version()
+            if self._local is None or self._local[0] != version:
+                self._local = (version, *self._load(version))
+            self._checked_at = now
+            return self._local[1], self._local[2]
+
+    # ----- public API -----
+
+    def get_by_id(self, pk, fresh=False):
+        """
+        Instance by primary key. ``fresh`` checks the shared version first (one cache read), for
+        callers that store what they read; an id missing from the local copy is re-checked the same way.
+        """
+        obj = self._tables(fresh)[0].get(pk)
+        if obj is None and pk is not None and not fresh:
+            obj = self._tables(fresh=True)[0].get(pk)
+        return obj
+
+    def get_by_name(self, name):
+        return self._tables()[1].get(name)
+
+    def all(self):
+        return list(self._tables()[0].values())
+
+    def name_to_id(self):
+        return {name: obj.pk for name, obj in self._tables()[1].items()}
+
+    def invalidate(self):
+        """Bumps the shared version and drops this process's copy."""
+        try:
+            cache.incr(self.version_key)
+        except ValueError:
+            cache.set(self.version_key, 2, timeout=None)
+        with self._lock:
+            self._local = None
+
+
+manufacturers = LookupTableCache(Manufacturer)
+dosage_forms = LookupTableCache(DosageForm)
+active_ingredients = LookupTableCache(ActiveIngredient)
+atc_classes = LookupTableCache(ATCClass, name_field='code')
+
+LOOKUP_CACHES = {table.model: table for table in (manufacturers, dosage_forms, active_ingredients, atc_classes)}
@@ -0,0 +1,43 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from catalog.importer import DEFAULT_CHUNK_SIZE, CatalogImporter, read_rows
+
+FORMATS_BY_SUFFIX = {'.csv': 'csv', '.ndjson': 'ndjson', '.jsonl': 'ndjson'}
+
+
+class Command(BaseCommand):
+    help = "Streams a CSV or NDJSON drug list into the catalog, upserting in chunks."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV or NDJSON file to import.")
+        parser.add_argument('--format', choices=['csv', 'ndjson'],
+                            help="Input format (default: guessed from the file extension).")
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        fmt = options['format'] or FORMATS_BY_SUFFIX.get(path.suffix.lower())
+        if fmt is None:
+            raise CommandError("Cannot guess the input format; pass --format.")
+        if not path.exists():
+            raise CommandError(f"{path} does not exist.")
+
+        def report_error(row, exc):
+            label = row.get('brand_name') if isinstance(row, dict) else row[:80]
+            self.stderr.write(f"Skipped row {label!r}: {exc}")
+
+        total = skipped = 0
+        seconds = 0.0
+        importer = CatalogImporter(chunk_size=options['chunk_size'])
+        with path.open(newline='', encoding='utf-8-sig') as stream:
+            for stats in importer.run(read_rows(stream, fmt), on_error=report_error):
+                total += stats.rows
+                skipped += stats.skipped
+                seconds += stats.seconds
+                self.stdout.write(
+                    f"chunk {stats.number}: {stats.rows} rows in {stats.seconds:.2f}s "
+                    f"({stats.rows_per_second:,.0f} rows/s)"
+                )
+        self.stdout.write(self.style.SUCCESS(f"Imported {total} rows ({skipped} skipped) in {seconds:.1f}s."))
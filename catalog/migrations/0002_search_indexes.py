@@ -0,0 +1,51 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:00
+
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+from catalog.search import ARABIC_FOLD_FROM, ARABIC_FOLD_TO
+
+FOLD = f"translate(lower({{column}}), '{ARABIC_FOLD_FROM}', '{ARABIC_FOLD_TO}')"
+
+# (index name, table, index definition); must stay in sync with catalog.search.Fold / ProductDocument
+SEARCH_INDEXES = [
+    ('catalog_product_brand_trgm_idx', 'catalog_product',
+     f"USING gin (({FOLD.format(column='brand_name')}) gin_trgm_ops)"),
+    ('catalog_manufacturer_name_trgm_idx', 'catalog_manufacturer',
+     f"USING gin (({FOLD.format(column='name')}) gin_trgm_ops)"),
+    ('catalog_ingredient_name_trgm_idx', 'catalog_activeingredient',
+     f"USING gin (({FOLD.format(column='name')}) gin_trgm_ops)"),
+    ('catalog_atcclass_name_trgm_idx', 'catalog_atcclass',
+     f"USING gin (({FOLD.format(column='name')}) gin_trgm_ops)"),
+    ('catalog_atcclass_code_prefix_idx', 'catalog_atcclass',
+     "(UPPER(code::text) text_pattern_ops)"),
+    ('catalog_product_document_idx', 'catalog_product',
+     "USING gin (to_tsvector('simple'::regconfig, COALESCE(brand_name, '') || ' ' || COALESCE(description, '')))"),
+]
+
+
+def create_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, table, definition in SEARCH_INDEXES:
+        schema_editor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} {definition}")
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _, _ in SEARCH_INDEXES:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0001_initial'),
+    ]
+
+    operations = [
+        # No-op outside PostgreSQL
+        TrigramExtension(),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
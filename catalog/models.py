@@ -122,4 +122,8 @@ class ProductVariant(models.Model):
         verbose_name_plural = _("Product Variants")
 
     def __str__(self):
-        return f"{self.product.brand_name} - {self.strength_text} ({self.dosage_form.name})"
\ No newline at end of file
+        from .lookups import dosage_forms
+
+        # The dosage form comes from the lookup table cache, not a query (or join) per variant
+        dosage_form = dosage_forms.get_by_id(self.dosage_form_id) or self.dosage_form
+        return f"{self.product.brand_name} - {self.strength_text} ({dosage_form.name})"
\ No newline at end of file
@@ -0,0 +1,164 @@
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVectorField, TrigramWordSimilarity
+from django.db import connection
+from django.db.models import CharField, F, FloatField, Func, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest, Length, Lower
+
+from .models import ActiveIngredient, ATCClass, Manufacturer, Product, ProductIngredient, ProductVariant
+
+# Arabic letter folding: hamza/madda forms of alef -> bare alef, taa marbuta -> haa, alef maqsura -> yaa.
+# Characters past the end of ARABIC_FOLD_TO (the tashkeel/diacritics) are deleted, exactly like SQL translate().
+ARABIC_FOLD_FROM = 'أإآٱةى' + 'ًٌٍَُِّْـ'
+ARABIC_FOLD_TO = 'ااااهي'
+_FOLD_TABLE = str.maketrans(
+    ARABIC_FOLD_FROM[:len(ARABIC_FOLD_TO)], ARABIC_FOLD_TO, ARABIC_FOLD_FROM[len(ARABIC_FOLD_TO):]
+)
+
+SEARCH_LIMIT = 20
+AUTOCOMPLETE_LIMIT = 10
+
+
+def normalize_query(text):
+    """Lower-cases, folds Arabic letter variants, strips diacritics and collapses whitespace."""
+    return re.sub(r'\s+', ' ', (text or '').lower().translate(_FOLD_TABLE)).strip()
+
+
+class Fold(Func):
+    """
+    SQL counterpart of normalize_query(): translate(lower(col), ...). The trigram indexes created in
+    catalog/migrations/0002 are built on this exact expression, so lookups through it can use them.
+    SQLite has no translate(), so it only lower-cases (enough for the plain-table fallback in tests).
+    """
+    function = 'translate'
+    output_field = CharField()
+
+    def __init__(self, expression):
+        super().__init__(Lower(expression), Value(ARABIC_FOLD_FROM), Value(ARABIC_FOLD_TO))
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return compiler.compile(self.source_expressions[0])
+
+
+class ProductDocument(Func):
+    """Full-text document of a product; identical to the expression behind catalog_product_document_idx."""
+    template = "to_tsvector('simple'::regconfig, COALESCE(%(expressions)s, ''))"
+    arg_joiner = ", '') || ' ' || COALESCE("
+    output_field = SearchVectorField()
+
+    def __init__(self, brand_name, description):
+        super().__init__(brand_name, description)
+
+
+def _base_queryset():
+    # Manufacturer and dosage form names come from the lookup caches (see ProductVariantSerializer)
+    return ProductVariant.objects.select_related('product')
+
+
+# ==========================
+# 1. RANKED SEARCH
+# ==========================
+
+def _candidate_products(match, text_query=None, term=''):
+    """
+    Ids of the products matching in any searched table, as a UNION of one query per table.
+    ``match(queryset, field)`` filters one table on one name column, so each branch of the UNION
+    is served by that table's own index; an OR across joined tables would filter every variant.
+    """
+    candidates = [
+        match(Product.objects.all(), 'brand_name').values('pk'),
+        Product.objects.filter(manufacturer_id__in=match(Manufacturer.objects.all(), 'name').values('pk')).values('pk'),
+        Product.objects.filter(atc_class_id__in=match(ATCClass.objects.all(), 'name').values('pk')).values('pk'),
+        Product.objects.filter(atc_class_id__in=ATCClass.objects.filter(code__istartswith=term).values('pk'))
+        .values('pk'),
+        ProductIngredient.objects.filter(ingredient_id__in=match(ActiveIngredient.objects.all(), 'name').values('pk'))
+        .values('product_id'),
+    ]
+    if text_query is not None:
+        candidates.append(
+            Product.objects.annotate(document=ProductDocument(F('brand_name'), F('description')))
+            .filter(document=text_query).values('pk')
+        )
+    return candidates[0].union(*candidates[1:])
+
+
+def search_variants(query, limit=SEARCH_LIMIT):
+    """
+    Ranked, typo-tolerant search over brand, manufacturer, active ingredient and ATC class.
+
+    Returns ProductVariant rows (with their product joined) in one query, best match first, each
+    annotated with ``rank``. On PostgreSQL matching uses pg_trgm word similarity on the folded
+    names plus full-text search on brand and description; the candidate products are collected
+    first (see _candidate_products) and only their variants are joined and ranked.
+    """
+    term = normalize_query(query)
+    if not term:
+        return ProductVariant.objects.none()
+    if connection.vendor != 'postgresql':
+        return _fallback_search(term)[:limit]
+
+    ingredient_similarity = Subquery(
+        ProductIngredient.objects.filter(product=OuterRef('product'))
+        .annotate(folded=Fold('ingredient__name'))
+        .filter(folded__trigram_word_similar=term)
+        .annotate(similarity=TrigramWordSimilarity(term, Fold('ingredient__name')))
+        .order_by('-similarity').values('similarity')[:1],
+        output_field=FloatField(),
+    )
+    text_query = SearchQuery(term, config='simple', search_type='websearch')
+    candidates = _candidate_products(
+        lambda queryset, field: queryset.annotate(folded=Fold(field)).filter(folded__trigram_word_similar=term),
+        text_query, term,
+    )
+
+    return (
+        _base_queryset()
+        .filter(product_id__in=candidates)
+        .annotate(
+            brand_folded=Fold('product__brand_name'),
+            manufacturer_folded=Fold('product__manufacturer__name'),
+            atc_folded=Fold('product__atc_class__name'),
+            document=ProductDocument(F('product__brand_name'), F('product__description')),
+        )
+        .annotate(rank=Greatest(
+            TrigramWordSimilarity(term, 'brand_folded'),
+            Coalesce(ingredient_similarity, 0.0) * 0.9,
+            TrigramWordSimilarity(term, 'manufacturer_folded') * 0.6,
+            Coalesce(TrigramWordSimilarity(term, 'atc_folded'), 0.0) * 0.5,
+            SearchRank(F('document'), text_query),
+        ))
+        .order_by('-rank', 'product__brand_name', 'pk')[:limit]
+    )
+
+
+def _fallback_search(term):
+    """Substring matching for non-PostgreSQL databases (development and tests only)."""
+    candidates = _candidate_products(
+        lambda queryset, field: queryset.filter(**{f'{field}__icontains': term}), term=term,
+    )
+    return (
+        _base_queryset()
+        .filter(product_id__in=candidates)
+        .annotate(rank=Value(1.0, output_field=FloatField()))
+        .order_by('product__brand_name', 'pk')
+    )
+
+
+# ==========================
+# 2. SEARCH-AS-YOU-TYPE
+# ==========================
+
+def autocomplete_variants(prefix, limit=AUTOCOMPLETE_LIMIT):
+    """
+    Variants whose (folded) brand name starts with ``prefix``, shortest brand first.
+    The LIKE 'prefix%' is served by the trigram index on the folded brand name.
+    """
+    term = normalize_query(prefix)
+    if not term:
+        return ProductVariant.objects.none()
+    return (
+        _base_queryset()
+        .annotate(brand_folded=Fold('product__brand_name'))
+        .filter(brand_folded__startswith=term)
+        .order_by(Length('product__brand_name'), 'product__brand_name', 'pk')[:limit]
+    )
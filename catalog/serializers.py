@@ -0,0 +1,26 @@
+from rest_framework import serializers
+
+from .lookups import dosage_forms, manufacturers
+from .models import ProductVariant
+
+
+class ProductVariantSerializer(serializers.ModelSerializer):
+    """
+    Flat, read-only variant record for search results and listings. Manufacturer and dosage form
+    names come from the lookup table caches, so the rows only need their product.
+    """
+    brand_name = serializers.CharField(source='product.brand_name', read_only=True)
+    manufacturer = serializers.SerializerMethodField()
+    dosage_form = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ProductVariant
+        fields = ['id', 'brand_name', 'manufacturer', 'dosage_form', 'strength_text', 'pack_size',
+                  'barcode_gtin', 'is_prescription_only', 'is_otc']
+        read_only_fields = fields
+
+    def get_manufacturer(self, variant):
+        return manufacturers.get_by_id(variant.product.manufacturer_id).name
+
+    def get_dosage_form(self, variant):
+        return dosage_forms.get_by_id(variant.dosage_form_id).name
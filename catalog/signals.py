@@ -0,0 +1,92 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .barcode import invalidate_barcodes
+from .detail import invalidate_variant_details
+from .lookups import LOOKUP_CACHES
+from .models import ActiveIngredient, ATCClass, DosageForm, Manufacturer, Product, ProductIngredient, ProductVariant
+
+# Note: queryset.update()/bulk_create() do not send these signals; callers doing bulk writes
+# on these models must call invalidate_barcodes() / invalidate_variant_details() /
+# LookupTableCache.invalidate() themselves.
+
+
+@receiver(pre_save, sender=ProductVariant)
+def remember_previous_barcode(sender, instance, **kwargs):
+    """Keeps the barcode being replaced so its cache entry can be dropped too."""
+    instance._previous_barcode = None
+    if instance.pk:
+        instance._previous_barcode = (
+            sender.objects.filter(pk=instance.pk).values_list('barcode_gtin', flat=True).first()
+        )
+
+
+def _invalidate_on_commit(gtins=(), variant_ids=()):
+    """
+    Drops cached barcodes / product details once the write commits. Dropping them earlier would let a
+    concurrent reader cache the old row again before the commit.
+    """
+    gtins, variant_ids = {gtin for gtin in gtins if gtin}, list(variant_ids)
+    if gtins or variant_ids:
+        transaction.on_commit(lambda: (invalidate_barcodes(gtins), invalidate_variant_details(variant_ids)))
+
+
+@receiver([post_save, post_delete], sender=Manufacturer)
+@receiver([post_save, post_delete], sender=DosageForm)
+@receiver([post_save, post_delete], sender=ActiveIngredient)
+@receiver([post_save, post_delete], sender=ATCClass)
+def bump_lookup_table_version(sender, instance, **kwargs):
+    # Connected before the detail receivers: detail cards are refilled from the lookup caches, so
+    # the new version must be visible before the cards are dropped.
+    # After commit, so no other process can reload (and cache) the pre-write table under the new version
+    transaction.on_commit(LOOKUP_CACHES[sender].invalidate)
+
+
+@receiver([post_save, post_delete], sender=ProductVariant)
+def invalidate_variant_barcode(sender, instance, **kwargs):
+    _invalidate_on_commit({instance.barcode_gtin, getattr(instance, '_previous_barcode', None)}, [instance.pk])
+
+
+@receiver([post_save, post_delete], sender=Product)
+def invalidate_product_barcodes(sender, instance, **kwargs):
+    variants = list(ProductVariant.objects.filter(product=instance).values_list('pk', 'barcode_gtin'))
+    _invalidate_on_commit((gtin for _, gtin in variants), (pk for pk, _ in variants))
+
+
+@receiver([post_save, post_delete], sender=ProductIngredient)
+def invalidate_ingredient_details(sender, instance, **kwargs):
+    _invalidate_on_commit(
+        variant_ids=ProductVariant.objects.filter(product_id=instance.product_id).values_list('pk', flat=True)
+    )
+
+
+@receiver([post_save, post_delete], sender=DosageForm)
+def invalidate_dosage_form_barcodes(sender, instance, **kwargs):
+    variants = list(ProductVariant.objects.filter(dosage_form=instance).values_list('pk', 'barcode_gtin'))
+    _invalidate_on_commit((gtin for _, gtin in variants), (pk for pk, _ in variants))
+
+
+@receiver([post_save, post_delete], sender=Manufacturer)
+def invalidate_manufacturer_details(sender, instance, **kwargs):
+    _invalidate_on_commit(
+        variant_ids=ProductVariant.objects.filter(product__manufacturer=instance).values_list('pk', flat=True)
+    )
+
+
+@receiver(post_save, sender=ActiveIngredient)
+def invalidate_active_ingredient_details(sender, instance, **kwargs):
+    # Deletes cascade to ProductIngredient, whose own receiver drops the cards
+    _invalidate_on_commit(
+        variant_ids=ProductVariant.objects.filter(product__active_ingredients=instance)
+        .values_list('pk', flat=True).distinct()
+    )
+
+
+@receiver([post_save, pre_delete], sender=ATCClass)
+def invalidate_atc_class_details(sender, instance, **kwargs):
+    # pre_delete: the delete nulls Product.atc_class with an UPDATE, which sends no signal
+    _invalidate_on_commit(
+        variant_ids=ProductVariant.objects.filter(product__atc_class=instance).values_list('pk', flat=True)
+    )
+
@@ -1,3 +1,259 @@
+import io
+import json
+import tempfile
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
 from django.test import TestCase
+from django.urls import reverse
+
+from inventory.models import Branch, Company, StockLevel
+from orders.models import Review
+
+from .barcode import local_cache, resolve_barcode
+from .detail import variant_detail
+from .lookups import dosage_forms, manufacturers
+from .models import ActiveIngredient, ATCClass, DosageForm, Manufacturer, Product, ProductIngredient, ProductVariant
+from .search import autocomplete_variants, normalize_query, search_variants
+
+
+class CatalogTestData(TestCase):
+    """Shared fixture: two products from one manufacturer."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manufacturer = Manufacturer.objects.create(name='GSK')
+        cls.tablet = DosageForm.objects.create(name='Tablet')
+        cls.paracetamol = ActiveIngredient.objects.create(name='Paracetamol')
+        cls.panadol = Product.objects.create(brand_name='Panadol', manufacturer=cls.manufacturer)
+        cls.augmentin = Product.objects.create(brand_name='Augmentin', manufacturer=cls.manufacturer)
+        ProductIngredient.objects.create(product=cls.panadol, ingredient=cls.paracetamol, strength='500 mg')
+        cls.panadol_variant = ProductVariant.objects.create(
+            product=cls.panadol, dosage_form=cls.tablet, strength_text='500 mg', pack_size=24, barcode_gtin='111')
+        cls.augmentin_variant = ProductVariant.objects.create(
+            product=cls.augmentin, dosage_form=cls.tablet, strength_text='1 g', pack_size=14, barcode_gtin='222')
+
+
+class CatalogSearchTests(CatalogTestData):
+
+    def test_arabic_letter_variants_and_diacritics_are_folded(self):
+        self.assertEqual(normalize_query('  أُوجمِنتين   إيبوبروفين '), 'اوجمنتين ايبوبروفين')
+
+    def test_search_matches_ingredient_and_returns_variants_in_one_query(self):
+        with self.assertNumQueries(1):
+            results = list(search_variants('paracetamol'))
+        self.assertEqual(results, [self.panadol_variant])
+        self.assertEqual(results[0].product.manufacturer.name, 'GSK')
+
+    def test_each_table_is_matched_in_its_own_union_branch(self):
+        Product.objects.filter(pk=self.augmentin.pk).update(
+            atc_class=ATCClass.objects.create(code='J01CR02', name='Amoxicillin'))
+
+        self.assertEqual(list(search_variants('gsk')), [self.augmentin_variant, self.panadol_variant])
+        self.assertEqual(list(search_variants('j01')), [self.augmentin_variant])
+        self.assertIn(' UNION ', str(search_variants('gsk').query))
+
+    def test_autocomplete_by_brand_prefix(self):
+        self.assertEqual(list(autocomplete_variants('aug')), [self.augmentin_variant])
+        self.assertEqual(list(autocomplete_variants('   ')), [])
+
+    def test_search_endpoint(self):
+        response = self.client.get(reverse('catalog:variant-search'), {'q': 'panadol'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['brand_name'] for row in response.json()], ['Panadol'])
+
+
+class BarcodeCacheTests(CatalogTestData):
+
+    def setUp(self):
+        cache.clear()
+        local_cache.clear()
+
+    def test_second_scan_is_served_without_queries(self):
+        with self.assertNumQueries(1):
+            resolve_barcode('111')
+        local_cache.clear()
+        with self.assertNumQueries(0):
+            record = resolve_barcode('111')
+        self.assertIn('"brand_name":"Panadol"', record)
+
+    def test_unknown_barcode_is_negatively_cached(self):
+        self.assertIsNone(resolve_barcode('999'))
+        with self.assertNumQueries(0):
+            self.assertIsNone(resolve_barcode('999'))
+
+    def test_product_and_barcode_changes_invalidate_entries(self):
+        resolve_barcode('111')
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.panadol.brand_name = 'Panadol Extra'
+            self.panadol.save()
+            # Nothing is dropped before the commit, so no reader can re-cache the old row afterwards
+            self.assertNotIn('Panadol Extra', resolve_barcode('111'))
+        self.assertEqual(len(callbacks), 1)
+        self.assertIn('Panadol Extra', resolve_barcode('111'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.panadol_variant.barcode_gtin = '333'
+            self.panadol_variant.save()
+        self.assertIsNone(resolve_barcode('111'))
+        self.assertIsNotNone(resolve_barcode('333'))
+
+    def test_barcode_endpoint(self):
+        response = self.client.get(reverse('catalog:barcode-lookup', args=['111']))
+        self.assertEqual(response.json()['id'], self.panadol_variant.pk)
+        self.assertEqual(self.client.get(reverse('catalog:barcode-lookup', args=['999'])).status_code, 404)
+
+
+class VariantDetailTests(CatalogTestData):
+
+    def setUp(self):
+        cache.clear()
+
+    async def test_detail_combines_card_stock_and_rating(self):
+        owner = await User.objects.acreate(username='owner')
+        company = await Company.objects.acreate(type='pharmacy', name='Pharma', owner=owner)
+        for name, qty in (('A', 5), ('B', 0)):
+            branch = await Branch.objects.acreate(company=company, name=name)
+            await StockLevel.objects.acreate(branch=branch, variant=self.panadol_variant, qty_on_hand=qty)
+        for rating in (4, 5):
+            await Review.objects.acreate(variant=self.panadol_variant, rating=rating, comment='ok')
+
+        detail = await variant_detail(self.panadol_variant.pk)
+
+        self.assertEqual(detail['manufacturer']['name'], 'GSK')
+        self.assertEqual(detail['ingredients'], [{'name': 'Paracetamol', 'strength': '500 mg'}])
+        self.assertEqual(detail['stock'], {'units': 5, 'branches': 1})
+        self.assertEqual(detail['rating'], {'average': 4.5, 'count': 2})
+        self.assertIsNone(await variant_detail(0))
+
+    def test_card_is_cached_until_the_product_changes(self):
+        url = reverse('catalog:variant-detail', args=[self.panadol_variant.pk])
+        self.client.get(url)
+        with self.assertNumQueries(2):  # stock and rating only
+            self.assertEqual(self.client.get(url).json()['brand_name'], 'Panadol')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ProductIngredient.objects.filter(product=self.panadol).get().delete()
+        self.assertEqual(self.client.get(url).json()['ingredients'], [])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.panadol.brand_name = 'Panadol Extra'
+            self.panadol.save()
+        self.assertEqual(self.client.get(url).json()['brand_name'], 'Panadol Extra')
+
+    def test_card_is_dropped_when_its_atc_class_or_ingredient_changes(self):
+        atc = ATCClass.objects.create(code='N02BE01', name='Paracetamol')
+        Product.objects.filter(pk=self.panadol.pk).update(atc_class=atc)
+        url = reverse('catalog:variant-detail', args=[self.panadol_variant.pk])
+        self.client.get(url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.paracetamol.name = 'Acetaminophen'
+            self.paracetamol.save()
+        self.assertEqual(self.client.get(url).json()['ingredients'][0]['name'], 'Acetaminophen')
+        with self.captureOnCommitCallbacks(execute=True):
+            atc.code = 'N02BE51'
+            atc.save()
+        self.assertEqual(self.client.get(url).json()['atc_code'], 'N02BE51')
+        with self.captureOnCommitCallbacks(execute=True):
+            atc.delete()
+        self.assertIsNone(self.client.get(url).json()['atc_code'])
+
+    async def test_endpoint_under_async_client(self):
+        response = await self.async_client.get(reverse('catalog:variant-detail', args=[self.augmentin_variant.pk]))
+        self.assertEqual(response.json()['rating'], {'average': None, 'count': 0})
+        response = await self.async_client.get(reverse('catalog:variant-detail', args=[0]))
+        self.assertEqual(response.status_code, 404)
+
+
+class ImportCatalogCommandTests(CatalogTestData):
+
+    def run_import(self, name, content, **options):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / name
+            path.write_text(content, encoding='utf-8')
+            out, err = io.StringIO(), io.StringIO()
+            call_command('import_catalog', str(path), stdout=out, stderr=err, **options)
+        return out.getvalue(), err.getvalue()
+
+    def test_csv_rows_are_upserted_in_chunks(self):
+        content = (
+            "brand_name,manufacturer,dosage_form,strength_text,pack_size,barcode_gtin,ingredients,is_otc\n"
+            "Panadol,GSK,Tablet,500 mg,24,111,Paracetamol:500 mg,yes\n"
+            "Brufen,Abbott,Tablet,400 mg,30,444,Ibuprofen:400 mg,no\n"
+            "Brufen,Abbott,Syrup,100 mg/5 ml,1,555,Ibuprofen:100 mg/5 ml,no\n"
+            "Broken,,Tablet,1 mg,1,,,\n"
+        )
+        out, err = self.run_import('drugs.csv', content, chunk_size=2)
+
+        self.assertIn('chunk 2', out)
+        self.assertIn('Skipped', err)
+        self.panadol_variant.refresh_from_db()
+        self.assertTrue(self.panadol_variant.is_otc)
+        self.assertEqual(ProductVariant.objects.filter(product__brand_name='Brufen').count(), 2)
+        self.assertEqual(Product.objects.get(brand_name='Brufen').manufacturer.name, 'Abbott')
+        self.assertEqual(ProductIngredient.objects.get(product__brand_name='Brufen').ingredient.name, 'Ibuprofen')
+
+    def test_ndjson_rows_with_ingredient_objects(self):
+        row = {'brand_name': 'Augmentin', 'manufacturer': 'GSK', 'dosage_form': 'Tablet', 'strength_text': '1 g',
+               'pack_size': 14, 'barcode_gtin': '999', 'atc_code': 'J01CR02', 'atc_name': 'Amoxicillin',
+               'ingredients': [{'name': 'Amoxicillin', 'strength': '875 mg'}]}
+        self.run_import('drugs.ndjson', json.dumps(row) + '\n')
+
+        self.augmentin_variant.refresh_from_db()
+        self.assertEqual(self.augmentin_variant.barcode_gtin, '999')
+        self.assertEqual(Product.objects.get(pk=self.augmentin.pk).atc_class.code, 'J01CR02')
+
+
+    def test_bad_rows_are_reported_without_aborting_the_chunk(self):
+        good = {'brand_name': 'Brufen', 'manufacturer': 'Abbott', 'dosage_form': 'Tablet', 'strength_text': '400 mg',
+                'pack_size': 30, 'barcode_gtin': '444', 'ingredients': [{'name': 'Ibuprofen'}]}
+        clash = {**good, 'brand_name': 'Copy', 'manufacturer': 'Copycat', 'barcode_gtin': '111'}  # Panadol's barcode
+        malformed = {**good, 'brand_name': 'Odd', 'ingredients': [{'strength': '1 mg'}]}
+        content = ''.join(json.dumps(row) + '\n' for row in (clash, good, malformed)) + '{"brand_name": \n'
+
+        out, err = self.run_import('drugs.ndjson', content)
+
+        self.assertIn('Imported 1 rows (3 skipped)', out)
+        self.assertEqual(err.count('Skipped row'), 3)
+        self.assertEqual(ProductVariant.objects.get(barcode_gtin='444').product.brand_name, 'Brufen')
+        self.assertFalse(Product.objects.filter(brand_name__in=['Copy', 'Odd']).exists())
+        self.assertFalse(Manufacturer.objects.filter(name='Copycat').exists())
+
+
+class LookupTableCacheTests(CatalogTestData):
+
+    def setUp(self):
+        cache.clear()
+        manufacturers.invalidate()
+
+    def test_lookups_are_served_from_memory_after_first_load(self):
+        self.assertEqual(manufacturers.get_by_name('GSK').pk, self.manufacturer.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(manufacturers.get_by_id(self.manufacturer.pk).name, 'GSK')
+            self.assertIsNone(manufacturers.get_by_name('Unknown'))
+
+    def test_save_bumps_version_after_commit(self):
+        manufacturers.get_by_name('GSK')
+        with self.captureOnCommitCallbacks(execute=True):
+            Manufacturer.objects.create(name='Pfizer')
+        self.assertIsNotNone(manufacturers.get_by_name('Pfizer'))
+
+    def test_read_paths_take_lookup_names_from_the_caches(self):
+        self.client.get(reverse('catalog:variant-search'), {'q': 'panadol'})  # loads the lookup tables
+        variant = ProductVariant.objects.select_related('product').get(pk=self.panadol_variant.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(str(variant), 'Panadol - 500 mg (Tablet)')
+
+        with self.assertNumQueries(1):
+            rows = self.client.get(reverse('catalog:variant-search'), {'q': 'panadol'}).json()
+        self.assertEqual((rows[0]['manufacturer'], rows[0]['dosage_form']), ('GSK', 'Tablet'))
 
-# Create your tests here.
+    def test_other_tables_are_not_reloaded(self):
+        dosage_forms.get_by_name('Tablet')
+        with self.captureOnCommitCallbacks(execute=True):
+            Manufacturer.objects.create(name='Pfizer')
+        with self.assertNumQueries(0):
+            dosage_forms.get_by_name('Tablet')
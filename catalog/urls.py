@@ -0,0 +1,12 @@
+from django.urls import path
+
+from . import views
+
+app_name = 'catalog'
+
+urlpatterns = [
+    path('search/', views.VariantSearchView.as_view(), name='variant-search'),
+    path('autocomplete/', views.VariantAutocompleteView.as_view(), name='variant-autocomplete'),
+    path('barcode/<str:gtin>/', views.BarcodeLookupView.as_view(), name='barcode-lookup'),
+    path('variants/<int:pk>/', views.VariantDetailView.as_view(), name='variant-detail'),
+]
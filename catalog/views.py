@@ -1,3 +1,55 @@
-from django.shortcuts import render
+from adrf.views import APIView as AsyncAPIView
+from django.http import HttpResponse
+from rest_framework.response import Response
+from rest_framework.views import APIView
 
-# Create your views here.
+from .barcode import resolve_barcode
+from .detail import variant_detail
+from .search import AUTOCOMPLETE_LIMIT, SEARCH_LIMIT, autocomplete_variants, search_variants
+from .serializers import ProductVariantSerializer
+
+# Hard cap on ?limit= for the search endpoints
+MAX_SEARCH_LIMIT = 50
+
+
+def _limit(request, default):
+    try:
+        return max(1, min(int(request.query_params.get('limit', default)), MAX_SEARCH_LIMIT))
+    except ValueError:
+        return default
+
+
+class VariantSearchView(APIView):
+    """GET ?q=<text>&limit=<n>: ranked variant search (brand, ingredient, manufacturer, ATC)."""
+
+    def get(self, request):
+        variants = search_variants(request.query_params.get('q', ''), limit=_limit(request, SEARCH_LIMIT))
+        return Response(ProductVariantSerializer(variants, many=True).data)
+
+
+class VariantAutocompleteView(APIView):
+    """GET ?q=<prefix>&limit=<n>: search-as-you-type on brand names."""
+
+    def get(self, request):
+        variants = autocomplete_variants(request.query_params.get('q', ''), limit=_limit(request, AUTOCOMPLETE_LIMIT))
+        return Response(ProductVariantSerializer(variants, many=True).data)
+
+
+class BarcodeLookupView(APIView):
+    """GET /barcode/<gtin>/: POS scan resolution, served from the barcode cache without re-serializing."""
+
+    def get(self, request, gtin):
+        record = resolve_barcode(gtin)
+        if record is None:
+            return Response({'detail': 'Unknown barcode.'}, status=404)
+        return HttpResponse(record, content_type='application/json')
+
+
+class VariantDetailView(AsyncAPIView):
+    """GET /variants/<id>/: product detail page (card, ingredients, stock, rating), async under ASGI."""
+
+    async def get(self, request, pk):
+        detail = await variant_detail(pk)
+        if detail is None:
+            return Response({'detail': 'Unknown variant.'}, status=404)
+        return Response(detail)
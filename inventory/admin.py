@@ -1,3 +1,108 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import (
+    Branch, Company, ExpiryRisk, InventoryBatch, InventoryMovement, MovementCheckpoint, MovementPeriod, Prediction,
+    StockLevel, StockReservation,
+)
+
+# Branch.__str__ reads company; ProductVariant.__str__ reads product and dosage_form
+BRANCH = 'branch__company'
+VARIANT = ('variant__product',)  # ProductVariant.__str__ reads the dosage form from the lookup cache
+
+
+# ========================
+# 1. COMMERCIAL STRUCTURE
+# ========================
+
+@admin.register(Company)
+class CompanyAdmin(admin.ModelAdmin):
+    list_display = ('name', 'type', 'owner', 'license_no', 'is_active')
+    list_select_related = ('owner',)
+    list_filter = ('type', 'is_active')
+    search_fields = ('name', 'license_no')
+
+
+@admin.register(Branch)
+class BranchAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'shipping_available')
+    list_select_related = ('company',)
+    search_fields = ('name', 'company__name')
+    raw_id_fields = ('address',)
+
+
+# ========================
+# 2. INVENTORY & AUDIT
+# ========================
+
+@admin.register(InventoryBatch)
+class InventoryBatchAdmin(admin.ModelAdmin):
+    list_display = ('id', 'branch', 'variant', 'supplier', 'expiry_date', 'qty_on_hand', 'qty_reserved',
+                    'sale_price', 'is_available')
+    list_select_related = (BRANCH, *VARIANT, 'supplier')
+    list_filter = ('is_available',)
+    raw_id_fields = ('branch', 'variant', 'supplier')
+
+
+@admin.register(InventoryMovement)
+class InventoryMovementAdmin(admin.ModelAdmin):
+    list_display = ('created_at', 'batch', 'type', 'delta_qty', 'created_by')
+    list_select_related = ('batch', 'created_by')
+    list_filter = ('type',)
+    raw_id_fields = ('batch', 'created_by')
+
+    # The ledger is append-only and StockLevel follows it through record_movements(); the admin only reads
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(MovementPeriod)
+class MovementPeriodAdmin(admin.ModelAdmin):
+    list_display = ('start', 'end', 'movement_count', 'closed_at', 'archived_at', 'archive_path')
+    exclude = ('archive_index',)
+
+
+@admin.register(MovementCheckpoint)
+class MovementCheckpointAdmin(admin.ModelAdmin):
+    list_display = ('as_of', 'batch', 'qty')
+    list_select_related = ('batch',)
+    raw_id_fields = ('batch',)
+
+
+@admin.register(StockReservation)
+class StockReservationAdmin(admin.ModelAdmin):
+    list_display = ('batch', 'quantity', 'reference', 'expires_at')
+    list_select_related = ('batch',)
+    search_fields = ('reference',)
+    raw_id_fields = ('batch',)
+
+
+@admin.register(StockLevel)
+class StockLevelAdmin(admin.ModelAdmin):
+    list_display = ('branch', 'variant', 'qty_on_hand', 'updated_at')
+    list_select_related = (BRANCH, *VARIANT)
+    raw_id_fields = ('branch', 'variant')
+
+
+@admin.register(ExpiryRisk)
+class ExpiryRiskAdmin(admin.ModelAdmin):
+    list_display = ('branch', 'bucket_days', 'batch_count', 'units', 'cost_value', 'sale_value', 'computed_at')
+    list_select_related = (BRANCH,)
+    list_filter = ('bucket_days',)
+
+
+# ========================
+# 3. AI READINESS
+# ========================
+
+@admin.register(Prediction)
+class PredictionAdmin(admin.ModelAdmin):
+    list_display = ('branch', 'variant', 'horizon_days', 'predicted_demand', 'model_version', 'generated_at')
+    list_select_related = (BRANCH, *VARIANT)
+    list_filter = ('horizon_days', 'model_version')
+    raw_id_fields = ('branch', 'variant')
@@ -0,0 +1,114 @@
+from collections import defaultdict
+from dataclasses import dataclass, field
+
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import InventoryBatch
+
+
+# ==========================
+# FEFO BATCH ALLOCATION (FIRST-EXPIRY, FIRST-OUT)
+# ==========================
+
+@dataclass
+class AllocationResult:
+    """Outcome of an allocation run: the allocated order lines and the lines that could not be covered."""
+    allocated: list = field(default_factory=list)
+    # {order_item_id: missing quantity}
+    shortfalls: dict = field(default_factory=dict)
+
+
+def sellable_batches(branch_ids, variant_ids):
+    """Available, non-expired batches with free stock, earliest expiry first (served by inventory_batch_fefo_idx)."""
+    today = timezone.localdate()
+    return (
+        InventoryBatch.objects
+        .filter(branch_id__in=branch_ids, variant_id__in=variant_ids, is_available=True,
+                qty_on_hand__gt=F('qty_reserved'))
+        .filter(Q(expiry_date__isnull=True) | Q(expiry_date__gte=today))
+        .order_by('branch_id', 'variant_id', F('expiry_date').asc(nulls_last=True), 'id')
+    )
+
+
+def allocate_orders(orders):
+    """
+    Assigns InventoryBatch rows to every unallocated OrderItem of the given orders using FEFO.
+
+    Works on a whole order or a list of orders with a fixed number of queries: one to load the
+    lines, one to lock the candidate batches, then bulk writes for the items and reservations.
+    A line larger than any single batch is split into several OrderItem rows (one per batch).
+    Lines that cannot be fully covered are left untouched and reported in ``shortfalls``.
+    """
+    from orders.models import Order, OrderItem
+
+    from .availability import invalidate_availability
+
+    if isinstance(orders, Order):
+        orders = [orders]
+    order_ids = [order.pk for order in orders]
+    result = AllocationResult()
+    if not order_ids:
+        return result
+
+    with transaction.atomic():
+        items = list(
+            OrderItem.objects
+            .filter(order_id__in=order_ids, batch__isnull=True)
+            .select_related('order')
+            .order_by('order__placed_at', 'order_id', 'id')
+        )
+        if not items:
+            return result
+
+        branch_ids = {item.order.branch_id for item in items}
+        variant_ids = {item.variant_id for item in items}
+        pools = defaultdict(list)
+        for batch in sellable_batches(branch_ids, variant_ids).select_for_update():
+            batch.free_qty = batch.qty_on_hand - batch.qty_reserved
+            pools[(batch.branch_id, batch.variant_id)].append(batch)
+
+        reserved = defaultdict(int)
+        to_update, to_create = [], []
+        for item in items:
+            if item.quantity <= 0:
+                continue
+            pool = pools.get((item.order.branch_id, item.variant_id), [])
+            available = sum(batch.free_qty for batch in pool)
+            if available < item.quantity:
+                result.shortfalls[item.pk] = item.quantity - available
+                continue
+
+            remaining = item.quantity
+            splits = []
+            for batch in pool:
+                if remaining == 0:
+                    break
+                take = min(batch.free_qty, remaining)
+                if take == 0:
+                    continue
+                batch.free_qty -= take
+                reserved[batch] += take
+                remaining -= take
+                splits.append((batch, take))
+
+            first_batch, first_qty = splits[0]
+            item.batch, item.quantity = first_batch, first_qty
+            to_update.append(item)
+            for batch, qty in splits[1:]:
+                to_create.append(OrderItem(order=item.order, variant_id=item.variant_id, batch=batch,
+                                           quantity=qty, unit_price=item.unit_price))
+
+        if to_update:
+            OrderItem.objects.bulk_update(to_update, ['batch', 'quantity'])
+        if to_create:
+            OrderItem.objects.bulk_create(to_create)
+        if reserved:
+            for batch, qty in reserved.items():
+                batch.qty_reserved = F('qty_reserved') + qty
+            InventoryBatch.objects.bulk_update(list(reserved), ['qty_reserved'])
+            invalidate_availability(batch.branch_id for batch in reserved)
+
+        result.allocated = to_update + to_create
+    return result
@@ -0,0 +1,152 @@
+"""
+Multi-branch availability: "which of these variants are in stock at these branches, and at what
+best price", answered for the whole (branches x variants) matrix at once.
+
+Every answer is cached per (branch, variant) under the branch's availability version; the branch
+header (name, company, shipping) is cached the same way. Any write touching a branch's batches
+(save, reservation, allocation, sale, cancellation) calls ``invalidate_availability`` for it, which
+bumps the version after commit, so stale entries are never read again and simply expire. The
+local date is part of every key, so batches expiring overnight drop out without a write.
+
+A fully cached request costs two cache round trips (versions, then entries) and no queries; the
+misses are filled with one grouped query over sellable batches plus one branch query. They are
+gathered, but Django's async ORM still runs them one after the other on the sync thread.
+"""
+import asyncio
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Min, Sum
+from django.utils import timezone
+
+from .allocation import sellable_batches
+from .models import Branch
+
+# Most variants / branches one availability request may ask about
+MAX_VARIANTS = 50
+MAX_BRANCHES = 20
+KEY_PREFIX = 'inventory:availability'
+# Cached "branch not shown" header (unknown branch, or company inactive)
+HIDDEN_BRANCH = {}
+NOT_STOCKED = (0, None)
+
+
+def _version_key(branch_id):
+    return f'{KEY_PREFIX}:version:{branch_id}'
+
+
+def _fresh_version():
+    # Time based rather than 1, so a version key evicted from the cache never comes back as an old value
+    return time.time_ns() // 1000
+
+
+def _entry_key(branch_id, version, day, suffix):
+    return f'{KEY_PREFIX}:{branch_id}:v{version}:{day:%Y%m%d}:{suffix}'
+
+
+def _money(value):
+    """Prices as '12.50' strings, like the DecimalFields of the serializers (SQLite returns floats here)."""
+    return str(Decimal(str(value)).quantize(Decimal('0.01')))
+
+
+# ==========================
+# 1. VERSIONS
+# ==========================
+
+def _bump_versions(branch_ids):
+    for branch_id in branch_ids:
+        try:
+            cache.incr(_version_key(branch_id))
+        except ValueError:
+            cache.set(_version_key(branch_id), _fresh_version(), timeout=None)
+
+
+def invalidate_availability(branch_ids):
+    """Bumps the availability version of ``branch_ids`` once the current transaction commits."""
+    branch_ids = set(branch_ids)
+    if branch_ids:
+        transaction.on_commit(lambda: _bump_versions(branch_ids))
+
+
+async def branch_versions(branch_ids):
+    """{branch_id: version} in one cache round trip (plus one per branch never seen before)."""
+    keys = {_version_key(branch_id): branch_id for branch_id in branch_ids}
+    found = await cache.aget_many(keys)
+    for key in keys.keys() - found.keys():
+        await cache.aadd(key, _fresh_version(), timeout=None)
+        found[key] = await cache.aget(key)
+    return {branch_id: found[key] for key, branch_id in keys.items()}
+
+
+# ==========================
+# 2. QUERIES (MISSES ONLY)
+# ==========================
+
+async def _branches(branch_ids):
+    return {
+        branch['id']: branch
+        async for branch in Branch.objects
+        .filter(pk__in=branch_ids, company__is_active=True)
+        .values('id', 'name', 'shipping_available', company_name=F('company__name'))
+    }
+
+
+async def _free_stock(branch_ids, variant_ids):
+    """{(branch_id, variant_id): (free units, lowest sale price)} over sellable batches, one grouped query."""
+    return {
+        (row['branch_id'], row['variant_id']): (row['units'], _money(row['best_price']))
+        async for row in sellable_batches(branch_ids, variant_ids)
+        .order_by().values('branch_id', 'variant_id')
+        .annotate(units=Sum(F('qty_on_hand') - F('qty_reserved')), best_price=Min('sale_price'))
+    }
+
+
+async def _nothing():
+    return {}
+
+
+# ==========================
+# 3. THE MATRIX
+# ==========================
+
+async def branch_availability(variant_ids, branch_ids):
+    """
+    Per branch (active companies only, in the order asked), the free units and best price of every
+    requested variant it has in stock.
+    """
+    day = timezone.localdate()
+    versions = await branch_versions(branch_ids)
+    header_keys = {branch_id: _entry_key(branch_id, versions[branch_id], day, 'branch') for branch_id in branch_ids}
+    stock_keys = {
+        (branch_id, variant_id): _entry_key(branch_id, versions[branch_id], day, variant_id)
+        for branch_id in branch_ids for variant_id in variant_ids
+    }
+    cached = await cache.aget_many([*header_keys.values(), *stock_keys.values()])
+
+    missing_headers = [branch_id for branch_id, key in header_keys.items() if key not in cached]
+    missing_pairs = [pair for pair, key in stock_keys.items() if key not in cached]
+    if missing_headers or missing_pairs:
+        branches, stock = await asyncio.gather(
+            _branches(missing_headers) if missing_headers else _nothing(),
+            _free_stock({b for b, _ in missing_pairs}, {v for _, v in missing_pairs}) if missing_pairs else _nothing(),
+        )
+        fresh = {header_keys[branch_id]: branches.get(branch_id, HIDDEN_BRANCH) for branch_id in missing_headers}
+        fresh.update({stock_keys[pair]: stock.get(pair, NOT_STOCKED) for pair in missing_pairs})
+        await cache.aset_many(fresh, settings.AVAILABILITY_CACHE_TIMEOUT)
+        cached.update(fresh)
+
+    result = []
+    for branch_id in branch_ids:
+        header = cached[header_keys[branch_id]]
+        if not header:
+            continue
+        variants = []
+        for variant_id in variant_ids:
+            units, best_price = cached[stock_keys[branch_id, variant_id]]
+            if units:
+                variants.append({'variant_id': variant_id, 'units': units, 'best_price': best_price})
+        result.append({**header, 'variants': variants})
+    return result
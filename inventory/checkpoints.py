@@ -0,0 +1,276 @@
+"""
+Movement ledger compaction: monthly per-batch balance checkpoints, and archiving of old movements.
+
+``close_periods`` closes every finished month, oldest first. Months are UTC months, the same as
+the PostgreSQL partitions. A batch's balance at the end of a month is its previous checkpoint plus
+the month's movements, so closing a month costs one grouped query over that month. It never
+scans the whole history. The balances are written as MovementCheckpoint rows, one per batch
+holding stock.
+
+``archive_periods`` moves the raw movements of closed months older than the retention window
+into gzip NDJSON files on local disk and removes them from the table; on PostgreSQL it drops the
+month's partition. Each file is a series of gzip members holding whole batches. Its index of
+``[first batch id, byte offset]`` pairs is stored on the MovementPeriod, so a single batch can be
+read back without decompressing the whole month.
+
+``quantities_as_of`` answers "how many units did these batches hold at time T". It takes the
+checkpoint at the start of T's month, or at the end of the last closed month, and adds the
+movements from there up to T. That is a fixed number of queries however long the history is.
+When T falls in an archived month it also reads the matching members of that month's file.
+
+Movements are append-only and get ``created_at`` on insert, and record_movements refuses rows
+dated inside a closed month (``check_open``), so a closed month never changes.
+"""
+import bisect
+import datetime
+import gzip
+import json
+import os
+from collections import defaultdict
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, Min, Sum
+from django.utils import timezone
+
+from .exceptions import ClosedPeriod
+from .models import InventoryBatch, InventoryMovement, MovementCheckpoint, MovementPeriod
+from .partitions import MOVEMENT_TABLE, is_partitioned, month_start, next_month, partition_name
+
+# Movements committed this long after a month ended may still carry a timestamp from that month
+SETTLE_TIME = datetime.timedelta(hours=1)
+# Movements per gzip member of an archive file (members only end between batches)
+ARCHIVE_BLOCK_ROWS = 5000
+STREAM_CHUNK_SIZE = 5000
+CHECKPOINT_BATCH_SIZE = 1000
+
+
+def _utc(day):
+    return datetime.datetime.combine(day, datetime.time.min, tzinfo=datetime.timezone.utc)
+
+
+def _utc_month(moment):
+    """Start of the UTC month containing ``moment``."""
+    return _utc(month_start(moment.astimezone(datetime.timezone.utc).date()))
+
+
+def _previous_month(month):
+    return datetime.date(month.year - (month.month == 1), (month.month - 2) % 12 + 1, 1)
+
+
+# ==========================
+# 1. CHECKPOINTS
+# ==========================
+
+def _close_period(start, end):
+    with transaction.atomic():
+        balances = defaultdict(int, MovementCheckpoint.objects.filter(as_of=start).values_list('batch_id', 'qty'))
+        count = 0
+        for batch_id, delta, moves in (
+            InventoryMovement.objects.filter(created_at__gte=start, created_at__lt=end)
+            .order_by().values('batch_id').annotate(delta=Sum('delta_qty'), moves=Count('pk'))
+            .values_list('batch_id', 'delta', 'moves')
+        ):
+            balances[batch_id] += delta
+            count += moves
+        MovementCheckpoint.objects.bulk_create(
+            [MovementCheckpoint(batch_id=batch_id, as_of=end, qty=qty) for batch_id, qty in balances.items() if qty],
+            batch_size=CHECKPOINT_BATCH_SIZE,
+        )
+        return MovementPeriod.objects.create(start=start, end=end, movement_count=count, closed_at=timezone.now())
+
+
+def check_open(movements):
+    """
+    Raises ClosedPeriod if any of the just-inserted ``movements`` is dated before the end of the
+    newest closed period. Months are only closed once finished, so rows dated in the current UTC
+    month are accepted without a query.
+    """
+    earliest = min(movement.created_at for movement in movements)
+    if earliest >= _utc_month(timezone.now()):
+        return
+    closed_until = MovementPeriod.objects.order_by('-end').values_list('end', flat=True).first()
+    if closed_until is not None and earliest < closed_until:
+        raise ClosedPeriod(earliest, closed_until)
+
+
+def close_periods(now=None):
+    """Closes every finished month that is not closed yet, oldest first; returns the new MovementPeriods."""
+    now = now or timezone.now()
+    open_from = _utc_month(now - SETTLE_TIME)
+    last = MovementPeriod.objects.order_by('-end').first()
+    if last is not None:
+        start = last.end
+    else:
+        first = InventoryMovement.objects.aggregate(first=Min('created_at'))['first']
+        if first is None:
+            return []
+        start = _utc_month(first)
+
+    closed = []
+    while start < open_from:
+        closed.append(_close_period(start, _utc(next_month(start.date()))))
+        start = closed[-1].end
+    return closed
+
+
+# ==========================
+# 2. ARCHIVE FILES
+# ==========================
+
+def _write_archive(rows, path):
+    """
+    Writes movement rows (ordered by batch) to ``path`` as gzip NDJSON, one gzip member per block of
+    whole batches; returns (index, rows written). The file only appears once complete.
+    """
+    partial = path.with_name(path.name + '.part')
+    index, block, block_batch, previous_batch, count = [], [], None, None, 0
+    with open(partial, 'wb') as out:
+        for movement_id, batch_id, kind, delta, created_at, user_id in rows:
+            # Only split between batches, so each batch lies in the member its first id points to
+            if block and batch_id != previous_batch and len(block) >= ARCHIVE_BLOCK_ROWS:
+                index.append([block_batch, out.tell()])
+                out.write(gzip.compress(''.join(block).encode(), mtime=0))
+                block = []
+            if not block:
+                block_batch = batch_id
+            previous_batch = batch_id
+            block.append(json.dumps({
+                'id': movement_id, 'batch_id': batch_id, 'type': kind, 'delta_qty': delta,
+                'created_at': created_at.isoformat(), 'created_by_id': user_id,
+            }) + '\n')
+            count += 1
+        if block:
+            index.append([block_batch, out.tell()])
+            out.write(gzip.compress(''.join(block).encode(), mtime=0))
+        out.flush()
+        os.fsync(out.fileno())
+    os.replace(partial, path)
+    return index, count
+
+
+def _read_archive(period, batch_ids):
+    """Archived movement dicts of ``batch_ids`` in ``period``, decompressing only the members holding them."""
+    index = period.archive_index
+    firsts = [first for first, _ in index]
+    blocks = sorted({bisect.bisect_right(firsts, batch_id) - 1 for batch_id in batch_ids} - {-1})
+    with open(period.archive_path, 'rb') as archive:
+        for block in blocks:
+            offset = index[block][1]
+            archive.seek(offset)
+            size = index[block + 1][1] - offset if block + 1 < len(index) else -1
+            for line in gzip.decompress(archive.read(size)).splitlines():
+                row = json.loads(line)
+                if row['batch_id'] in batch_ids:
+                    yield row
+
+
+def _delete_movements(period):
+    if is_partitioned(connection):
+        # The month's partition holds exactly this period; dropping it avoids a bulk DELETE
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {connection.ops.quote_name(partition_name(period.start.date()))}")
+    # Rows that landed in the default partition (or the plain table)
+    InventoryMovement.objects.filter(created_at__gte=period.start, created_at__lt=period.end).delete()
+
+
+def _archive_period(period, directory):
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f'{MOVEMENT_TABLE}-{period.start:%Y-%m}.ndjson.gz'
+    rows = (
+        InventoryMovement.objects.filter(created_at__gte=period.start, created_at__lt=period.end)
+        .order_by('batch_id', 'created_at', 'pk')
+        .values_list('pk', 'batch_id', 'type', 'delta_qty', 'created_at', 'created_by_id')
+        .iterator(chunk_size=STREAM_CHUNK_SIZE)
+    )
+    index, count = _write_archive(rows, path)
+    if count != period.movement_count:
+        path.unlink()
+        raise ValueError(f"Period {period}: {count} movements found, {period.movement_count} were checkpointed")
+    with transaction.atomic():
+        _delete_movements(period)
+        period.archive_path, period.archive_index, period.archived_at = str(path), index, timezone.now()
+        period.save(update_fields=['archive_path', 'archive_index', 'archived_at'])
+    return period
+
+
+def archive_periods(retention_months=None, directory=None, now=None):
+    """
+    Archives the closed periods that ended more than ``retention_months`` whole months ago
+    (settings.MOVEMENT_RETENTION_MONTHS; 0 disables archiving), oldest first, and returns them.
+    Archiving in order keeps every movement older than the newest archived period out of the table.
+    """
+    retention = settings.MOVEMENT_RETENTION_MONTHS if retention_months is None else retention_months
+    if retention <= 0:
+        return []
+    directory = Path(directory or settings.MOVEMENT_ARCHIVE_DIR)
+    cutoff = month_start((now or timezone.now()).astimezone(datetime.timezone.utc).date())
+    for _ in range(retention):
+        cutoff = _previous_month(cutoff)
+    periods = MovementPeriod.objects.filter(archived_at__isnull=True, end__lte=_utc(cutoff)).order_by('start')
+    return [_archive_period(period, directory) for period in periods]
+
+
+def archive_horizon():
+    """End of the newest archived period: every movement before it lives in archive files only."""
+    period = MovementPeriod.objects.filter(archived_at__isnull=False).order_by('-end').first()
+    return period.end if period else None
+
+
+# ==========================
+# 3. POINT-IN-TIME QUANTITIES
+# ==========================
+
+def quantities_as_of(batch_ids, when):
+    """{batch_id: units held at ``when``} for ``batch_ids``: nearest checkpoint plus the movements after it."""
+    batch_ids = set(batch_ids)
+    quantities = dict.fromkeys(batch_ids, 0)
+    period = MovementPeriod.objects.filter(start__lte=when).order_by('-start').first()
+    if period is None:
+        since = None
+    elif period.end <= when:
+        since = period.end
+    else:
+        since = period.start
+
+    if since is not None:
+        quantities.update(
+            MovementCheckpoint.objects.filter(batch_id__in=batch_ids, as_of=since).values_list('batch_id', 'qty')
+        )
+    tail = InventoryMovement.objects.filter(batch_id__in=batch_ids, created_at__lt=when)
+    if since is not None:
+        tail = tail.filter(created_at__gte=since)
+    for batch_id, delta in tail.order_by().values('batch_id').annotate(delta=Sum('delta_qty')).values_list(
+        'batch_id', 'delta'
+    ):
+        quantities[batch_id] += delta
+
+    if period is not None and period.end > when and period.archived_at is not None:
+        for row in _read_archive(period, batch_ids):
+            if datetime.datetime.fromisoformat(row['created_at']) < when:
+                quantities[row['batch_id']] += row['delta_qty']
+    return quantities
+
+
+def branch_stock_as_of(branch_id, when):
+    """Batches of a branch that held stock at ``when``, with their quantities (batch id order)."""
+    batches = list(InventoryBatch.objects.filter(branch_id=branch_id).order_by('pk')
+                   .values_list('pk', 'variant_id', 'expiry_date'))
+    quantities = quantities_as_of([batch_id for batch_id, _, _ in batches], when)
+    return [
+        {'batch_id': batch_id, 'variant_id': variant_id, 'expiry_date': expiry_date, 'qty': quantities[batch_id]}
+        for batch_id, variant_id, expiry_date in batches if quantities[batch_id]
+    ]
+
+
+def archived_balances():
+    """{(branch_id, variant_id): units} moved by archived movements, i.e. the checkpoints at the archive horizon."""
+    horizon = archive_horizon()
+    if horizon is None:
+        return {}
+    return {
+        (row['batch__branch_id'], row['batch__variant_id']): row['qty']
+        for row in MovementCheckpoint.objects.filter(as_of=horizon).order_by()
+        .values('batch__branch_id', 'batch__variant_id').annotate(qty=Sum('qty'))
+    }
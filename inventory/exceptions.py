@@ -0,0 +1,34 @@
+class InsufficientStock(Exception):
+    """Raised when the requested quantity cannot be covered by sellable batches."""
+
+    def __init__(self, variant_id, requested, available=0):
+        self.variant_id = variant_id
+        self.requested = requested
+        self.available = available
+        super().__init__(f"Variant {variant_id}: requested {requested}, only {available} available")
+
+
+class UnknownBarcode(Exception):
+    """Raised when scanned barcodes match no product variant."""
+
+    def __init__(self, gtins):
+        self.gtins = list(gtins)
+        super().__init__(f"Unknown barcode(s): {', '.join(self.gtins)}")
+
+
+class NoFulfillingBranch(Exception):
+    """Raised when no branch near a shipping address can ship the whole cart."""
+
+    def __init__(self, address_id):
+        self.address_id = address_id
+        super().__init__(f"No branch near address {address_id} can ship the whole cart")
+
+
+class ClosedPeriod(Exception):
+    """Raised when movements are dated inside a month that is already closed (checkpointed)."""
+
+    def __init__(self, created_at, closed_until):
+        self.created_at = created_at
+        self.closed_until = closed_until
+        super().__init__(f"Movement dated {created_at.isoformat()} falls in a closed period "
+                         f"(closed until {closed_until.isoformat()})")
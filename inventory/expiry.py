@@ -0,0 +1,110 @@
+import datetime
+from dataclasses import dataclass
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, Count, DecimalField, ExpressionWrapper, F, IntegerField, Sum, Value, When
+from django.utils import timezone
+
+from .models import ExpiryRisk, InventoryBatch
+
+# Upper bounds (days from today) of the near-expiry buckets; a batch counts in the first bucket it fits
+EXPIRY_BUCKETS = (30, 60, 90)
+
+
+@dataclass
+class ExpiryScanResult:
+    flagged: int
+    changed: int
+    removed: int
+
+
+# ==========================
+# 1. EXPIRED STOCK
+# ==========================
+
+def at_risk_batches():
+    """Sellable batches with stock; every filter below is answered by inventory_batch_expiry_idx."""
+    return InventoryBatch.objects.filter(qty_on_hand__gt=0, is_available=True, expiry_date__isnull=False)
+
+
+def flag_expired_batches(today=None):
+    """Marks every expired batch still on sale as unavailable with a single UPDATE; returns the count."""
+    today = today or timezone.localdate()
+    return at_risk_batches().filter(expiry_date__lt=today).update(is_available=False)
+
+
+# ==========================
+# 2. NEAR-EXPIRY BUCKETS
+# ==========================
+
+def expiry_buckets(today=None):
+    """
+    {(branch_id, bucket_days): (batch_count, units, cost_value, sale_value)} in one grouped query
+    that reads only the index range [today, today + largest bucket].
+    """
+    today = today or timezone.localdate()
+    bucket = Case(
+        *[When(expiry_date__lte=today + datetime.timedelta(days=days), then=Value(days)) for days in EXPIRY_BUCKETS],
+        output_field=IntegerField(),
+    )
+    money = DecimalField(max_digits=14, decimal_places=2)
+    rows = (
+        at_risk_batches()
+        .filter(expiry_date__gte=today, expiry_date__lte=today + datetime.timedelta(days=max(EXPIRY_BUCKETS)))
+        .annotate(bucket=bucket)
+        .values('branch_id', 'bucket')
+        .annotate(
+            batch_count=Count('pk'),
+            units=Sum('qty_on_hand'),
+            cost_value=Sum(ExpressionWrapper(F('qty_on_hand') * F('cost_price'), output_field=money)),
+            sale_value=Sum(ExpressionWrapper(F('qty_on_hand') * F('sale_price'), output_field=money)),
+        )
+        .order_by()
+    )
+    return {
+        (row['branch_id'], row['bucket']): (
+            row['batch_count'], row['units'],
+            Decimal(row['cost_value']).quantize(Decimal('0.01')), Decimal(row['sale_value']).quantize(Decimal('0.01')),
+        )
+        for row in rows
+    }
+
+
+def scan_expiry_risk(today=None):
+    """
+    Flags expired batches, then refreshes ExpiryRisk incrementally: the fresh buckets are diffed
+    against the stored rows and only changed buckets are upserted (one statement), vanished ones
+    deleted (one statement). Meant to run periodically (inventory.tasks / scan_expiry_risk command).
+    """
+    today = today or timezone.localdate()
+    now = timezone.now()
+    with transaction.atomic():
+        flagged = flag_expired_batches(today)
+        fresh = expiry_buckets(today)
+        stored = {
+            (risk.branch_id, risk.bucket_days): risk
+            for risk in ExpiryRisk.objects.select_for_update()
+        }
+
+        changed = [
+            ExpiryRisk(branch_id=branch_id, bucket_days=days, batch_count=count, units=units,
+                       cost_value=cost, sale_value=sale, computed_at=now)
+            for (branch_id, days), (count, units, cost, sale) in fresh.items()
+            if (branch_id, days) not in stored
+            or (count, units, cost, sale) != (
+                stored[branch_id, days].batch_count, stored[branch_id, days].units,
+                stored[branch_id, days].cost_value, stored[branch_id, days].sale_value,
+            )
+        ]
+        if changed:
+            ExpiryRisk.objects.bulk_create(
+                changed, update_conflicts=True, unique_fields=['branch', 'bucket_days'],
+                update_fields=['batch_count', 'units', 'cost_value', 'sale_value', 'computed_at'],
+            )
+
+        vanished = [risk.pk for key, risk in stored.items() if key not in fresh]
+        if vanished:
+            ExpiryRisk.objects.filter(pk__in=vanished).delete()
+
+    return ExpiryScanResult(flagged, len(changed), len(vanished))
@@ -0,0 +1,200 @@
+"""
+Demand forecasting into Prediction.
+
+Daily 'sale' units per (branch, variant) are pulled in one streamed, grouped query per shard
+of branches and laid out as a (series x days) NumPy matrix. Every step of the model then runs
+on the whole matrix at once:
+
+* day-of-week seasonality: per-series weekday index (weekday mean / overall mean);
+* simple exponential smoothing of the deseasonalized series (vectorized over series, one
+  step per day);
+* blended with the trailing moving average, re-seasonalized and summed over each horizon.
+
+Shards are independent, so ``run_forecast`` spreads them over a process pool (all cores) and
+the Celery task fans them out as one task per shard.
+"""
+import datetime
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+import numpy as np
+from django.db import connections, transaction
+from django.db.models import F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Branch, InventoryMovement, Prediction
+
+MODEL_VERSION = 'ses-dow-v1'
+HORIZONS = (7, 14, 30)
+HISTORY_DAYS = 91
+MOVING_AVERAGE_DAYS = 28
+SMOOTHING_ALPHA = 0.3
+# Weight of the smoothed level against the moving average in the daily rate
+LEVEL_WEIGHT = 0.5
+BRANCHES_PER_SHARD = 10
+STREAM_CHUNK_SIZE = 10000
+UPSERT_BATCH_SIZE = 5000
+
+
+@dataclass
+class SalesMatrix:
+    keys: list          # [(branch_id, variant_id)], one per row of ``units``
+    units: np.ndarray   # float64, shape (len(keys), days)
+    start: datetime.date
+
+
+# ==========================
+# 1. HISTORY (ONE STREAMED QUERY PER SHARD)
+# ==========================
+
+def load_daily_sales(branch_ids, end=None, days=HISTORY_DAYS):
+    """Daily units sold per (branch, variant) over ``days`` days before ``end``; missing days are 0."""
+    end = end or timezone.localdate()
+    start = end - datetime.timedelta(days=days)
+    tz = timezone.get_current_timezone()
+    rows = (
+        InventoryMovement.objects
+        .filter(type='sale', batch__branch_id__in=branch_ids,
+                created_at__gte=datetime.datetime.combine(start, datetime.time.min, tz),
+                created_at__lt=datetime.datetime.combine(end, datetime.time.min, tz))
+        .annotate(day=TruncDate('created_at'))
+        .values_list('batch__branch_id', 'batch__variant_id', 'day')
+        .annotate(units=Sum(-F('delta_qty')))
+        .order_by()
+        .iterator(chunk_size=STREAM_CHUNK_SIZE)
+    )
+
+    # Compact typed buffers instead of one Python tuple per cell
+    index, keys = {}, []
+    row_ids, day_ids, values = array('q'), array('q'), array('d')
+    for branch_id, variant_id, day, units in rows:
+        row = index.setdefault((branch_id, variant_id), len(keys))
+        if row == len(keys):
+            keys.append((branch_id, variant_id))
+        row_ids.append(row)
+        day_ids.append((day - start).days)
+        values.append(units)
+
+    matrix = np.zeros((len(keys), days))
+    np.add.at(matrix, (np.frombuffer(row_ids, dtype=np.int64), np.frombuffer(day_ids, dtype=np.int64)),
+              np.frombuffer(values, dtype=np.float64))
+    return SalesMatrix(keys, matrix, start)
+
+
+# ==========================
+# 2. MODEL (VECTORIZED OVER ALL SERIES)
+# ==========================
+
+def weekday_index(units, start):
+    """(series x 7) seasonal factors, 1.0 where a series has no sales; column 0 is Monday."""
+    weekdays = (np.arange(units.shape[1]) + start.weekday()) % 7
+    overall = units.mean(axis=1, keepdims=True)
+    factors = np.ones((units.shape[0], 7))
+    for weekday in range(7):
+        columns = weekdays == weekday
+        if columns.any():
+            factors[:, weekday] = units[:, columns].mean(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        factors = np.where(overall > 0, factors / overall, 1.0)
+    return factors
+
+
+def smoothed_level(units, alpha=SMOOTHING_ALPHA):
+    """Final simple-exponential-smoothing level of every series (one vector step per day)."""
+    level = units[:, 0].copy()
+    for day in range(1, units.shape[1]):
+        level = alpha * units[:, day] + (1 - alpha) * level
+    return level
+
+
+def forecast(sales, horizons=HORIZONS):
+    """{horizon: int array of predicted units per series} for the days following the history."""
+    units, days = sales.units, sales.units.shape[1]
+    factors = weekday_index(units, sales.start)
+    weekdays = (np.arange(days) + sales.start.weekday()) % 7
+    # Weekdays that never sell carry no level information: they count as the series mean
+    overall = units.mean(axis=1, keepdims=True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        deseasonalized = np.where(factors[:, weekdays] > 0, units / factors[:, weekdays], overall)
+
+    moving_average = deseasonalized[:, -MOVING_AVERAGE_DAYS:].mean(axis=1)
+    rate = LEVEL_WEIGHT * smoothed_level(deseasonalized) + (1 - LEVEL_WEIGHT) * moving_average
+
+    future = (np.arange(max(horizons)) + sales.start.weekday() + days) % 7
+    daily = rate[:, None] * factors[:, future]
+    cumulative = np.cumsum(daily, axis=1)
+    return {
+        horizon: np.clip(np.rint(cumulative[:, horizon - 1]), 0, None).astype(np.int64)
+        for horizon in horizons
+    }
+
+
+# ==========================
+# 3. PIPELINE
+# ==========================
+
+def save_predictions(branch_ids, keys, forecasts, model_version=MODEL_VERSION):
+    """
+    Bulk upsert on (branch, variant, horizon_days); returns the number of rows written. Predictions
+    of ``branch_ids`` for the same horizons and model version whose (branch, variant) has no sales in
+    the window any more are deleted, so a variant that stopped selling does not keep its old demand.
+    """
+    predictions = [
+        Prediction(branch_id=branch_id, variant_id=variant_id, horizon_days=horizon,
+                   predicted_demand=int(values[row]), model_version=model_version)
+        for horizon, values in forecasts.items()
+        for row, (branch_id, variant_id) in enumerate(keys)
+    ]
+    current = set(keys)
+    with transaction.atomic():
+        stale = [
+            pk for pk, branch_id, variant_id in Prediction.objects
+            .filter(branch_id__in=branch_ids, horizon_days__in=list(forecasts), model_version=model_version)
+            .values_list('pk', 'branch_id', 'variant_id')
+            if (branch_id, variant_id) not in current
+        ]
+        for start in range(0, len(stale), UPSERT_BATCH_SIZE):
+            Prediction.objects.filter(pk__in=stale[start:start + UPSERT_BATCH_SIZE]).delete()
+        Prediction.objects.bulk_create(
+            predictions, batch_size=UPSERT_BATCH_SIZE, update_conflicts=True,
+            unique_fields=['branch', 'variant', 'horizon_days'],
+            update_fields=['predicted_demand', 'model_version', 'generated_at'],
+        )
+    return len(predictions)
+
+
+def forecast_branches(branch_ids, end=None, history_days=HISTORY_DAYS, horizons=HORIZONS):
+    """Loads, forecasts and saves one shard of branches; returns the number of predictions written."""
+    sales = load_daily_sales(branch_ids, end, history_days)
+    if not sales.keys:
+        return save_predictions(branch_ids, [], {horizon: [] for horizon in horizons})
+    return save_predictions(branch_ids, sales.keys, forecast(sales, horizons))
+
+
+def branch_shards(size=BRANCHES_PER_SHARD):
+    branch_ids = list(Branch.objects.order_by('pk').values_list('pk', flat=True))
+    return [branch_ids[i:i + size] for i in range(0, len(branch_ids), size)]
+
+
+def _run_shard(branch_ids, end, history_days):
+    try:
+        return forecast_branches(branch_ids, end, history_days)
+    finally:
+        connections.close_all()
+
+
+def run_forecast(workers=None, end=None, history_days=HISTORY_DAYS):
+    """
+    Forecasts every branch; ``workers`` > 1 runs the shards in a process pool (default: one
+    process per core), ``workers=1`` runs them inline. Returns the number of predictions written.
+    """
+    shards = branch_shards()
+    if workers == 1 or len(shards) <= 1:
+        return sum(forecast_branches(shard, end, history_days) for shard in shards)
+
+    # Child processes must open their own database connections
+    connections.close_all()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return sum(pool.map(_run_shard, shards, [end] * len(shards), [history_days] * len(shards)))
@@ -0,0 +1,46 @@
+from itertools import islice
+
+from django.db import transaction
+
+from .checkpoints import check_open
+from .models import InventoryMovement
+from .stock import apply_movement_deltas
+
+# Rows per INSERT statement; keeps statements well below parameter limits on every backend
+MOVEMENT_BATCH_SIZE = 1000
+
+
+# ==========================
+# APPEND-ONLY MOVEMENT LEDGER
+# ==========================
+
+def record_movements(movements, batch_size=MOVEMENT_BATCH_SIZE):
+    """
+    Appends InventoryMovement rows in multi-row INSERTs instead of one save() per change.
+    Accepts any iterable (including generators) of unsaved InventoryMovement instances and
+    returns the number of rows written. The StockLevel snapshot is updated chunk by chunk in the
+    same transaction, so readers never see the ledger and the snapshot disagree and only one
+    chunk is held in memory. Raises ClosedPeriod (writing nothing) for rows dated inside a closed month.
+    """
+    movements = iter(movements)
+    written = 0
+    with transaction.atomic():
+        while chunk := list(islice(movements, batch_size)):
+            InventoryMovement.objects.bulk_create(chunk)
+            check_open(chunk)
+            apply_movement_deltas(chunk)
+            written += len(chunk)
+    return written
+
+
+def movement_history(batch_id, start=None, end=None):
+    """
+    Movements of one batch, newest first. Bounding the time range lets PostgreSQL prune
+    partitions; both paths are served by inventory_movement_batch_idx.
+    """
+    movements = InventoryMovement.objects.filter(batch_id=batch_id)
+    if start is not None:
+        movements = movements.filter(created_at__gte=start)
+    if end is not None:
+        movements = movements.filter(created_at__lt=end)
+    return movements.order_by('-created_at')
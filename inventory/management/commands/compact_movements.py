@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from inventory.checkpoints import archive_periods, close_periods
+
+
+class Command(BaseCommand):
+    help = "Closes finished months of the movement ledger into balance checkpoints and archives old movements."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--no-archive', action='store_true', help="Only write checkpoints.")
+        parser.add_argument('--retention-months', type=int, default=None,
+                            help="Archive months older than this (default: settings.MOVEMENT_RETENTION_MONTHS).")
+        parser.add_argument('--archive-dir', default=None, help="Default: settings.MOVEMENT_ARCHIVE_DIR.")
+
+    def handle(self, *args, **options):
+        closed = close_periods()
+        self.stdout.write(self.style.SUCCESS(f"Closed {len(closed)} period(s): {', '.join(map(str, closed)) or '-'}"))
+        if options['no_archive']:
+            return
+        archived = archive_periods(options['retention_months'], options['archive_dir'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {len(archived)} period(s): {', '.join(map(str, archived)) or '-'}"
+        ))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from inventory.partitions import ensure_movement_partitions
+
+
+class Command(BaseCommand):
+    help = "Creates upcoming monthly partitions of the inventory movement ledger (PostgreSQL)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months-ahead', type=int, default=3)
+
+    def handle(self, *args, **options):
+        created = ensure_movement_partitions(months_ahead=options['months_ahead'])
+        if not created:
+            self.stdout.write("Movement ledger is not partitioned on this database; nothing to do.")
+            return
+        self.stdout.write(self.style.SUCCESS(f"Partitions ensured: {', '.join(created)}"))
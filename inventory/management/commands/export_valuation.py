@@ -0,0 +1,31 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from inventory.valuation import FORMATS, export_valuation
+
+
+class Command(BaseCommand):
+    help = "Streams the stock valuation (per company/branch/supplier, or per batch) as CSV or NDJSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=FORMATS, default='csv')
+        parser.add_argument('--detail', action='store_true', help="One row per batch instead of totals.")
+        parser.add_argument('--company', type=int, default=None, help="Restrict to one company id.")
+        parser.add_argument('--gzip', action='store_true', help="Gzip the output.")
+        parser.add_argument('--output', default='-', help="File path, or - for stdout.")
+
+    def handle(self, *args, **options):
+        chunks = export_valuation(options['format'], detail=options['detail'], company_id=options['company'],
+                                  compress=options['gzip'])
+        if options['output'] == '-':
+            for chunk in chunks:
+                if options['gzip']:
+                    sys.stdout.buffer.write(chunk)
+                else:
+                    self.stdout.write(chunk, ending='')
+            return
+        with open(options['output'], 'wb' if options['gzip'] else 'w', newline='') as out:
+            for chunk in chunks:
+                out.write(chunk)
+        self.stderr.write(self.style.SUCCESS(f"Wrote {options['output']}."))
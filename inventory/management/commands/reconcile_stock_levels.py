@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from inventory.stock import reconcile_stock_levels
+
+
+class Command(BaseCommand):
+    help = "Rebuilds StockLevel from the movement ledger and reports (and by default fixes) any drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Only report drift, do not correct it.")
+
+    def handle(self, *args, **options):
+        drift = reconcile_stock_levels(fix=not options['dry_run'])
+        for branch_id, variant_id, snapshot_qty, ledger_qty in drift:
+            self.stdout.write(
+                f"branch={branch_id} variant={variant_id} snapshot={snapshot_qty} ledger={ledger_qty}"
+            )
+        style = self.style.WARNING if drift else self.style.SUCCESS
+        self.stdout.write(style(f"{len(drift)} drifted stock level(s)."))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from inventory.reservation import release_expired_reservations
+
+
+class Command(BaseCommand):
+    help = "Releases stock reservations whose TTL has passed (abandoned carts)."
+
+    def handle(self, *args, **options):
+        released = release_expired_reservations()
+        self.stdout.write(self.style.SUCCESS(f"Released {released} expired reservation(s)."))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from inventory.expiry import scan_expiry_risk
+
+
+class Command(BaseCommand):
+    help = "Flags expired batches unavailable and refreshes the per-branch near-expiry buckets."
+
+    def handle(self, *args, **options):
+        result = scan_expiry_risk()
+        self.stdout.write(self.style.SUCCESS(
+            f"Flagged {result.flagged} expired batch(es); {result.changed} bucket(s) updated, "
+            f"{result.removed} removed."
+        ))
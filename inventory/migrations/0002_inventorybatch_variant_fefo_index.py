@@ -0,0 +1,42 @@
+# Generated by Django 5.2.6 on 2026-10-18 09:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_batch_variants(apps, schema_editor):
+    """
+    The variant was never stored on a batch; existing batches take the variant of the order lines
+    assigned to them. Batches no order line points to stay NULL until 0010 makes the column NOT NULL.
+    """
+    InventoryBatch = apps.get_model('inventory', 'InventoryBatch')
+    OrderItem = apps.get_model('orders', 'OrderItem')
+    variants = {}
+    for batch_id, variant_id in (
+        OrderItem.objects.filter(batch__isnull=False).order_by('batch_id', 'pk').values_list('batch_id', 'variant_id')
+    ):
+        variants.setdefault(batch_id, variant_id)
+    for batch_id, variant_id in variants.items():
+        InventoryBatch.objects.filter(pk=batch_id).update(variant_id=variant_id)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0001_initial'),
+        ('inventory', '0001_initial'),
+        ('orders', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inventorybatch',
+            name='variant',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='batches', to='catalog.productvariant', verbose_name='Product Variant'),
+        ),
+        migrations.RunPython(backfill_batch_variants, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='inventorybatch',
+            index=models.Index(fields=['branch', 'variant', 'expiry_date'], name='inventory_batch_fefo_idx'),
+        ),
+    ]
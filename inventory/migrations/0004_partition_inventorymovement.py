@@ -0,0 +1,112 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:25
+
+import datetime
+
+from django.conf import settings
+from django.db import migrations, models
+
+# Frozen copies of the inventory.partitions helpers as they were when the table was partitioned,
+# so later changes to that module cannot change what this migration does.
+MOVEMENT_TABLE = 'inventory_inventorymovement'
+
+
+def month_start(day):
+    return datetime.date(day.year, day.month, 1)
+
+
+def next_month(month):
+    return datetime.date(month.year + (month.month == 12), month.month % 12 + 1, 1)
+
+
+def create_month_partitions(cursor, qn, start, end):
+    month = month_start(start)
+    while month <= end:
+        upper = next_month(month)
+        cursor.execute(
+            f"CREATE TABLE IF NOT EXISTS {qn(f'{MOVEMENT_TABLE}_y{month.year}m{month.month:02d}')} "
+            f"PARTITION OF {qn(MOVEMENT_TABLE)} FOR VALUES FROM (%s) TO (%s)",
+            [datetime.datetime.combine(month, datetime.time.min, tzinfo=datetime.timezone.utc),
+             datetime.datetime.combine(upper, datetime.time.min, tzinfo=datetime.timezone.utc)],
+        )
+        month = upper
+
+
+def partition_movement_table(connection, user_table, months_ahead=3):
+    """
+    Converts the plain movement table into a table range-partitioned by (UTC) month on created_at.
+
+    PostgreSQL requires the partition key in the primary key, so the physical key becomes
+    (id, created_at); ``id`` stays an identity column and remains the Django primary key.
+    Existing rows are copied into monthly partitions and the old table is dropped.
+    """
+    qn = connection.ops.quote_name
+    legacy = f"{MOVEMENT_TABLE}_unpartitioned"
+    with connection.cursor() as cursor:
+        cursor.execute(f"ALTER TABLE {qn(MOVEMENT_TABLE)} RENAME TO {qn(legacy)}")
+        cursor.execute(f"""
+            CREATE TABLE {qn(MOVEMENT_TABLE)} (
+                id bigint GENERATED BY DEFAULT AS IDENTITY,
+                type varchar(50) NOT NULL,
+                delta_qty integer NOT NULL,
+                created_at timestamp with time zone NOT NULL,
+                batch_id bigint NOT NULL
+                    REFERENCES inventory_inventorybatch (id) DEFERRABLE INITIALLY DEFERRED,
+                created_by_id integer NULL
+                    REFERENCES {qn(user_table)} (id) DEFERRABLE INITIALLY DEFERRED,
+                PRIMARY KEY (id, created_at)
+            ) PARTITION BY RANGE (created_at)
+        """)
+        cursor.execute(f"SELECT MIN(created_at AT TIME ZONE 'UTC'), MAX(created_at AT TIME ZONE 'UTC') "
+                       f"FROM {qn(legacy)}")
+        first, last = cursor.fetchone()
+
+        today = datetime.datetime.now(datetime.timezone.utc).date()
+        start = min(first.date(), today) if first else today
+        end = max(last.date(), today) if last else today
+        for _ in range(months_ahead):
+            end = next_month(month_start(end))
+        create_month_partitions(cursor, qn, start, end)
+
+        cursor.execute(f"CREATE TABLE {qn(MOVEMENT_TABLE + '_default')} PARTITION OF {qn(MOVEMENT_TABLE)} DEFAULT")
+        cursor.execute(f"""
+            INSERT INTO {qn(MOVEMENT_TABLE)} (id, type, delta_qty, created_at, batch_id, created_by_id)
+            OVERRIDING SYSTEM VALUE
+            SELECT id, type, delta_qty, created_at, batch_id, created_by_id FROM {qn(legacy)}
+        """)
+        cursor.execute(
+            f"SELECT setval(pg_get_serial_sequence(%s, 'id'), COALESCE(MAX(id), 0) + 1, false) "
+            f"FROM {qn(MOVEMENT_TABLE)}",
+            [MOVEMENT_TABLE],
+        )
+        cursor.execute(f"DROP TABLE {qn(legacy)}")
+        cursor.execute(
+            f"CREATE INDEX {qn(MOVEMENT_TABLE + '_created_by_id')} ON {qn(MOVEMENT_TABLE)} (created_by_id)"
+        )
+
+
+def partition_ledger(apps, schema_editor):
+    # PostgreSQL native partitioning; other backends (SQLite in tests) keep the plain table
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    user_table = apps.get_model(settings.AUTH_USER_MODEL)._meta.db_table
+    partition_movement_table(schema_editor.connection, user_table)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0003_stockreservation'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_ledger, elidable=False),
+        migrations.AddIndex(
+            model_name='inventorymovement',
+            index=models.Index(fields=['-created_at'], name='inventory_movement_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inventorymovement',
+            index=models.Index(fields=['batch', '-created_at'], name='inventory_movement_batch_idx'),
+        ),
+    ]
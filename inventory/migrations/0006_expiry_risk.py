@@ -0,0 +1,44 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0002_search_indexes'),
+        ('inventory', '0005_stocklevel'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExpiryRisk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket_days', models.PositiveSmallIntegerField(verbose_name='Expires Within (Days)')),
+                ('batch_count', models.IntegerField(default=0, verbose_name='Batches')),
+                ('units', models.IntegerField(default=0, verbose_name='Units')),
+                ('cost_value', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Value at Cost')),
+                ('sale_value', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Value at Sale Price')),
+                ('computed_at', models.DateTimeField(verbose_name='Computed At')),
+            ],
+            options={
+                'verbose_name': 'Expiry Risk',
+                'verbose_name_plural': 'Expiry Risks',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='inventorybatch',
+            index=models.Index(condition=models.Q(('is_available', True), ('qty_on_hand__gt', 0)), fields=['expiry_date', 'branch'], name='inventory_batch_expiry_idx'),
+        ),
+        migrations.AddField(
+            model_name='expiryrisk',
+            name='branch',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='expiry_risks', to='inventory.branch', verbose_name='Branch'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='expiryrisk',
+            unique_together={('branch', 'bucket_days')},
+        ),
+    ]
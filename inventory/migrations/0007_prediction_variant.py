@@ -0,0 +1,31 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def delete_branch_level_predictions(apps, schema_editor):
+    """Rows written before predictions were per variant cannot be attributed to one; the pipeline recreates them."""
+    apps.get_model('inventory', 'Prediction').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0001_initial'),
+        ('inventory', '0006_expiry_risk'),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_branch_level_predictions, migrations.RunPython.noop),
+        migrations.AddField(
+            model_name='prediction',
+            name='variant',
+            field=models.ForeignKey(default=0, on_delete=django.db.models.deletion.CASCADE,
+                                    related_name='predictions', to='catalog.productvariant',
+                                    verbose_name='Product Variant'),
+            preserve_default=False,
+        ),
+        migrations.AlterUniqueTogether(
+            name='prediction',
+            unique_together={('branch', 'variant', 'horizon_days')},
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.6 on 2026-10-18 13:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0008_branch_address'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MovementPeriod',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start', models.DateTimeField(unique=True, verbose_name='Period Start')),
+                ('end', models.DateTimeField(unique=True, verbose_name='Period End')),
+                ('movement_count', models.IntegerField(default=0, verbose_name='Movements')),
+                ('closed_at', models.DateTimeField(verbose_name='Closed At')),
+                ('archive_path', models.CharField(blank=True, max_length=500, verbose_name='Archive File')),
+                ('archive_index', models.JSONField(blank=True, default=list, verbose_name='Archive Index')),
+                ('archived_at', models.DateTimeField(blank=True, null=True, verbose_name='Archived At')),
+            ],
+            options={
+                'verbose_name': 'Movement Period',
+                'verbose_name_plural': 'Movement Periods',
+                'ordering': ['-start'],
+            },
+        ),
+        migrations.CreateModel(
+            name='MovementCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('as_of', models.DateTimeField(verbose_name='Balance At')),
+                ('qty', models.IntegerField(verbose_name='Quantity')),
+                ('batch', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='checkpoints', to='inventory.inventorybatch', verbose_name='Batch')),
+            ],
+            options={
+                'verbose_name': 'Movement Checkpoint',
+                'verbose_name_plural': 'Movement Checkpoints',
+                'indexes': [models.Index(fields=['as_of'], name='inventory_checkpoint_asof_idx')],
+                'unique_together': {('batch', 'as_of')},
+            },
+        ),
+    ]
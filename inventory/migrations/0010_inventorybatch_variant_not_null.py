@@ -0,0 +1,30 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def check_batch_variants(apps, schema_editor):
+    """Batches 0002 could not attribute to a variant have to be fixed by hand before the column is NOT NULL."""
+    InventoryBatch = apps.get_model('inventory', 'InventoryBatch')
+    unknown = list(InventoryBatch.objects.filter(variant__isnull=True).order_by('pk').values_list('pk', flat=True)[:20])
+    if unknown:
+        raise RuntimeError(
+            f"Inventory batches without a variant (first ids: {unknown}); set "
+            "inventory_inventorybatch.variant_id for them, then run the migration again."
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0001_initial'),
+        ('inventory', '0009_movement_checkpoints'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_batch_variants, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='inventorybatch',
+            name='variant',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='batches', to='catalog.productvariant', verbose_name='Product Variant'),
+        ),
+    ]
@@ -41,7 +41,9 @@ class Branch(models.Model):
     )
     name = models.CharField(max_length=255, verbose_name=_("Branch Name"))
     # FK to Address model from the 'users' app
-    # address = models.ForeignKey('users.Address', on_delete=models.PROTECT, verbose_name=_("Location Address"))
+    # UNCOMMENTED: its geo_lat/geo_lng place the branch for nearest-branch routing (inventory.routing)
+    address = models.ForeignKey('users.Address', on_delete=models.PROTECT, null=True, blank=True,
+                                related_name='branches', verbose_name=_("Location Address"))
     shipping_available = models.BooleanField(default=True, verbose_name=_("Shipping Available"))
 
     class Meta:
@@ -61,7 +63,9 @@ class InventoryBatch(models.Model):
     branch = models.ForeignKey(Branch, on_delete=models.CASCADE, related_name='inventory_batches',
                                verbose_name=_("Branch"))
     # FK to ProductVariant from the 'catalog' app (the sellable item)
-    # variant = models.ForeignKey('catalog.ProductVariant', on_delete=models.PROTECT, related_name='batches', verbose_name=_("Product Variant"))
+    # UNCOMMENTED: required by FEFO allocation (orders.OrderItem.batch assignment)
+    variant = models.ForeignKey('catalog.ProductVariant', on_delete=models.PROTECT, related_name='batches',
+                                verbose_name=_("Product Variant"))
     supplier = models.ForeignKey(
         Company,
         on_delete=models.SET_NULL,
@@ -87,6 +91,13 @@ class InventoryBatch(models.Model):
             models.CheckConstraint(check=models.Q(qty_on_hand__gte=0), name='inventory_qty_on_hand_gte_zero'),
             models.CheckConstraint(check=models.Q(qty_reserved__gte=0), name='inventory_qty_reserved_gte_zero'),
         ]
+        indexes = [
+            # FEFO lookup: all batches of a variant at a branch, earliest expiry first
+            models.Index(fields=['branch', 'variant', 'expiry_date'], name='inventory_batch_fefo_idx'),
+            # Expiry-risk scans only ever look at sellable stock, so the index skips empty/withdrawn batches
+            models.Index(fields=['expiry_date', 'branch'], condition=models.Q(qty_on_hand__gt=0, is_available=True),
+                         name='inventory_batch_expiry_idx'),
+        ]
 
 
 class InventoryMovement(models.Model):
@@ -107,6 +118,97 @@ class InventoryMovement(models.Model):
         verbose_name = _("Inventory Movement")
         verbose_name_plural = _("Inventory Movements")
         ordering = ['-created_at']
+        # On PostgreSQL the table is range-partitioned by month on created_at (see inventory.partitions)
+        indexes = [
+            models.Index(fields=['-created_at'], name='inventory_movement_time_idx'),
+            models.Index(fields=['batch', '-created_at'], name='inventory_movement_batch_idx'),
+        ]
+
+
+class StockReservation(models.Model):
+    """Temporary hold on batch stock (e.g. for a cart); released on checkout, cancellation or timeout."""
+    batch = models.ForeignKey(InventoryBatch, on_delete=models.CASCADE, related_name='reservations',
+                              verbose_name=_("Reserved Batch"))
+    quantity = models.PositiveIntegerField(verbose_name=_("Reserved Quantity"))
+    # Free-form owner key (e.g. "cart:42") so the inventory app does not depend on orders
+    reference = models.CharField(max_length=100, blank=True, db_index=True, verbose_name=_("Reference"))
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name=_("Reserved At"))
+    expires_at = models.DateTimeField(db_index=True, verbose_name=_("Expires At"))
+
+    class Meta:
+        verbose_name = _("Stock Reservation")
+        verbose_name_plural = _("Stock Reservations")
+
+
+class StockLevel(models.Model):
+    """Denormalized stock on hand per branch and variant, kept in step with InventoryMovement (point lookups)."""
+    branch = models.ForeignKey(Branch, on_delete=models.CASCADE, related_name='stock_levels',
+                               verbose_name=_("Branch"))
+    variant = models.ForeignKey('catalog.ProductVariant', on_delete=models.CASCADE, related_name='stock_levels',
+                                verbose_name=_("Product Variant"))
+    qty_on_hand = models.IntegerField(default=0, verbose_name=_("Quantity On Hand"))
+    updated_at = models.DateTimeField(auto_now=True, verbose_name=_("Last Updated"))
+
+    class Meta:
+        verbose_name = _("Stock Level")
+        verbose_name_plural = _("Stock Levels")
+        # Unique index doubles as the (branch, variant) lookup index
+        unique_together = ('branch', 'variant')
+
+
+class MovementPeriod(models.Model):
+    """
+    One closed (UTC) month of the movement ledger. Closing it writes a MovementCheckpoint for every
+    batch holding stock at ``end``; archiving it moves its raw movements into a gzip file.
+    """
+    start = models.DateTimeField(unique=True, verbose_name=_("Period Start"))
+    end = models.DateTimeField(unique=True, verbose_name=_("Period End"))
+    movement_count = models.IntegerField(default=0, verbose_name=_("Movements"))
+    closed_at = models.DateTimeField(verbose_name=_("Closed At"))
+    archive_path = models.CharField(max_length=500, blank=True, verbose_name=_("Archive File"))
+    # [[first batch id, byte offset], ...] of the archive's gzip members, ordered by batch id
+    archive_index = models.JSONField(default=list, blank=True, verbose_name=_("Archive Index"))
+    archived_at = models.DateTimeField(null=True, blank=True, verbose_name=_("Archived At"))
+
+    class Meta:
+        verbose_name = _("Movement Period")
+        verbose_name_plural = _("Movement Periods")
+        ordering = ['-start']
+
+    def __str__(self):
+        return f"{self.start:%Y-%m}"
+
+
+class MovementCheckpoint(models.Model):
+    """Quantity of a batch at ``as_of`` (the end of a closed MovementPeriod); no row means zero."""
+    batch = models.ForeignKey(InventoryBatch, on_delete=models.PROTECT, related_name='checkpoints',
+                              verbose_name=_("Batch"))
+    as_of = models.DateTimeField(verbose_name=_("Balance At"))
+    qty = models.IntegerField(verbose_name=_("Quantity"))
+
+    class Meta:
+        verbose_name = _("Movement Checkpoint")
+        verbose_name_plural = _("Movement Checkpoints")
+        # Unique index doubles as the (batch, as_of) lookup index
+        unique_together = ('batch', 'as_of')
+        indexes = [models.Index(fields=['as_of'], name='inventory_checkpoint_asof_idx')]
+
+
+class ExpiryRisk(models.Model):
+    """Near-expiry stock per branch and bucket (expiring within ``bucket_days``), refreshed by inventory.expiry."""
+    branch = models.ForeignKey(Branch, on_delete=models.CASCADE, related_name='expiry_risks',
+                               verbose_name=_("Branch"))
+    bucket_days = models.PositiveSmallIntegerField(verbose_name=_("Expires Within (Days)"))
+    batch_count = models.IntegerField(default=0, verbose_name=_("Batches"))
+    units = models.IntegerField(default=0, verbose_name=_("Units"))
+    cost_value = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name=_("Value at Cost"))
+    sale_value = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name=_("Value at Sale Price"))
+    computed_at = models.DateTimeField(verbose_name=_("Computed At"))
+
+    class Meta:
+        verbose_name = _("Expiry Risk")
+        verbose_name_plural = _("Expiry Risks")
+        unique_together = ('branch', 'bucket_days')
 
 
 # =====================
@@ -117,7 +219,9 @@ class Prediction(models.Model):
     """Stores AI model outputs for demand forecasting."""
     branch = models.ForeignKey(Branch, on_delete=models.CASCADE, verbose_name=_("Branch"))
     # FK to ProductVariant from the 'catalog' app
-    # variant = models.ForeignKey('catalog.ProductVariant', on_delete=models.CASCADE, verbose_name=_("Product Variant"))
+    # UNCOMMENTED: forecasts are per branch and variant (written by inventory.forecasting)
+    variant = models.ForeignKey('catalog.ProductVariant', on_delete=models.CASCADE, related_name='predictions',
+                                verbose_name=_("Product Variant"))
 
     horizon_days = models.IntegerField(verbose_name=_("Prediction Horizon (Days)"))
     predicted_demand = models.IntegerField(verbose_name=_("Predicted Demand"))
@@ -127,5 +231,4 @@ class Prediction(models.Model):
     class Meta:
         verbose_name = _("Demand Prediction")
         verbose_name_plural = _("Demand Predictions")
-        # Note: 'variant' is commented out but needed for unique_together constraint
-        unique_together = ('branch', 'horizon_days')
\ No newline at end of file
+        unique_together = ('branch', 'variant', 'horizon_days')
\ No newline at end of file
@@ -0,0 +1,111 @@
+import datetime
+
+from django.db import connection as default_connection, transaction
+from django.utils import timezone
+
+# ==========================
+# MONTHLY RANGE PARTITIONS FOR THE MOVEMENT LEDGER (POSTGRESQL ONLY)
+#  - SQLite (tests/local dev) keeps InventoryMovement as a plain table; every helper is a no-op there.
+#  - Partition bounds are UTC months (the migration 0004 that partitions the table has its own copy).
+# ==========================
+
+MOVEMENT_TABLE = 'inventory_inventorymovement'
+
+
+def month_start(day):
+    return datetime.date(day.year, day.month, 1)
+
+
+def next_month(month):
+    return datetime.date(month.year + (month.month == 12), month.month % 12 + 1, 1)
+
+
+def _utc(day):
+    return datetime.datetime.combine(day, datetime.time.min, tzinfo=datetime.timezone.utc)
+
+
+def partition_name(month, table=MOVEMENT_TABLE):
+    return f"{table}_y{month.year}m{month.month:02d}"
+
+
+def is_partitioned(connection=default_connection, table=MOVEMENT_TABLE):
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid WHERE c.relname = %s",
+            [table],
+        )
+        return cursor.fetchone() is not None
+
+
+def _table_exists(cursor, name):
+    cursor.execute("SELECT to_regclass(%s) IS NOT NULL", [name])
+    return cursor.fetchone()[0]
+
+
+def _default_rows_between(cursor, qn, default, lower, upper):
+    if not _table_exists(cursor, default):
+        return False
+    cursor.execute(f"SELECT EXISTS (SELECT 1 FROM {qn(default)} WHERE created_at >= %s AND created_at < %s)",
+                   [lower, upper])
+    return cursor.fetchone()[0]
+
+
+def _attach_month(cursor, qn, name, table, lower, upper):
+    """
+    Creates the month's partition when back-dated rows of that month already sit in the default
+    partition (``PARTITION OF`` refuses then): the rows are moved into a detached copy of the table,
+    which is then attached. ATTACH re-checks the default partition under an exclusive lock, so this
+    briefly blocks movement writes; it only happens for back-dated months (imports, generated data).
+    """
+    default = f"{table}_default"
+    cursor.execute(f"CREATE TABLE {qn(name)} (LIKE {qn(table)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+    cursor.execute(
+        f"WITH moved AS (DELETE FROM {qn(default)} WHERE created_at >= %s AND created_at < %s RETURNING *) "
+        f"INSERT INTO {qn(name)} SELECT * FROM moved",
+        [lower, upper],
+    )
+    cursor.execute(f"ALTER TABLE {qn(table)} ATTACH PARTITION {qn(name)} FOR VALUES FROM (%s) TO (%s)",
+                   [lower, upper])
+
+
+def create_month_partitions(start, end, connection=default_connection, table=MOVEMENT_TABLE):
+    """
+    Creates (if missing) one partition per month covering [start, end]; returns the partition names.
+    Rows of a month that were written to the default partition before its partition existed are
+    moved into the new partition.
+    """
+    qn = connection.ops.quote_name
+    created = []
+    month = month_start(start)
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        while month <= end:
+            upper = next_month(month)
+            name = partition_name(month, table)
+            lower_bound, upper_bound = _utc(month), _utc(upper)
+            if not _table_exists(cursor, name):
+                if _default_rows_between(cursor, qn, f"{table}_default", lower_bound, upper_bound):
+                    _attach_month(cursor, qn, name, table, lower_bound, upper_bound)
+                else:
+                    cursor.execute(
+                        f"CREATE TABLE {qn(name)} PARTITION OF {qn(table)} FOR VALUES FROM (%s) TO (%s)",
+                        [lower_bound, upper_bound],
+                    )
+            created.append(name)
+            month = upper
+    return created
+
+
+def ensure_movement_partitions(months_ahead=3, today=None, connection=default_connection):
+    """
+    Makes sure partitions exist for the current UTC month and the next ``months_ahead`` months.
+    Run it periodically (e.g. daily) so rows never land in the default partition.
+    """
+    if not is_partitioned(connection):
+        return []
+    today = today or timezone.now().astimezone(datetime.timezone.utc).date()
+    end = month_start(today)
+    for _ in range(months_ahead):
+        end = next_month(end)
+    return create_month_partitions(today, end, connection)
@@ -0,0 +1,216 @@
+"""
+Point-of-sale counter sales: a whole basket of scanned barcodes sold in one transaction.
+
+On PostgreSQL the stock is taken in a single statement: data-modifying CTEs resolve the barcodes,
+lock the branch's sellable batches, split every line over them FEFO (window sum), decrement the
+batches (``UPDATE ... RETURNING``) and return the receipt lines. If any line is unknown or short
+nothing is written, and one more query finds out why. Other databases (SQLite in development and
+tests) run the same plan through the ORM with a fixed number of statements. Both paths append the
+'sale' movements through record_movements, which keeps StockLevel in step like for every other
+stock change.
+"""
+import datetime
+from collections import defaultdict
+from dataclasses import dataclass
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from catalog.models import ProductVariant
+
+from .allocation import sellable_batches
+from .availability import invalidate_availability
+from .exceptions import InsufficientStock, UnknownBarcode
+from .ledger import record_movements
+from .models import InventoryBatch, InventoryMovement
+
+# Longest basket one sale may carry
+MAX_LINES = 200
+
+
+@dataclass
+class ReceiptLine:
+    gtin: str
+    variant_id: int
+    batch_id: int
+    expiry_date: datetime.date
+    quantity: int
+    unit_price: Decimal
+
+    @property
+    def amount(self):
+        return self.unit_price * self.quantity
+
+
+@dataclass
+class PosSale:
+    branch_id: int
+    lines: list
+
+    @property
+    def total(self):
+        return sum((line.amount for line in self.lines), Decimal('0.00'))
+
+
+def _merge_basket(basket):
+    """[(gtin, quantity)] with repeated scans added up, in first-scan order."""
+    merged = {}
+    for gtin, quantity in basket:
+        if quantity <= 0:
+            raise ValueError(f"Quantity for {gtin} must be positive")
+        merged[gtin] = merged.get(gtin, 0) + quantity
+    if not merged:
+        raise ValueError("Cannot sell an empty basket")
+    return list(merged.items())
+
+
+# ==========================
+# 1. POSTGRESQL: ONE STATEMENT
+# ==========================
+
+_SALE_SQL = """
+WITH basket AS (
+    SELECT b.gtin, b.qty, b.pos, v.id AS variant_id
+    FROM unnest(%(gtins)s::varchar[], %(quantities)s::int[]) WITH ORDINALITY AS b(gtin, qty, pos)
+    LEFT JOIN {variant} v ON v.barcode_gtin = b.gtin
+),
+locked AS (
+    SELECT id, variant_id, expiry_date, sale_price, qty_on_hand - qty_reserved AS free
+    FROM {batch}
+    WHERE branch_id = %(branch)s AND variant_id IN (SELECT variant_id FROM basket)
+      AND is_available AND qty_on_hand > qty_reserved
+      AND (expiry_date IS NULL OR expiry_date >= %(today)s)
+    FOR UPDATE
+),
+ranked AS (
+    SELECT locked.*,
+           SUM(free) OVER (PARTITION BY variant_id ORDER BY expiry_date NULLS LAST, id) - free AS before
+    FROM locked
+),
+plan AS (
+    SELECT r.id, r.variant_id, r.expiry_date, r.sale_price, k.gtin, k.pos, LEAST(r.free, k.qty - r.before) AS take
+    FROM ranked r JOIN basket k ON k.variant_id = r.variant_id
+    WHERE r.before < k.qty
+),
+short AS (
+    SELECT k.pos FROM basket k LEFT JOIN plan p ON p.pos = k.pos
+    GROUP BY k.pos, k.qty HAVING COALESCE(SUM(p.take), 0) < k.qty
+),
+sold AS (
+    UPDATE {batch} b SET qty_on_hand = b.qty_on_hand - p.take
+    FROM plan p
+    WHERE b.id = p.id AND NOT EXISTS (SELECT 1 FROM short)
+    RETURNING p.gtin, p.pos, p.variant_id, b.id, p.expiry_date, p.take, p.sale_price
+)
+SELECT gtin, variant_id, id, expiry_date, take, sale_price FROM sold ORDER BY pos, expiry_date NULLS LAST, id
+""".format(variant=ProductVariant._meta.db_table, batch=InventoryBatch._meta.db_table)
+
+
+def _sell_in_one_statement(branch_id, basket, user_id):
+    params = {
+        'gtins': [gtin for gtin, _ in basket], 'quantities': [qty for _, qty in basket], 'branch': branch_id,
+        'today': timezone.localdate(),
+    }
+    with connection.cursor() as cursor:
+        cursor.execute(_SALE_SQL, params)
+        lines = [ReceiptLine(*row) for row in cursor.fetchall()]
+    record_movements(
+        InventoryMovement(batch_id=line.batch_id, type='sale', delta_qty=-line.quantity, created_by_id=user_id)
+        for line in lines
+    )
+    return lines
+
+
+# ==========================
+# 2. OTHER DATABASES: ORM, FIXED STATEMENT COUNT
+# ==========================
+
+def _sell_with_orm(branch_id, basket, user_id):
+    variants = dict(ProductVariant.objects.filter(barcode_gtin__in=[gtin for gtin, _ in basket])
+                    .values_list('barcode_gtin', 'pk'))
+    _check_barcodes(basket, variants)
+
+    pools = defaultdict(list)
+    for batch in sellable_batches([branch_id], set(variants.values())).select_for_update():
+        batch.free_qty = batch.qty_on_hand - batch.qty_reserved
+        pools[batch.variant_id].append(batch)
+
+    lines, taken = [], defaultdict(int)
+    for gtin, quantity in basket:
+        pool = pools[variants[gtin]]
+        available = sum(batch.free_qty for batch in pool)
+        if available < quantity:
+            raise InsufficientStock(variants[gtin], quantity, available)
+        for batch in pool:
+            take = min(batch.free_qty, quantity)
+            if take:
+                batch.free_qty -= take
+                quantity -= take
+                taken[batch] += take
+                lines.append(ReceiptLine(gtin, batch.variant_id, batch.pk, batch.expiry_date, take, batch.sale_price))
+            if quantity == 0:
+                break
+
+    for batch, take in taken.items():
+        batch.qty_on_hand = F('qty_on_hand') - take
+    InventoryBatch.objects.bulk_update(list(taken), ['qty_on_hand'])
+    record_movements(
+        InventoryMovement(batch_id=batch.pk, type='sale', delta_qty=-take, created_by_id=user_id)
+        for batch, take in taken.items()
+    )
+    return lines
+
+
+# ==========================
+# 3. ENTRY POINT
+# ==========================
+
+def _check_barcodes(basket, variants):
+    unknown = [gtin for gtin, _ in basket if gtin not in variants]
+    if unknown:
+        raise UnknownBarcode(unknown)
+
+
+def _explain_failure(branch_id, basket, final=True):
+    """
+    Raises UnknownBarcode / InsufficientStock for a basket the one-statement sale refused. When every
+    line is covered by now (stock freed after the sale read it) it returns instead, unless ``final``.
+    """
+    variants = dict(ProductVariant.objects.filter(barcode_gtin__in=[gtin for gtin, _ in basket])
+                    .values_list('barcode_gtin', 'pk'))
+    _check_barcodes(basket, variants)
+    free = defaultdict(int)
+    for batch in sellable_batches([branch_id], set(variants.values())):
+        free[batch.variant_id] += batch.qty_on_hand - batch.qty_reserved
+    for gtin, quantity in basket:
+        if free[variants[gtin]] < quantity:
+            raise InsufficientStock(variants[gtin], quantity, free[variants[gtin]])
+    if not final:
+        return
+    gtin, quantity = basket[0]
+    raise InsufficientStock(variants[gtin], quantity, free[variants[gtin]])
+
+
+def sell_basket(branch_id, basket, user=None):
+    """
+    Sells ``basket`` ([(barcode, quantity)], repeated barcodes added up) at a branch, FEFO, and
+    returns the PosSale receipt. All or nothing: raises UnknownBarcode or InsufficientStock
+    without writing anything.
+    """
+    basket = _merge_basket(basket)
+    user_id = user.pk if user is not None else None
+    with transaction.atomic():
+        if connection.vendor == 'postgresql':
+            lines = _sell_in_one_statement(branch_id, basket, user_id)
+            if not lines:
+                _explain_failure(branch_id, basket, final=False)
+                # Every line is covered now: stock was freed between the two statements, sell once more
+                lines = _sell_in_one_statement(branch_id, basket, user_id)
+                if not lines:
+                    _explain_failure(branch_id, basket)
+        else:
+            lines = _sell_with_orm(branch_id, basket, user_id)
+        invalidate_availability([branch_id])
+    return PosSale(branch_id, lines)
@@ -0,0 +1,141 @@
+import datetime
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import OperationalError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .allocation import sellable_batches
+from .availability import invalidate_availability
+from .exceptions import InsufficientStock
+from .models import InventoryBatch, StockReservation
+
+# How long the hot path waits on a locked batch row before moving to sibling batches (PostgreSQL only)
+HOT_BATCH_LOCK_TIMEOUT_MS = 50
+
+
+# ==========================
+# 1. RESERVING STOCK
+# ==========================
+
+def _increment_reserved(batch_id, quantity):
+    """
+    Conditional atomic UPDATE: reserves only if the batch still has enough free stock.
+    No read-modify-write, so concurrent callers can never oversell; returns True on success.
+    """
+    return InventoryBatch.objects.filter(
+        pk=batch_id, qty_on_hand__gte=F('qty_reserved') + quantity,
+    ).update(qty_reserved=F('qty_reserved') + quantity) == 1
+
+
+def _try_hot_batch(batch_id, quantity):
+    """Reserves from a single batch, giving up quickly (instead of queueing) if another checkout holds its row lock."""
+    try:
+        with transaction.atomic():
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute("SET LOCAL lock_timeout = %s", [f'{HOT_BATCH_LOCK_TIMEOUT_MS}ms'])
+            reserved = _increment_reserved(batch_id, quantity)
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute("SET LOCAL lock_timeout = DEFAULT")
+            return reserved
+    except OperationalError:
+        # lock_timeout fired: the batch is hot, let the caller fall back to sibling batches
+        return False
+
+
+def _reserve_from_siblings(branch_id, variant_id, quantity):
+    """Locks only the batches nobody else is holding (SKIP LOCKED) and spreads the quantity over them FEFO."""
+    batches = sellable_batches([branch_id], [variant_id]).select_for_update(skip_locked=True)
+    plan, remaining = [], quantity
+    for batch in batches:
+        take = min(batch.qty_on_hand - batch.qty_reserved, remaining)
+        plan.append((batch.pk, take))
+        remaining -= take
+        if remaining == 0:
+            break
+    if remaining:
+        raise InsufficientStock(variant_id, quantity, quantity - remaining)
+
+    for batch_id, take in plan:
+        if not _increment_reserved(batch_id, take):
+            raise InsufficientStock(variant_id, quantity)
+    return plan
+
+
+def reserve_stock(branch_id, variant_id, quantity, reference='', ttl=None):
+    """
+    Reserves ``quantity`` units of a variant at a branch and returns the created StockReservation rows.
+
+    The earliest-expiring batch that can cover the whole quantity is tried first with a single
+    conditional UPDATE. If it is locked by a concurrent checkout (or the race is lost), the
+    reservation is taken from the remaining batches via SELECT ... FOR UPDATE SKIP LOCKED,
+    split across several batches if necessary. Raises InsufficientStock when stock runs out.
+    """
+    if quantity <= 0:
+        raise ValueError("Reservation quantity must be positive")
+    ttl = settings.STOCK_RESERVATION_TTL if ttl is None else ttl
+    expires_at = timezone.now() + datetime.timedelta(seconds=ttl)
+
+    with transaction.atomic():
+        candidates = (
+            sellable_batches([branch_id], [variant_id])
+            .filter(qty_on_hand__gte=F('qty_reserved') + quantity)
+            .values_list('pk', flat=True)
+        )
+        hot_batch_id = candidates.first()
+        if hot_batch_id is not None and _try_hot_batch(hot_batch_id, quantity):
+            plan = [(hot_batch_id, quantity)]
+        else:
+            plan = _reserve_from_siblings(branch_id, variant_id, quantity)
+
+        invalidate_availability([branch_id])
+        return StockReservation.objects.bulk_create([
+            StockReservation(batch_id=batch_id, quantity=qty, reference=reference, expires_at=expires_at)
+            for batch_id, qty in plan
+        ])
+
+
+# ==========================
+# 2. RELEASING STOCK
+# ==========================
+
+def release_reservations(reservations):
+    """
+    Returns the reserved quantities to their batches and deletes the reservations.
+    Rows already being released by another worker are skipped. Returns the number released.
+    """
+    with transaction.atomic():
+        rows = list(
+            # of=('self',): lock the reservations only, not the (hot) batches joined for branch_id
+            reservations.select_for_update(skip_locked=True, of=('self',))
+            .values_list('pk', 'batch_id', 'quantity', 'batch__branch_id')
+        )
+        if not rows:
+            return 0
+
+        per_batch = defaultdict(int)
+        for _, batch_id, qty, _ in rows:
+            per_batch[batch_id] += qty
+        batches = []
+        for batch_id, qty in per_batch.items():
+            batch = InventoryBatch(pk=batch_id)
+            batch.qty_reserved = F('qty_reserved') - qty
+            batches.append(batch)
+        InventoryBatch.objects.bulk_update(batches, ['qty_reserved'])
+        StockReservation.objects.filter(pk__in=[row[0] for row in rows]).delete()
+        invalidate_availability(row[3] for row in rows)
+        return len(rows)
+
+
+def release_reference(reference):
+    """Releases every reservation held under ``reference`` (e.g. an abandoned or emptied cart)."""
+    return release_reservations(StockReservation.objects.filter(reference=reference))
+
+
+def release_expired_reservations(now=None):
+    """Releases reservations whose TTL has passed; meant to run periodically."""
+    now = now or timezone.now()
+    return release_reservations(StockReservation.objects.filter(expires_at__lte=now))
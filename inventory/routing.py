@@ -0,0 +1,188 @@
+import math
+import threading
+import time
+from collections import defaultdict
+
+import numpy as np
+from django.core.cache import cache
+from django.db.models import F, Sum
+
+from .allocation import sellable_batches
+from .models import Branch
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+# Grid cell edge in degrees (~28 km north-south); a lookup usually touches a handful of cells
+CELL_DEGREES = 0.25
+# Nearest branches checked for stock before giving up on a cart
+CANDIDATE_BRANCHES = 25
+# How often (seconds) a process re-checks the shared version key (same scheme as catalog.lookups)
+LOCAL_CHECK_INTERVAL = 5
+VERSION_KEY = 'inventory:branch-index:version'
+
+
+def haversine_km(lat, lng, lats, lngs):
+    """Great-circle distance (km) from one point to arrays of points; all angles in radians."""
+    a = np.sin((lats - lat) / 2) ** 2 + np.cos(lat) * np.cos(lats) * np.sin((lngs - lng) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+# ==========================
+# 1. SPATIAL INDEX (UNIFORM GRID)
+# ==========================
+
+class BranchIndex:
+    """Immutable grid over the locations of the branches that can ship; built in one query."""
+
+    def __init__(self, rows, cell_degrees=CELL_DEGREES):
+        self.cell_degrees = cell_degrees
+        self.ids = np.array([row[0] for row in rows], dtype=np.int64)
+        lat_deg = np.array([float(row[1]) for row in rows])
+        lng_deg = np.array([float(row[2]) for row in rows])
+        self.lats, self.lngs = np.radians(lat_deg), np.radians(lng_deg)
+        cells = defaultdict(list)
+        for position, (lat, lng) in enumerate(zip(lat_deg, lng_deg)):
+            cells[self._cell(lat, lng)].append(position)
+        self.cells = {cell: np.array(positions) for cell, positions in cells.items()}
+        rows, cols = [cell[0] for cell in self.cells], [cell[1] for cell in self.cells]
+        self.bounds = (min(rows), max(rows), min(cols), max(cols)) if self.cells else None
+
+    @classmethod
+    def build(cls):
+        return cls(list(
+            Branch.objects
+            .filter(shipping_available=True, company__is_active=True,
+                    address__geo_lat__isnull=False, address__geo_lng__isnull=False)
+            .values_list('pk', 'address__geo_lat', 'address__geo_lng')
+        ))
+
+    def _cell(self, lat, lng):
+        return int(math.floor(lat / self.cell_degrees)), int(math.floor(lng / self.cell_degrees))
+
+    def _rings_to_cover(self, center):
+        """Rings around ``center`` needed to reach every occupied cell."""
+        if self.bounds is None:
+            return 0
+        min_row, max_row, min_col, max_col = self.bounds
+        return max(abs(center[0] - min_row), abs(center[0] - max_row), abs(center[1] - min_col),
+                   abs(center[1] - max_col))
+
+    def _ring(self, center, ring):
+        row, col = center
+        if ring == 0:
+            cell = self.cells.get(center)
+            return [cell] if cell is not None else []
+        found = []
+        for d in range(-ring, ring + 1):
+            for cell in ((row - ring, col + d), (row + ring, col + d)):
+                if cell in self.cells:
+                    found.append(self.cells[cell])
+            for cell in ((row + d, col - ring), (row + d, col + ring)):
+                if abs(d) != ring and cell in self.cells:
+                    found.append(self.cells[cell])
+        return found
+
+    def _ring_clearance_km(self, lat, ring):
+        """Lower bound on the distance from the query point to anything outside rings 0..ring."""
+        far_lat = min(abs(lat) + (ring + 1) * self.cell_degrees, 89.0)
+        return ring * self.cell_degrees * KM_PER_DEGREE * math.cos(math.radians(far_lat))
+
+    def nearest(self, lat, lng, count=CANDIDATE_BRANCHES, max_km=None):
+        """Up to ``count`` (branch_id, km) pairs, nearest first, grown ring by ring around the point's cell."""
+        lat, lng = float(lat), float(lng)
+        center = self._cell(lat, lng)
+        lat_r, lng_r = math.radians(lat), math.radians(lng)
+        positions, distances = np.empty(0, dtype=np.int64), np.empty(0)
+        for ring in range(self._rings_to_cover(center) + 1):
+            found = self._ring(center, ring)
+            if found:
+                new = np.concatenate(found)
+                positions = np.concatenate([positions, new])
+                distances = np.concatenate([distances, haversine_km(lat_r, lng_r, self.lats[new], self.lngs[new])])
+            clearance = self._ring_clearance_km(lat, ring)
+            if max_km is not None and clearance > max_km:
+                break
+            if len(positions) >= count and np.sort(distances)[count - 1] <= clearance:
+                break
+
+        order = np.argsort(distances, kind='stable')[:count]
+        return [
+            (int(self.ids[positions[i]]), float(distances[i]))
+            for i in order if max_km is None or distances[i] <= max_km
+        ]
+
+
+# ==========================
+# 2. PROCESS-LOCAL INDEX, REBUILT ON CHANGE
+# ==========================
+
+class BranchLocator:
+    """Serves a per-process BranchIndex; branch/address writes bump a shared version (see inventory.signals)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = None  # (version, index)
+        self._checked_at = 0.0
+
+    def _current_version(self):
+        cache.add(VERSION_KEY, 1, timeout=None)
+        return cache.get(VERSION_KEY) or 1
+
+    def index(self):
+        now = time.monotonic()
+        local = self._local
+        if local is not None and now - self._checked_at < LOCAL_CHECK_INTERVAL:
+            return local[1]
+        with self._lock:
+            version = self._current_version()
+            if self._local is None or self._local[0] != version:
+                self._local = (version, BranchIndex.build())
+            self._checked_at = now
+            return self._local[1]
+
+    def invalidate(self):
+        try:
+            cache.incr(VERSION_KEY)
+        except ValueError:
+            cache.set(VERSION_KEY, 2, timeout=None)
+        with self._lock:
+            self._local = None
+
+
+branch_locator = BranchLocator()
+
+
+# ==========================
+# 3. ROUTING
+# ==========================
+
+def nearest_fulfilling_branches(lat, lng, quantities, limit=1, max_km=None, candidates=CANDIDATE_BRANCHES):
+    """
+    Nearest branches able to ship the whole cart (``{variant_id: quantity}``), as (branch_id, km)
+    pairs nearest first. The grid narrows the search to ``candidates`` branches; their free stock
+    for every variant in the cart is then checked with a single grouped query.
+    """
+    nearby = branch_locator.index().nearest(lat, lng, candidates, max_km)
+    if not quantities:
+        return nearby[:limit]
+    if not nearby:
+        return []
+
+    free = {
+        (row['branch_id'], row['variant_id']): row['free']
+        for row in sellable_batches([branch_id for branch_id, _ in nearby], list(quantities))
+        .order_by().values('branch_id', 'variant_id')
+        .annotate(free=Sum(F('qty_on_hand') - F('qty_reserved')))
+    }
+    able = [
+        (branch_id, km) for branch_id, km in nearby
+        if all(free.get((branch_id, variant_id), 0) >= qty for variant_id, qty in quantities.items())
+    ]
+    return able[:limit]
+
+
+def route_address(address, quantities, limit=1, max_km=None):
+    """nearest_fulfilling_branches() for a users.Address; [] when the address has no coordinates."""
+    if address.geo_lat is None or address.geo_lng is None:
+        return []
+    return nearest_fulfilling_branches(address.geo_lat, address.geo_lng, quantities, limit, max_km)
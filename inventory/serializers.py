@@ -0,0 +1,14 @@
+from rest_framework import serializers
+
+from .pos import MAX_LINES
+
+
+class PosLineSerializer(serializers.Serializer):
+    barcode = serializers.CharField(max_length=50)
+    quantity = serializers.IntegerField(min_value=1)
+
+
+class PosSaleSerializer(serializers.Serializer):
+    """Input of the POS sale endpoint: the whole scanned basket."""
+    branch = serializers.IntegerField()
+    lines = PosLineSerializer(many=True, allow_empty=False, max_length=MAX_LINES)
@@ -0,0 +1,43 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from users.models import Address
+
+from .availability import invalidate_availability
+from .models import Branch, Company, InventoryBatch
+from .routing import branch_locator
+
+# Note: queryset.update()/bulk_create() do not send these signals; bulk writers to branch
+# locations must call branch_locator.invalidate() themselves, and bulk writers to batches
+# invalidate_availability().
+
+
+@receiver([post_save, post_delete], sender=Branch)
+@receiver([post_save, post_delete], sender=Company)
+def rebuild_branch_index(sender, instance, **kwargs):
+    # After commit, so no process rebuilds the index from the pre-write rows under the new version
+    transaction.on_commit(branch_locator.invalidate)
+
+
+@receiver(post_save, sender=Address)
+def rebuild_branch_index_for_address(sender, instance, created, **kwargs):
+    """Customer addresses change constantly; only those already locating a branch matter to the index."""
+    if not created and Branch.objects.filter(address=instance).exists():
+        transaction.on_commit(branch_locator.invalidate)
+
+
+@receiver([post_save, post_delete], sender=InventoryBatch)
+def invalidate_batch_availability(sender, instance, **kwargs):
+    invalidate_availability([instance.branch_id])
+
+
+@receiver([post_save, post_delete], sender=Branch)
+def invalidate_branch_availability(sender, instance, **kwargs):
+    invalidate_availability([instance.pk])
+
+
+@receiver(post_save, sender=Company)
+def invalidate_company_availability(sender, instance, created, **kwargs):
+    if not created:
+        invalidate_availability(instance.branches.values_list('pk', flat=True))
@@ -0,0 +1,107 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Case, F, Q, Sum, When
+from django.utils import timezone
+
+from .checkpoints import archived_balances
+from .models import InventoryBatch, InventoryMovement, StockLevel
+
+
+# ==========================
+# 1. INCREMENTAL MAINTENANCE (SAME TRANSACTION AS THE MOVEMENTS)
+# ==========================
+
+def apply_movement_deltas(movements):
+    """
+    Folds a list of just-written movements into StockLevel with a fixed number of queries:
+    resolve batches -> (branch, variant), create missing rows, then one incrementing UPDATE ... CASE.
+    Must run inside the transaction that wrote the movements.
+    """
+    per_batch = defaultdict(int)
+    for movement in movements:
+        per_batch[movement.batch_id] += movement.delta_qty
+    if not per_batch:
+        return
+
+    deltas = defaultdict(int)
+    for batch_id, branch_id, variant_id in (
+        InventoryBatch.objects.filter(pk__in=per_batch).values_list('pk', 'branch_id', 'variant_id')
+    ):
+        deltas[(branch_id, variant_id)] += per_batch[batch_id]
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    StockLevel.objects.bulk_create(
+        [StockLevel(branch_id=branch_id, variant_id=variant_id) for branch_id, variant_id in deltas],
+        ignore_conflicts=True,
+    )
+    match, whens = Q(), []
+    for (branch_id, variant_id), delta in deltas.items():
+        condition = Q(branch_id=branch_id, variant_id=variant_id)
+        match |= condition
+        whens.append(When(condition, then=F('qty_on_hand') + delta))
+    StockLevel.objects.filter(match).update(qty_on_hand=Case(*whens), updated_at=timezone.now())
+
+
+# ==========================
+# 2. READ PATH
+# ==========================
+
+def stock_on_hand(branch_id, variant_id):
+    """Units of a variant at a branch: a single unique-index lookup, 0 when never stocked."""
+    qty = (
+        StockLevel.objects
+        .filter(branch_id=branch_id, variant_id=variant_id)
+        .values_list('qty_on_hand', flat=True)
+        .first()
+    )
+    return qty or 0
+
+
+# ==========================
+# 3. RECONCILIATION
+# ==========================
+
+def reconcile_stock_levels(fix=True):
+    """
+    Rebuilds stock on hand from the InventoryMovement ledger (plus the balances of archived
+    movements, see inventory.checkpoints) and compares it with StockLevel.
+    Returns the drifted rows as (branch_id, variant_id, snapshot_qty, ledger_qty); when ``fix``
+    is set those rows are corrected in the same transaction.
+    """
+    with transaction.atomic():
+        # Lock first: a record_movements() that commits before the lock is granted is in the ledger
+        # sum below, and one still running waits for this transaction before adding its deltas
+        snapshot = {
+            (level.branch_id, level.variant_id): level
+            for level in StockLevel.objects.select_for_update()
+        }
+        ledger = defaultdict(int, archived_balances())
+        for row in (InventoryMovement.objects.order_by()
+                    .values('batch__branch_id', 'batch__variant_id').annotate(qty=Sum('delta_qty'))):
+            ledger[row['batch__branch_id'], row['batch__variant_id']] += row['qty']
+
+        drift = []
+        for key in sorted(ledger.keys() | snapshot.keys()):
+            expected = ledger.get(key, 0)
+            level = snapshot.get(key)
+            actual = level.qty_on_hand if level else 0
+            if expected != actual:
+                drift.append((*key, actual, expected))
+
+        if fix and drift:
+            now = timezone.now()
+            missing = [StockLevel(branch_id=b, variant_id=v, qty_on_hand=expected)
+                       for b, v, _, expected in drift if (b, v) not in snapshot]
+            changed = []
+            for branch_id, variant_id, _, expected in drift:
+                level = snapshot.get((branch_id, variant_id))
+                if level is not None:
+                    level.qty_on_hand, level.updated_at = expected, now
+                    changed.append(level)
+            # A row created by a movement committed since the lock already holds the ledger quantity
+            StockLevel.objects.bulk_create(missing, ignore_conflicts=True)
+            StockLevel.objects.bulk_update(changed, ['qty_on_hand', 'updated_at'])
+    return drift
@@ -0,0 +1,57 @@
+import datetime
+
+from celery import shared_task
+from django.utils import timezone
+
+from .checkpoints import archive_periods, close_periods
+from .expiry import scan_expiry_risk
+from .forecasting import branch_shards, forecast_branches
+from .partitions import ensure_movement_partitions
+from .reservation import release_expired_reservations
+from .stock import reconcile_stock_levels
+
+
+@shared_task
+def scan_expiry_risk_task():
+    """Periodic (beat) run of the expiry-risk scan; returns the counts for the task result."""
+    result = scan_expiry_risk()
+    return {'flagged': result.flagged, 'changed': result.changed, 'removed': result.removed}
+
+
+@shared_task
+def release_expired_reservations_task():
+    """Every minute (beat): returns the stock held by abandoned carts; returns the number released."""
+    return release_expired_reservations()
+
+
+@shared_task
+def reconcile_stock_levels_task():
+    """Nightly (beat): corrects StockLevel rows that drifted from the ledger; returns the drift found."""
+    return [list(row) for row in reconcile_stock_levels(fix=True)]
+
+
+@shared_task
+def ensure_movement_partitions_task(months_ahead=3):
+    """Daily (beat): keeps movement partitions ahead of time, so no row lands in the default partition."""
+    return ensure_movement_partitions(months_ahead=months_ahead)
+
+
+@shared_task
+def forecast_shard_task(branch_ids, end):
+    """Forecasts one shard of branches; ``end`` (ISO date) is shared by every shard of a run."""
+    return forecast_branches(branch_ids, datetime.date.fromisoformat(end))
+
+
+@shared_task
+def forecast_demand_task():
+    """Nightly forecast: one task per branch shard, so every worker process (core) takes a share."""
+    end = timezone.localdate().isoformat()
+    for shard in branch_shards():
+        forecast_shard_task.delay(shard, end)
+
+
+@shared_task
+def compact_movements_task():
+    """Daily (beat): closes finished months into checkpoints, then archives the movements past retention."""
+    closed, archived = close_periods(), archive_periods()
+    return {'closed': [str(period) for period in closed], 'archived': [str(period) for period in archived]}
@@ -1,3 +1,737 @@
-from django.test import TestCase
+import csv
+import datetime
+import gzip
+import io
+import json
+import tempfile
+from decimal import Decimal
+from unittest import mock, skipIf, skipUnless
 
-# Create your tests here.
+import numpy as np
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from catalog.models import DosageForm, Manufacturer, Product, ProductVariant
+from orders.models import Order, OrderItem
+from pharma_store_v01.query_budget import QueryBudgetTestMixin
+from users.models import Address
+
+from .allocation import allocate_orders
+from .checkpoints import archive_periods, close_periods, quantities_as_of
+from .exceptions import ClosedPeriod, InsufficientStock, UnknownBarcode
+from .expiry import scan_expiry_risk
+from .forecasting import HISTORY_DAYS, MODEL_VERSION, SalesMatrix, forecast, run_forecast
+from .ledger import movement_history, record_movements
+from .models import (
+    Branch, Company, ExpiryRisk, InventoryBatch, InventoryMovement, MovementCheckpoint, Prediction, StockLevel,
+    StockReservation,
+)
+from .partitions import create_month_partitions, ensure_movement_partitions, partition_name
+from .pos import ReceiptLine, _sell_in_one_statement, _sell_with_orm, sell_basket
+from .stock import reconcile_stock_levels, stock_on_hand
+from .valuation import ROWS_PER_CHUNK, export_valuation
+from .reservation import release_expired_reservations, release_reference, reserve_stock
+from .routing import BranchIndex, branch_locator, haversine_km, nearest_fulfilling_branches, route_address
+
+
+class InventoryTestData(TestCase):
+    """Shared fixture: one pharmacy branch selling one variant."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('owner', password='x')
+        cls.company = Company.objects.create(type='pharmacy', name='Pharma', owner=cls.user)
+        cls.branch = Branch.objects.create(company=cls.company, name='Downtown')
+        manufacturer = Manufacturer.objects.create(name='Acme')
+        cls.product = Product.objects.create(brand_name='Panadol', manufacturer=manufacturer)
+        cls.dosage_form = DosageForm.objects.create(name='Tablet')
+        cls.variant = ProductVariant.objects.create(product=cls.product, dosage_form=cls.dosage_form,
+                                                    strength_text='500 mg', pack_size=20, barcode_gtin='6221')
+        cls.address = Address.objects.create(user=cls.user, governorate='Cairo', city='Cairo', district='Nasr',
+                                             street='Main', building_no='1')
+
+    def make_batch(self, qty, expiry_days, **kwargs):
+        expiry = datetime.date.today() + datetime.timedelta(days=expiry_days) if expiry_days is not None else None
+        defaults = dict(branch=self.branch, variant=self.variant, qty_on_hand=qty, expiry_date=expiry,
+                        cost_price=Decimal('5.00'), sale_price=Decimal('8.00'))
+        defaults.update(kwargs)
+        return InventoryBatch.objects.create(**defaults)
+
+    def make_order(self, qty):
+        order = Order.objects.create(customer=self.user, branch=self.branch, shipping_address=self.address,
+                                     total=Decimal('0'))
+        OrderItem.objects.create(order=order, variant=self.variant, quantity=qty, unit_price=Decimal('8.00'))
+        return order
+
+
+class FefoAllocationTests(InventoryTestData):
+
+    def test_earliest_expiry_batch_is_used_first(self):
+        late = self.make_batch(10, 300)
+        early = self.make_batch(10, 30)
+        order = self.make_order(4)
+
+        result = allocate_orders(order)
+
+        self.assertEqual(result.shortfalls, {})
+        item = order.items.get()
+        self.assertEqual(item.batch, early)
+        early.refresh_from_db()
+        late.refresh_from_db()
+        self.assertEqual((early.qty_reserved, late.qty_reserved), (4, 0))
+
+    def test_line_is_split_across_batches(self):
+        self.make_batch(3, 30)
+        self.make_batch(10, 60)
+        order = self.make_order(5)
+
+        allocate_orders([order])
+
+        self.assertEqual(sorted(order.items.values_list('quantity', flat=True)), [2, 3])
+
+    def test_order_holds_one_unallocated_line_per_variant(self):
+        order = self.make_order(5)
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            OrderItem.objects.create(order=order, variant=self.variant, quantity=1, unit_price=Decimal('8.00'))
+        OrderItem.objects.create(order=order, variant=self.variant, batch=self.make_batch(3, 30), quantity=1,
+                                 unit_price=Decimal('8.00'))
+
+    def test_expired_unavailable_and_reserved_stock_is_skipped(self):
+        self.make_batch(10, -1)
+        self.make_batch(10, 30, is_available=False)
+        self.make_batch(10, 30, qty_reserved=10)
+        order = self.make_order(1)
+
+        result = allocate_orders(order)
+
+        self.assertEqual(list(result.shortfalls.values()), [1])
+        self.assertIsNone(order.items.get().batch)
+
+    def test_query_count_is_independent_of_order_count(self):
+        self.make_batch(100, 30)
+        orders = [self.make_order(2) for _ in range(10)]
+
+        with self.assertNumQueries(6):
+            allocate_orders(orders)
+
+
+class StockReservationTests(InventoryTestData):
+
+    def test_whole_quantity_comes_from_earliest_batch_that_fits(self):
+        self.make_batch(2, 10)
+        fits = self.make_batch(10, 20)
+
+        reservations = reserve_stock(self.branch.pk, self.variant.pk, 5, reference='cart:1')
+
+        self.assertEqual([(r.batch_id, r.quantity) for r in reservations], [(fits.pk, 5)])
+        fits.refresh_from_db()
+        self.assertEqual(fits.qty_reserved, 5)
+
+    def test_falls_back_to_splitting_over_siblings(self):
+        first = self.make_batch(3, 10)
+        second = self.make_batch(3, 20)
+
+        reservations = reserve_stock(self.branch.pk, self.variant.pk, 5)
+
+        self.assertEqual([(r.batch_id, r.quantity) for r in reservations], [(first.pk, 3), (second.pk, 2)])
+
+    def test_insufficient_stock_reserves_nothing(self):
+        batch = self.make_batch(3, 10)
+
+        with self.assertRaises(InsufficientStock):
+            reserve_stock(self.branch.pk, self.variant.pk, 4)
+
+        batch.refresh_from_db()
+        self.assertEqual(batch.qty_reserved, 0)
+        self.assertFalse(StockReservation.objects.exists())
+
+    def test_expired_and_released_reservations_return_stock(self):
+        batch = self.make_batch(10, 10)
+        reserve_stock(self.branch.pk, self.variant.pk, 4, ttl=-1)
+        reserve_stock(self.branch.pk, self.variant.pk, 3, reference='cart:7')
+
+        self.assertEqual(release_expired_reservations(), 1)
+        self.assertEqual(release_reference('cart:7'), 1)
+
+        batch.refresh_from_db()
+        self.assertEqual(batch.qty_reserved, 0)
+
+
+class MovementLedgerTests(InventoryTestData):
+
+    def test_bulk_write_uses_one_insert_per_chunk(self):
+        batch = self.make_batch(10, 30)
+        movements = (InventoryMovement(batch=batch, type='adjustment', delta_qty=1) for _ in range(25))
+
+        # savepoint + 3 x (INSERT + stock level maintenance (3)) + release
+        with self.assertNumQueries(14):
+            written = record_movements(movements, batch_size=10)
+
+        self.assertEqual(written, 25)
+        self.assertEqual(movement_history(batch.pk).count(), 25)
+
+    def test_partition_maintenance_is_a_no_op_without_postgres(self):
+        self.assertEqual(ensure_movement_partitions(), [])
+
+    def test_partitions_are_kept_ahead_of_the_utc_month(self):
+        late_evening = datetime.datetime(2026, 1, 31, 23, 30, tzinfo=datetime.timezone.utc)
+        with mock.patch('inventory.partitions.is_partitioned', return_value=True), \
+                mock.patch('inventory.partitions.timezone.now', return_value=late_evening), \
+                mock.patch('inventory.partitions.create_month_partitions') as create:
+            ensure_movement_partitions(months_ahead=2)
+        self.assertEqual(create.call_args.args[:2], (datetime.date(2026, 1, 31), datetime.date(2026, 3, 1)))
+
+    @skipUnless(connection.vendor == 'postgresql', "Movement partitions only exist on PostgreSQL")
+    def test_back_dated_rows_move_from_the_default_partition_into_their_month(self):
+        movement = InventoryMovement(batch=self.make_batch(1, 30), type='purchase', delta_qty=1)
+        record_movements([movement])
+        month = datetime.date(2001, 1, 1)
+        InventoryMovement.objects.filter(pk=movement.pk).update(
+            created_at=datetime.datetime(2001, 1, 15, tzinfo=datetime.timezone.utc))
+
+        self.assertEqual(create_month_partitions(month, month), [partition_name(month)])
+
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT tableoid::regclass::text FROM inventory_inventorymovement WHERE id = %s",
+                           [movement.pk])
+            self.assertEqual(cursor.fetchone()[0], partition_name(month))
+
+
+class StockLevelTests(InventoryTestData):
+
+    def test_snapshot_follows_movements_across_batches(self):
+        first, second = self.make_batch(0, 30), self.make_batch(0, 60)
+        record_movements([
+            InventoryMovement(batch=first, type='purchase', delta_qty=10),
+            InventoryMovement(batch=second, type='purchase', delta_qty=5),
+        ])
+        record_movements([InventoryMovement(batch=first, type='sale', delta_qty=-3)])
+
+        self.assertEqual(stock_on_hand(self.branch.pk, self.variant.pk), 12)
+
+    def test_reconciliation_reports_and_fixes_drift(self):
+        batch = self.make_batch(0, 30)
+        record_movements([InventoryMovement(batch=batch, type='purchase', delta_qty=10)])
+        StockLevel.objects.update(qty_on_hand=7)
+
+        drift = reconcile_stock_levels()
+
+        self.assertEqual(drift, [(self.branch.pk, self.variant.pk, 7, 10)])
+        self.assertEqual(stock_on_hand(self.branch.pk, self.variant.pk), 10)
+        self.assertEqual(reconcile_stock_levels(), [])
+
+    def test_reconciliation_locks_stock_levels_before_reading_the_ledger(self):
+        record_movements([InventoryMovement(batch=self.make_batch(0, 30), type='purchase', delta_qty=10)])
+        with CaptureQueriesContext(connection) as queries:
+            reconcile_stock_levels(fix=False)
+        tables = [('inventory_stocklevel' in query['sql'], 'inventory_inventorymovement' in query['sql'])
+                  for query in queries.captured_queries]
+        self.assertLess(tables.index((True, False)), tables.index((False, True)))
+
+
+class ExpiryRiskTests(QueryBudgetTestMixin, InventoryTestData):
+
+    def buckets(self):
+        return {
+            risk.bucket_days: (risk.batch_count, risk.units, risk.cost_value)
+            for risk in ExpiryRisk.objects.filter(branch=self.branch)
+        }
+
+    def test_scan_flags_expired_and_buckets_near_expiry_value(self):
+        expired = self.make_batch(5, -1)
+        self.make_batch(2, 10)
+        self.make_batch(3, 20)
+        self.make_batch(4, 75)
+        self.make_batch(9, 200)
+        self.make_batch(0, 10)
+
+        result = scan_expiry_risk()
+
+        expired.refresh_from_db()
+        self.assertFalse(expired.is_available)
+        self.assertEqual(result.flagged, 1)
+        self.assertEqual(self.buckets(), {30: (2, 5, Decimal('25.00')), 90: (1, 4, Decimal('20.00'))})
+
+    def test_rescan_only_touches_changed_buckets(self):
+        soon = self.make_batch(2, 10)
+        self.make_batch(4, 75)
+        scan_expiry_risk()
+        computed_at = ExpiryRisk.objects.get(bucket_days=90).computed_at
+
+        InventoryBatch.objects.filter(pk=soon.pk).update(qty_on_hand=0)
+        with self.assertQueryBudget(6):
+            result = scan_expiry_risk()
+
+        self.assertEqual((result.changed, result.removed), (0, 1))
+        self.assertEqual(ExpiryRisk.objects.get(bucket_days=90).computed_at, computed_at)
+        self.assertEqual(set(self.buckets()), {90})
+
+    def test_buckets_follow_the_calendar(self):
+        self.make_batch(4, 45)
+        scan_expiry_risk(today=datetime.date.today() + datetime.timedelta(days=20))
+        self.assertEqual(set(self.buckets()), {30})
+
+
+class DemandForecastTests(InventoryTestData):
+
+    def test_model_projects_level_and_weekday_pattern(self):
+        monday = datetime.date(2026, 1, 5)
+        flat = np.full(28, 2.0)
+        weekends = np.tile([0, 0, 0, 0, 0, 7, 7], 4).astype(float)
+        result = forecast(SalesMatrix([(1, 1), (1, 2), (1, 3)], np.vstack([flat, weekends, np.zeros(28)]), monday),
+                          horizons=(7, 14))
+
+        self.assertEqual(result[7].tolist(), [14, 14, 0])
+        self.assertEqual(result[14].tolist(), [28, 28, 0])
+
+    def test_pipeline_upserts_predictions_from_sales(self):
+        batch = self.make_batch(500, 300)
+        record_movements(
+            InventoryMovement(batch=batch, type='sale', delta_qty=-3, created_by=self.user) for _ in range(4)
+        )
+        tomorrow = timezone.localdate() + datetime.timedelta(days=1)
+
+        self.assertEqual(run_forecast(workers=1, end=tomorrow), 3)
+        self.assertEqual(run_forecast(workers=1, end=tomorrow), 3)
+
+        predictions = Prediction.objects.filter(branch=self.branch, variant=self.variant)
+        self.assertEqual(set(predictions.values_list('horizon_days', flat=True)), {7, 14, 30})
+        self.assertEqual(set(predictions.values_list('model_version', flat=True)), {MODEL_VERSION})
+        self.assertTrue(all(demand > 0 for demand in predictions.values_list('predicted_demand', flat=True)))
+
+        # The variant stops selling (its sales fall out of the window) while another one starts
+        InventoryMovement.objects.update(created_at=timezone.now() - datetime.timedelta(days=HISTORY_DAYS + 5))
+        other = ProductVariant.objects.create(product=self.product, dosage_form=self.dosage_form,
+                                              strength_text='1 g', pack_size=10)
+        record_movements([InventoryMovement(batch=self.make_batch(50, 300, variant=other), type='sale', delta_qty=-2)])
+
+        self.assertEqual(run_forecast(workers=1, end=tomorrow), 3)
+        self.assertFalse(predictions.exists())
+        self.assertEqual(Prediction.objects.filter(variant=other).count(), 3)
+        self.assertEqual(run_forecast(workers=1, end=tomorrow + datetime.timedelta(days=HISTORY_DAYS + 1)), 0)
+        self.assertFalse(Prediction.objects.exists())
+
+
+class BranchRoutingTests(QueryBudgetTestMixin, InventoryTestData):
+
+    def setUp(self):
+        branch_locator.invalidate()
+        self.addCleanup(branch_locator.invalidate)
+
+    def make_branch(self, name, lat, lng, **kwargs):
+        address = Address.objects.create(governorate='Cairo', city='Cairo', district=name, street=name,
+                                         building_no='1', geo_lat=Decimal(str(lat)), geo_lng=Decimal(str(lng)))
+        return Branch.objects.create(company=self.company, name=name, address=address, **kwargs)
+
+    def test_grid_search_matches_brute_force(self):
+        rng = np.random.default_rng(7)
+        points = [(i, *point) for i, point in enumerate(rng.uniform([22, 25], [32, 35], size=(300, 2)))]
+        index = BranchIndex(points)
+        for lat, lng in rng.uniform([22, 25], [32, 35], size=(20, 2)):
+            distances = haversine_km(np.radians(lat), np.radians(lng), index.lats, index.lngs)
+            expected = np.argsort(distances, kind='stable')[:5].tolist()
+            self.assertEqual([i for i, _ in index.nearest(lat, lng, count=5)], expected)
+
+    def test_nearest_branch_with_the_whole_cart_in_stock_wins(self):
+        near = self.make_branch('Near', 30.05, 31.24)
+        far = self.make_branch('Far', 30.60, 31.50)
+        self.make_branch('No shipping', 30.04, 31.23, shipping_available=False)
+        self.make_batch(1, 30, branch=near)
+        self.make_batch(5, 30, branch=far)
+        customer = Address(geo_lat=Decimal('30.04'), geo_lng=Decimal('31.23'))
+
+        self.assertEqual([branch for branch, _ in route_address(customer, {}, limit=5)], [near.pk, far.pk])
+        with self.assertQueryBudget(1):
+            routed = route_address(customer, {self.variant.pk: 3})
+        self.assertEqual([branch for branch, _ in routed], [far.pk])
+        self.assertEqual(route_address(customer, {self.variant.pk: 3}, max_km=20), [])
+
+    def test_branch_changes_rebuild_the_index(self):
+        self.assertEqual(nearest_fulfilling_branches(30, 31, {}), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            branch = self.make_branch('New', 30.01, 31.01)
+        self.assertEqual(nearest_fulfilling_branches(30, 31, {})[0][0], branch.pk)
+
+
+class ValuationExportTests(InventoryTestData):
+
+    def setUp(self):
+        self.supplier = Company.objects.create(type='supplier', name='Supplier', owner=self.user)
+        self.make_batch(10, 30)
+        self.make_batch(5, 60, supplier=self.supplier, cost_price=Decimal('2.50'))
+        self.make_batch(3, 90, supplier=self.supplier, sale_price=Decimal('4.00'))
+
+    def test_summary_groups_by_company_branch_and_supplier(self):
+        rows = list(csv.DictReader(io.StringIO(''.join(export_valuation('csv')))))
+
+        self.assertEqual(
+            [(row['supplier'], int(row['batches']), int(row['units']), Decimal(row['cost_value']),
+              Decimal(row['sale_value'])) for row in rows],
+            [('', 1, 10, Decimal('50'), Decimal('80')), ('Supplier', 2, 8, Decimal('27.5'), Decimal('52'))],
+        )
+
+    def test_detail_ndjson_is_chunked_and_gzip_round_trips(self):
+        for i in range(ROWS_PER_CHUNK):
+            self.make_batch(1, 30)
+        chunks = list(export_valuation('ndjson', detail=True))
+        self.assertEqual(len(chunks), 2)
+        records = [json.loads(line) for line in ''.join(chunks).splitlines()]
+        self.assertEqual(len(records), ROWS_PER_CHUNK + 3)
+        self.assertEqual(Decimal(records[0]['cost_value']), Decimal('50'))
+
+        compressed = b''.join(export_valuation('ndjson', detail=True, compress=True))
+        self.assertEqual(gzip.decompress(compressed).decode(), ''.join(chunks))
+
+    def test_endpoint_streams_for_staff_only(self):
+        url = reverse('inventory:valuation-export')
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        self.client.force_login(User.objects.create_superuser('admin', password='x'))
+        response = self.client.get(url, {'output': 'ndjson', 'company': self.company.pk})
+        self.assertTrue(response.streaming)
+        self.assertEqual(len(b''.join(response.streaming_content).splitlines()), 2)
+        self.assertEqual(self.client.get(url, {'output': 'xml'}).status_code, 400)
+
+    async def test_endpoint_streams_chunk_by_chunk_under_asgi(self):
+        await self.async_client.aforce_login(await User.objects.acreate(username='admin', is_staff=True))
+        with mock.patch('inventory.valuation.ROWS_PER_CHUNK', 1):
+            response = await self.async_client.get(reverse('inventory:valuation-export'), {'detail': '1'})
+            self.assertTrue(response.is_async)
+            chunks = [chunk async for chunk in response.streaming_content]
+
+        self.assertGreater(len(chunks), 3)
+        self.assertEqual(len(b''.join(chunks).splitlines()), 4)
+
+    def test_command_writes_csv(self):
+        out = io.StringIO()
+        call_command('export_valuation', stdout=out)
+        self.assertEqual(len(out.getvalue().splitlines()), 3)
+
+
+class BranchAvailabilityTests(InventoryTestData):
+
+    def setUp(self):
+        cache.clear()
+        self.url = reverse('inventory:branch-availability')
+
+    def availability(self, *branches):
+        response = self.client.get(self.url, {'variants': f'{self.variant.pk}',
+                                              'branches': ','.join(str(branch.pk) for branch in branches)})
+        return [(row['name'], row['variants']) for row in response.json()]
+
+    def test_free_units_and_best_price_per_branch(self):
+        other = Branch.objects.create(company=self.company, name='Uptown')
+        self.make_batch(10, 30, qty_reserved=4, sale_price=Decimal('9.00'))
+        self.make_batch(3, 60, sale_price=Decimal('7.50'))
+        self.make_batch(8, -1)  # expired
+
+        with self.assertNumQueries(2):  # branches + one grouped stock query for the whole matrix
+            rows = self.availability(self.branch, other)
+
+        self.assertEqual(rows, [('Downtown', [{'variant_id': self.variant.pk, 'units': 9, 'best_price': '7.50'}]),
+                                ('Uptown', [])])
+
+    def test_cached_matrix_is_served_without_queries_until_a_batch_changes(self):
+        self.make_batch(10, 30)
+        self.availability(self.branch)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.availability(self.branch)[0][1][0]['units'], 10)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            reserve_stock(self.branch.pk, self.variant.pk, 4)
+        self.assertEqual(self.availability(self.branch)[0][1][0]['units'], 6)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.make_batch(5, 60, sale_price=Decimal('6.00'))
+        self.assertEqual(self.availability(self.branch)[0][1], [
+            {'variant_id': self.variant.pk, 'units': 11, 'best_price': '6.00'},
+        ])
+
+    def test_inactive_company_hides_its_branches(self):
+        self.make_batch(10, 30)
+        self.availability(self.branch)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.company.is_active = False
+            self.company.save()
+        self.assertEqual(self.availability(self.branch), [])
+
+    async def test_rejects_bad_or_oversized_lists(self):
+        self.assertEqual((await self.async_client.get(self.url, {'variants': 'x', 'branches': '1'})).status_code, 400)
+        too_many = ','.join(str(i) for i in range(1, 100))
+        self.assertEqual((await self.async_client.get(self.url, {'variants': too_many, 'branches': '1'})).status_code,
+                         400)
+        response = await self.async_client.get(self.url, {'variants': '1', 'branches': str(self.branch.pk)})
+        self.assertEqual(response.json()[0]['variants'], [])
+
+
+class PosSaleTests(InventoryTestData):
+
+    def setUp(self):
+        self.url = reverse('inventory:pos-sale')
+        self.other = ProductVariant.objects.create(product=self.product, dosage_form=self.dosage_form,
+                                                   strength_text='1 g', pack_size=10, barcode_gtin='6222')
+
+    def stocked_batch(self, qty, expiry_days, **kwargs):
+        batch = self.make_batch(qty, expiry_days, **kwargs)
+        record_movements([InventoryMovement(batch=batch, type='purchase', delta_qty=qty)])
+        return batch
+
+    def test_basket_is_split_fefo_and_booked(self):
+        late, early = self.stocked_batch(10, 60), self.stocked_batch(3, 20, sale_price=Decimal('7.00'))
+        other = self.stocked_batch(4, 30, variant=self.other)
+
+        sale = sell_basket(self.branch.pk, [('6221', 4), ('6222', 1), ('6221', 1)], user=self.user)
+
+        self.assertEqual([(line.gtin, line.batch_id, line.quantity) for line in sale.lines],
+                         [('6221', early.pk, 3), ('6221', late.pk, 2), ('6222', other.pk, 1)])
+        self.assertEqual(sale.total, Decimal('45.00'))
+        self.assertEqual([b.qty_on_hand for b in InventoryBatch.objects.order_by('pk')], [8, 0, 3])
+        self.assertEqual(InventoryMovement.objects.filter(type='sale', created_by=self.user).count(), 3)
+        self.assertEqual(stock_on_hand(self.branch.pk, self.variant.pk), 8)
+
+    def test_short_or_unknown_line_sells_nothing(self):
+        self.stocked_batch(2, 30)
+        self.stocked_batch(5, 30, variant=self.other)
+
+        with self.assertRaises(InsufficientStock) as caught:
+            sell_basket(self.branch.pk, [('6222', 1), ('6221', 3)])
+        self.assertEqual((caught.exception.variant_id, caught.exception.available), (self.variant.pk, 2))
+        with self.assertRaises(UnknownBarcode):
+            sell_basket(self.branch.pk, [('6222', 1), ('999', 1)])
+
+        self.assertFalse(InventoryMovement.objects.filter(type='sale').exists())
+        self.assertEqual(stock_on_hand(self.branch.pk, self.other.pk), 5)
+
+    def test_refused_sale_is_sold_again_when_the_stock_is_there_by_now(self):
+        batch = self.stocked_batch(3, 30)
+        line = ReceiptLine('6221', self.variant.pk, batch.pk, batch.expiry_date, 2, batch.sale_price)
+
+        with mock.patch('inventory.pos.connection', vendor='postgresql'), \
+                mock.patch('inventory.pos._sell_in_one_statement', side_effect=[[], [line]]) as sell:
+            self.assertEqual(sell_basket(self.branch.pk, [('6221', 2)]).lines, [line])
+        self.assertEqual(sell.call_count, 2)
+
+        with mock.patch('inventory.pos.connection', vendor='postgresql'), \
+                mock.patch('inventory.pos._sell_in_one_statement', return_value=[]), \
+                self.assertRaises(InsufficientStock) as caught:
+            sell_basket(self.branch.pk, [('6221', 2)])
+        self.assertEqual(caught.exception.available, 3)
+
+    @skipIf(connection.vendor == 'postgresql', "PostgreSQL takes the stock in one statement")
+    def test_statement_count_does_not_grow_with_the_basket(self):
+        variants = [
+            ProductVariant.objects.create(product=self.product, dosage_form=self.dosage_form, strength_text=f'{i} mg',
+                                          pack_size=100 + i, barcode_gtin=f'70{i}')
+            for i in range(12)
+        ]
+        for variant in variants:
+            self.stocked_batch(5, 30, variant=variant)
+            self.stocked_batch(5, 60, variant=variant)
+
+        # savepoint, barcodes, locked batches, batch UPDATE, ledger (savepoint, INSERT, stock levels (3), release),
+        # release
+        with self.assertNumQueries(11):
+            sale = sell_basket(self.branch.pk, [(variant.barcode_gtin, 7) for variant in variants])
+        self.assertEqual(len(sale.lines), 24)
+
+    def test_endpoint_checks_branch_and_reports_failures(self):
+        self.stocked_batch(3, 30)
+        self.client.force_login(self.user)
+
+        response = self.client.post(self.url, {'branch': self.branch.pk, 'lines': [{'barcode': '6221', 'quantity': 2}]},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['total'], '16.00')
+
+        response = self.client.post(self.url, {'branch': self.branch.pk, 'lines': [{'barcode': '6221', 'quantity': 2}]},
+                                    content_type='application/json')
+        self.assertEqual((response.status_code, response.json()['available']), (409, 1))
+        response = self.client.post(self.url, {'branch': self.branch.pk, 'lines': [{'barcode': 'x', 'quantity': 1}]},
+                                    content_type='application/json')
+        self.assertEqual((response.status_code, response.json()['barcodes']), (400, ['x']))
+
+        self.client.force_login(User.objects.create_user('stranger', password='x'))
+        response = self.client.post(self.url, {'branch': self.branch.pk, 'lines': [{'barcode': '6221', 'quantity': 1}]},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 404)
+
+
+@skipUnless(connection.vendor == 'postgresql', "The one-statement sale runs on PostgreSQL only")
+class OneStatementSaleTests(InventoryTestData):
+
+    def setUp(self):
+        self.other = ProductVariant.objects.create(product=self.product, dosage_form=self.dosage_form,
+                                                   strength_text='1 g', pack_size=10, barcode_gtin='6222')
+        for variant, qty, expiry_days in ((self.variant, 10, 60), (self.variant, 3, 20), (self.other, 4, 30)):
+            batch = self.make_batch(qty, expiry_days, variant=variant)
+            record_movements([InventoryMovement(batch=batch, type='purchase', delta_qty=qty)])
+
+    def outcome(self, sell, basket):
+        """Receipt, batches, sale movements and stock levels after ``sell``, rolled back afterwards."""
+        savepoint = transaction.savepoint()
+        try:
+            return (
+                sell(self.branch.pk, basket, self.user.pk),
+                list(InventoryBatch.objects.order_by('pk').values_list('pk', 'qty_on_hand')),
+                list(InventoryMovement.objects.filter(type='sale').order_by('batch_id')
+                     .values_list('batch_id', 'delta_qty', 'created_by_id')),
+                list(StockLevel.objects.order_by('variant_id').values_list('variant_id', 'qty_on_hand')),
+            )
+        finally:
+            transaction.savepoint_rollback(savepoint)
+
+    def test_sells_exactly_like_the_orm_path(self):
+        basket = [('6221', 5), ('6222', 4)]
+
+        sold = self.outcome(_sell_in_one_statement, basket)
+
+        self.assertEqual(len(sold[0]), 3)
+        self.assertEqual(sold, self.outcome(_sell_with_orm, basket))
+
+    def test_short_or_unknown_line_is_refused_whole_and_explained(self):
+        before = self.outcome(lambda *args: [], [])
+        for basket in ([('6222', 1), ('6221', 14)], [('6221', 1), ('999', 1)]):
+            self.assertEqual(self.outcome(_sell_in_one_statement, basket), before)
+
+        with self.assertRaises(InsufficientStock) as caught:
+            sell_basket(self.branch.pk, [('6222', 1), ('6221', 14)])
+        self.assertEqual((caught.exception.variant_id, caught.exception.available), (self.variant.pk, 13))
+        with self.assertRaises(UnknownBarcode):
+            sell_basket(self.branch.pk, [('6221', 1), ('999', 1)])
+
+    def test_sale_refused_before_stock_was_freed_is_sold_on_the_retry(self):
+        attempts = iter([lambda *args: [], _sell_in_one_statement])
+        with mock.patch('inventory.pos._sell_in_one_statement', side_effect=lambda *args: next(attempts)(*args)):
+            sale = sell_basket(self.branch.pk, [('6221', 5)], user=self.user)
+
+        self.assertEqual([line.quantity for line in sale.lines], [3, 2])
+        self.assertEqual(stock_on_hand(self.branch.pk, self.variant.pk), 8)
+
+
+def utc(month, day):
+    return datetime.datetime(2026, month, day, tzinfo=datetime.timezone.utc)
+
+
+class MovementCheckpointTests(InventoryTestData):
+
+    def setUp(self):
+        self.first, self.second = self.make_batch(0, 300), self.make_batch(0, 400)
+        self.move(self.first, 10, utc(1, 10))
+        self.move(self.first, -3, utc(1, 20))
+        self.move(self.second, 2, utc(1, 25))
+        self.move(self.second, 4, utc(2, 5))
+        self.move(self.first, -2, utc(3, 3))
+        self.now = utc(4, 15)
+
+    def move(self, batch, delta, when):
+        movement = InventoryMovement(batch=batch, type='purchase' if delta > 0 else 'sale', delta_qty=delta)
+        record_movements([movement])
+        InventoryMovement.objects.filter(pk=movement.pk).update(created_at=when)
+
+    def as_of(self, when):
+        return quantities_as_of([self.first.pk, self.second.pk], when)
+
+    def test_closed_months_are_checkpointed_once(self):
+        self.assertEqual([str(period) for period in close_periods(self.now)], ['2026-01', '2026-02', '2026-03'])
+        self.assertEqual(close_periods(self.now), [])
+        self.assertEqual(sorted(MovementCheckpoint.objects.filter(as_of=utc(4, 1)).values_list('batch_id', 'qty')),
+                         [(self.first.pk, 5), (self.second.pk, 6)])
+
+        self.move(self.first, 1, utc(4, 10))
+        with self.assertNumQueries(3):  # period, checkpoints, tail
+            self.assertEqual(self.as_of(utc(3, 10)), {self.first.pk: 5, self.second.pk: 6})
+        self.assertEqual(self.as_of(utc(1, 15)), {self.first.pk: 10, self.second.pk: 0})
+        self.assertEqual(self.as_of(utc(5, 1)), {self.first.pk: 6, self.second.pk: 6})
+
+    def test_movements_dated_in_a_closed_month_are_refused(self):
+        close_periods(self.now)
+        late = [InventoryMovement(batch=self.first, type='adjustment', delta_qty=1, created_at=utc(4, 2)),
+                InventoryMovement(batch=self.first, type='adjustment', delta_qty=1, created_at=utc(3, 30))]
+
+        with mock.patch.object(InventoryMovement._meta.get_field('created_at'), 'auto_now_add', False):
+            with self.assertRaises(ClosedPeriod) as caught:
+                record_movements(late)
+            self.assertEqual(caught.exception.closed_until, utc(4, 1))
+            self.assertEqual(InventoryMovement.objects.count(), 5)
+
+            self.assertEqual(record_movements([InventoryMovement(batch=self.first, type='adjustment', delta_qty=1,
+                                                                 created_at=utc(4, 2))]), 1)
+        self.assertEqual(self.as_of(utc(3, 31)), {self.first.pk: 5, self.second.pk: 6})
+
+    @mock.patch('inventory.checkpoints.ARCHIVE_BLOCK_ROWS', 1)
+    def test_archived_months_stay_answerable(self):
+        close_periods(self.now)
+        with tempfile.TemporaryDirectory() as directory:
+            archived = archive_periods(retention_months=1, directory=directory, now=self.now)
+
+            self.assertEqual([str(period) for period in archived], ['2026-01', '2026-02'])
+            self.assertEqual(len(archived[0].archive_index), 2)  # one gzip member per batch here
+            with gzip.open(archived[0].archive_path, 'rt') as archive:
+                self.assertEqual([json.loads(line)['delta_qty'] for line in archive], [10, -3, 2])
+            self.assertEqual(InventoryMovement.objects.count(), 1)
+
+            self.assertEqual(self.as_of(utc(1, 15)), {self.first.pk: 10, self.second.pk: 0})
+            self.assertEqual(self.as_of(utc(1, 28)), {self.first.pk: 7, self.second.pk: 2})
+            self.assertEqual(self.as_of(utc(2, 10)), {self.first.pk: 7, self.second.pk: 6})
+            self.assertEqual(self.as_of(utc(3, 10)), {self.first.pk: 5, self.second.pk: 6})
+            self.assertEqual(reconcile_stock_levels(fix=False), [])
+            self.assertEqual(archive_periods(retention_months=1, directory=directory, now=self.now), [])
+
+    @mock.patch('inventory.checkpoints.ARCHIVE_BLOCK_ROWS', 2)
+    def test_batches_larger_than_a_block_stay_in_one_member(self):
+        third = self.make_batch(0, 500)
+        for delta in (2, 3, 4):
+            self.move(third, delta, utc(1, 26))
+        close_periods(self.now)
+        with tempfile.TemporaryDirectory() as directory:
+            january = archive_periods(retention_months=1, directory=directory, now=self.now)[0]
+
+            # The third batch starts inside the second member and runs past the block size without splitting
+            self.assertEqual([first for first, _ in january.archive_index], [self.first.pk, self.second.pk])
+            self.assertEqual(quantities_as_of([self.second.pk, third.pk], utc(1, 31)),
+                             {self.second.pk: 2, third.pk: 9})
+
+    def test_stock_as_of_endpoint(self):
+        close_periods(self.now)
+        self.client.force_login(User.objects.create_superuser('admin', password='x'))
+        url = reverse('inventory:stock-as-of')
+
+        response = self.client.get(url, {'branch': self.branch.pk, 'at': '2026-01-31'})
+
+        self.assertEqual([(row['batch_id'], row['qty']) for row in response.json()['batches']], [(self.first.pk, 7), (self.second.pk, 2)])
+        self.assertEqual(self.client.get(url, {'branch': self.branch.pk, 'at': 'soon'}).status_code, 400)
+
+
+class InventoryAdminQueryBudgetTests(QueryBudgetTestMixin, InventoryTestData):
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser('admin', password='x'))
+        for days in range(10):
+            batch = self.make_batch(5, days + 1)
+            record_movements([InventoryMovement(batch=batch, type='purchase', delta_qty=5, created_by=self.user)])
+        scan_expiry_risk()
+
+    def test_changelists_stay_within_budget(self):
+        for model in ('inventorybatch', 'inventorymovement', 'stocklevel', 'expiryrisk', 'branch', 'movementperiod',
+                      'movementcheckpoint'):
+            with self.subTest(model=model), self.assertQueryBudget(10):
+                response = self.client.get(reverse(f'admin:inventory_{model}_changelist'))
+                self.assertEqual(response.status_code, 200)
+
+    def test_movements_are_read_only(self):
+        movement = InventoryMovement.objects.first()
+        self.assertEqual(self.client.get(reverse('admin:inventory_inventorymovement_add')).status_code, 403)
+        self.assertEqual(self.client.post(reverse('admin:inventory_inventorymovement_delete', args=[movement.pk]),
+                                          {'post': 'yes'}).status_code, 403)
+        self.client.post(reverse('admin:inventory_inventorymovement_change', args=[movement.pk]), {'delta_qty': 50})
+        movement.refresh_from_db()
+        self.assertEqual(movement.delta_qty, 5)
@@ -0,0 +1,12 @@
+from django.urls import path
+
+from . import views
+
+app_name = 'inventory'
+
+urlpatterns = [
+    path('valuation/', views.ValuationExportView.as_view(), name='valuation-export'),
+    path('availability/', views.BranchAvailabilityView.as_view(), name='branch-availability'),
+    path('stock-as-of/', views.StockAsOfView.as_view(), name='stock-as-of'),
+    path('pos/sales/', views.PosSaleView.as_view(), name='pos-sale'),
+]
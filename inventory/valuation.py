@@ -0,0 +1,141 @@
+import csv
+import io
+import json
+import zlib
+
+from asgiref.sync import sync_to_async
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Sum
+
+from pharma_store_v01.db_router import read_alias
+
+from .models import InventoryBatch
+
+# Rows fetched per round trip from the server-side cursor (PostgreSQL) / rows per output chunk
+FETCH_SIZE = 2000
+ROWS_PER_CHUNK = 1000
+FORMATS = ('csv', 'ndjson')
+
+_MONEY = DecimalField(max_digits=16, decimal_places=2)
+COST_VALUE = ExpressionWrapper(F('qty_on_hand') * F('cost_price'), output_field=_MONEY)
+SALE_VALUE = ExpressionWrapper(F('qty_on_hand') * F('sale_price'), output_field=_MONEY)
+
+SUMMARY_COLUMNS = (
+    'company_id', 'company', 'branch_id', 'branch', 'supplier_id', 'supplier',
+    'batches', 'units', 'cost_value', 'sale_value',
+)
+DETAIL_COLUMNS = (
+    'company_id', 'branch_id', 'supplier_id', 'batch_id', 'variant_id', 'expiry_date', 'is_available',
+    'qty_on_hand', 'qty_reserved', 'cost_price', 'sale_price', 'cost_value', 'sale_value',
+)
+
+
+# ==========================
+# 1. ROWS (AGGREGATED IN THE DATABASE, STREAMED FROM A SERVER-SIDE CURSOR)
+# ==========================
+
+def _batches(company_id=None):
+    # Exports are reporting traffic: read from the replica when one is usable
+    batches = InventoryBatch.objects.using(read_alias())
+    if company_id is not None:
+        batches = batches.filter(branch__company_id=company_id)
+    return batches
+
+
+def valuation_summary(company_id=None):
+    """Stock value per (company, branch, supplier); the GROUP BY runs in the database."""
+    return (
+        _batches(company_id)
+        .values_list('branch__company_id', 'branch__company__name', 'branch_id', 'branch__name',
+                     'supplier_id', 'supplier__name')
+        .annotate(batches=Count('pk'), units=Sum('qty_on_hand'), cost_value=Sum(COST_VALUE),
+                  sale_value=Sum(SALE_VALUE))
+        .order_by('branch__company_id', 'branch_id', 'supplier_id')
+        .iterator(chunk_size=FETCH_SIZE)
+    )
+
+
+def valuation_detail(company_id=None):
+    """One row per batch (the stock export), values computed by the database."""
+    return (
+        _batches(company_id)
+        .annotate(cost_value=COST_VALUE, sale_value=SALE_VALUE)
+        .values_list('branch__company_id', 'branch_id', 'supplier_id', 'pk', 'variant_id', 'expiry_date',
+                     'is_available', 'qty_on_hand', 'qty_reserved', 'cost_price', 'sale_price',
+                     'cost_value', 'sale_value')
+        .order_by('branch__company_id', 'branch_id', 'pk')
+        .iterator(chunk_size=FETCH_SIZE)
+    )
+
+
+# ==========================
+# 2. ENCODERS (CHUNKED, CONSTANT MEMORY)
+# ==========================
+
+def _json_value(value):
+    return value if value is None or isinstance(value, (bool, int, str)) else str(value)
+
+
+def csv_chunks(rows, columns):
+    """Yields CSV text, a header then ROWS_PER_CHUNK rows per chunk."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for count, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if count % ROWS_PER_CHUNK == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def ndjson_chunks(rows, columns):
+    """Yields newline-delimited JSON objects, ROWS_PER_CHUNK per chunk."""
+    lines = []
+    for row in rows:
+        lines.append(json.dumps({name: _json_value(value) for name, value in zip(columns, row)}))
+        if len(lines) == ROWS_PER_CHUNK:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+def gzip_chunks(chunks):
+    """Gzip-compresses a stream of text chunks incrementally."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31: gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode())
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_valuation(fmt='csv', detail=False, company_id=None, compress=False):
+    """Generator of output chunks (str, or bytes when ``compress``) for the whole export."""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported format: {fmt}")
+    rows = valuation_detail(company_id) if detail else valuation_summary(company_id)
+    columns = DETAIL_COLUMNS if detail else SUMMARY_COLUMNS
+    chunks = csv_chunks(rows, columns) if fmt == 'csv' else ndjson_chunks(rows, columns)
+    return gzip_chunks(chunks) if compress else chunks
+
+
+# ==========================
+# 3. ASGI STREAMING
+#  Under ASGI, StreamingHttpResponse collects a sync iterator with sync_to_async(list) before
+#  sending anything. An async iterator is sent chunk by chunk instead.
+# ==========================
+
+async def stream_async(chunks):
+    """
+    Async iterator over a sync chunk generator. Each chunk is pulled on the shared sync thread,
+    so the server-side cursor stays on one connection; the generator is closed on disconnect.
+    """
+    chunks, done = iter(chunks), object()
+    pull = sync_to_async(next)
+    try:
+        while (chunk := await pull(chunks, done)) is not done:
+            yield chunk
+    finally:
+        await sync_to_async(chunks.close)()
@@ -1,3 +1,134 @@
-from django.shortcuts import render
+import datetime
 
-# Create your views here.
+from adrf.views import APIView as AsyncAPIView
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .availability import MAX_BRANCHES, MAX_VARIANTS, branch_availability
+from .checkpoints import branch_stock_as_of
+from .exceptions import InsufficientStock, UnknownBarcode
+from .models import Branch
+from .pos import sell_basket
+from .serializers import PosSaleSerializer
+from .valuation import FORMATS, export_valuation, stream_async
+
+CONTENT_TYPES = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+
+
+def _id_list(value):
+    """'1,2,3' -> [1, 2, 3] (duplicates dropped, order kept); ValueError on anything else."""
+    return list(dict.fromkeys(int(part) for part in value.split(',') if part.strip()))
+
+
+class ValuationExportView(APIView):
+    """
+    GET ?output=csv|ndjson&detail=1&gzip=1&company=<id>: stock valuation streamed straight from
+    a server-side cursor (``output`` rather than ``format``, which DRF reserves for renderers).
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        params = request.query_params
+        fmt = params.get('output', 'csv')
+        if fmt not in FORMATS:
+            return Response({'detail': f"output must be one of {', '.join(FORMATS)}."}, status=400)
+        try:
+            company_id = int(params['company']) if params.get('company') else None
+        except ValueError:
+            return Response({'detail': 'company must be an id.'}, status=400)
+        detail, compress = params.get('detail') == '1', params.get('gzip') == '1'
+
+        chunks = export_valuation(fmt, detail=detail, company_id=company_id, compress=compress)
+        if isinstance(request._request, ASGIRequest):
+            # A sync iterator would be read whole into memory before the first byte under ASGI
+            chunks = stream_async(chunks)
+        response = StreamingHttpResponse(chunks, content_type=CONTENT_TYPES[fmt])
+        name = f"{'stock' if detail else 'valuation'}-{timezone.localdate():%Y-%m-%d}.{fmt}"
+        if compress:
+            response['Content-Encoding'] = 'gzip'
+        response['Content-Disposition'] = f'attachment; filename="{name}"'
+        return response
+
+
+def _moment(value):
+    """ISO datetime (naive = local time), or a date meaning the end of that local day; None if invalid."""
+    try:
+        moment = parse_datetime(value)
+        if moment is None and (day := parse_date(value)) is not None:
+            moment = datetime.datetime.combine(day + datetime.timedelta(days=1), datetime.time.min)
+    except ValueError:
+        return None
+    if moment is not None and timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+class StockAsOfView(APIView):
+    """GET ?branch=<id>&at=<date or datetime>: quantity of every batch of a branch at a past moment (audits)."""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        try:
+            branch_id = int(request.query_params.get('branch', ''))
+        except ValueError:
+            return Response({'detail': 'branch must be an id.'}, status=400)
+        when = _moment(request.query_params.get('at', ''))
+        if when is None:
+            return Response({'detail': 'at must be an ISO date or datetime.'}, status=400)
+        return Response({'branch': branch_id, 'at': when, 'batches': branch_stock_as_of(branch_id, when)})
+
+
+class BranchAvailabilityView(AsyncAPIView):
+    """GET ?variants=1,2&branches=3,4: free units and best price per branch, async under ASGI."""
+
+    async def get(self, request):
+        try:
+            variant_ids = _id_list(request.query_params.get('variants', ''))
+            branch_ids = _id_list(request.query_params.get('branches', ''))
+        except ValueError:
+            return Response({'detail': 'variants and branches must be comma-separated ids.'}, status=400)
+        if not (0 < len(variant_ids) <= MAX_VARIANTS and 0 < len(branch_ids) <= MAX_BRANCHES):
+            return Response({'detail': f'Give 1-{MAX_VARIANTS} variants and 1-{MAX_BRANCHES} branches.'},
+                            status=400)
+        return Response(await branch_availability(variant_ids, branch_ids))
+
+
+class PosSaleView(APIView):
+    """
+    POST {"branch": id, "lines": [{"barcode": "...", "quantity": n}]}: counter sale of the whole basket
+    by the branch's owner (or staff); returns the receipt lines split by batch.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        serializer = PosSaleSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        branch_id = serializer.validated_data['branch']
+        branches = Branch.objects.filter(pk=branch_id)
+        if not request.user.is_staff:
+            branches = branches.filter(company__owner=request.user)
+        if not branches.exists():
+            return Response({'detail': 'Unknown branch.'}, status=404)
+
+        basket = [(line['barcode'], line['quantity']) for line in serializer.validated_data['lines']]
+        try:
+            sale = sell_basket(branch_id, basket, user=request.user)
+        except UnknownBarcode as exc:
+            return Response({'detail': str(exc), 'barcodes': exc.gtins}, status=400)
+        except InsufficientStock as exc:
+            return Response({'detail': str(exc), 'variant': exc.variant_id, 'available': exc.available}, status=409)
+        return Response({
+            'branch': sale.branch_id,
+            'lines': [
+                {'barcode': line.gtin, 'variant_id': line.variant_id, 'batch_id': line.batch_id,
+                 'expiry_date': line.expiry_date, 'quantity': line.quantity,
+                 'unit_price': str(line.unit_price), 'amount': str(line.amount)}
+                for line in sale.lines
+            ],
+            'total': str(sale.total),
+        }, status=201)
@@ -1,3 +1,117 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 
-# Register your models here.
+from .models import Cart, CartItem, Order, OrderItem, Review, Shipment
+from .transitions import transition_orders
+
+# ProductVariant.__str__ reads product and dosage_form; Branch.__str__ reads company
+VARIANT = ('variant__product',)  # ProductVariant.__str__ reads the dosage form from the lookup cache
+
+
+# ========================
+# 1. SHOPPING CART
+# ========================
+
+class ReadOnlyLinesInline(admin.TabularInline):
+    """
+    Lines are shown read-only: editable FK widgets fetch their selected object one query per row,
+    while read-only cells render from the select_related rows below.
+    """
+    extra = 0
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+class CartItemInline(ReadOnlyLinesInline):
+    model = CartItem
+    fields = ('variant', 'quantity', 'unit_price_snapshot')
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related(*VARIANT)
+
+
+@admin.register(Cart)
+class CartAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'created_at', 'updated_at')
+    inlines = (CartItemInline,)
+
+
+# ========================
+# 2. ORDERS
+# ========================
+
+class OrderItemInline(ReadOnlyLinesInline):
+    model = OrderItem
+    fields = ('variant', 'batch', 'quantity', 'unit_price')
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related(*VARIANT, 'batch')
+
+
+@admin.register(Order)
+class OrderAdmin(admin.ModelAdmin):
+    list_display = ('id', 'customer', 'branch', 'status', 'payment_status', 'total', 'placed_at')
+    list_select_related = ('customer', 'branch__company')
+    list_filter = ('status', 'payment_status')
+    raw_id_fields = ('customer', 'branch', 'shipping_address')
+    inlines = (OrderItemInline,)
+    actions = ('mark_confirmed', 'mark_packed', 'mark_shipped', 'mark_delivered', 'mark_cancelled')
+
+    def _transition(self, request, queryset, target):
+        result = transition_orders(list(queryset.values_list('pk', flat=True)), target, user=request.user)
+        self.message_user(request, f"{len(result.updated)} order(s) marked {target}.")
+        if result.rejected:
+            self.message_user(request, f"{len(result.rejected)} order(s) skipped: "
+                              f"{', '.join(sorted(set(result.rejected.values())))}.", messages.WARNING)
+
+    @admin.action(description="Mark selected orders as confirmed")
+    def mark_confirmed(self, request, queryset):
+        self._transition(request, queryset, 'confirmed')
+
+    @admin.action(description="Mark selected orders as packed")
+    def mark_packed(self, request, queryset):
+        self._transition(request, queryset, 'packed')
+
+    @admin.action(description="Mark selected orders as shipped")
+    def mark_shipped(self, request, queryset):
+        self._transition(request, queryset, 'shipped')
+
+    @admin.action(description="Mark selected orders as delivered")
+    def mark_delivered(self, request, queryset):
+        self._transition(request, queryset, 'delivered')
+
+    @admin.action(description="Mark selected orders as cancelled")
+    def mark_cancelled(self, request, queryset):
+        self._transition(request, queryset, 'cancelled')
+
+
+@admin.register(OrderItem)
+class OrderItemAdmin(admin.ModelAdmin):
+    list_display = ('order', 'variant', 'batch', 'quantity', 'unit_price')
+    list_select_related = ('order', *VARIANT, 'batch')
+    raw_id_fields = ('order', 'variant', 'batch')
+
+
+# ========================
+# 3. LOGISTICS & FEEDBACK
+# ========================
+
+@admin.register(Shipment)
+class ShipmentAdmin(admin.ModelAdmin):
+    list_display = ('order', 'tracking_number', 'status', 'delivered_at')
+    list_select_related = ('order',)
+    list_filter = ('status',)
+    search_fields = ('tracking_number',)
+    raw_id_fields = ('order',)
+
+
+@admin.register(Review)
+class ReviewAdmin(admin.ModelAdmin):
+    list_display = ('variant', 'rating', 'created_at')
+    list_select_related = VARIANT
+    list_filter = ('rating',)
+    raw_id_fields = ('variant',)
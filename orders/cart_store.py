@@ -0,0 +1,280 @@
+from decimal import Decimal
+from typing import NamedTuple
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Cart, CartItem
+
+
+class CartLine(NamedTuple):
+    variant_id: int
+    quantity: int
+    unit_price: Decimal
+
+
+# ==========================
+# 1. DATABASE STORE (NO REDIS CONFIGURED)
+# ==========================
+
+class DatabaseCartStore:
+    """Writes every cart change straight to Cart/CartItem; used when no cart Redis is configured."""
+
+    def create_cart(self):
+        return Cart.objects.create().pk
+
+    def add_item(self, cart_id, variant_id, quantity, unit_price):
+        with transaction.atomic():
+            updated = CartItem.objects.filter(cart_id=cart_id, variant_id=variant_id).update(
+                quantity=F('quantity') + quantity,
+            )
+            if not updated:
+                try:
+                    with transaction.atomic():
+                        CartItem.objects.create(cart_id=cart_id, variant_id=variant_id, quantity=quantity,
+                                                unit_price_snapshot=unit_price)
+                except IntegrityError:
+                    # Lost a race with a concurrent add of the same variant: fall back to incrementing
+                    CartItem.objects.filter(cart_id=cart_id, variant_id=variant_id).update(
+                        quantity=F('quantity') + quantity,
+                    )
+            self._touch(cart_id)
+
+    def set_quantity(self, cart_id, variant_id, quantity):
+        if quantity <= 0:
+            return self.remove_item(cart_id, variant_id)
+        CartItem.objects.filter(cart_id=cart_id, variant_id=variant_id).update(quantity=quantity)
+        self._touch(cart_id)
+
+    def remove_item(self, cart_id, variant_id):
+        CartItem.objects.filter(cart_id=cart_id, variant_id=variant_id).delete()
+        self._touch(cart_id)
+
+    def clear(self, cart_id):
+        CartItem.objects.filter(cart_id=cart_id).delete()
+        self._touch(cart_id)
+
+    def get_items(self, cart_id):
+        return [
+            CartLine(*row) for row in
+            CartItem.objects.filter(cart_id=cart_id).order_by('pk')
+            .values_list('variant_id', 'quantity', 'unit_price_snapshot')
+        ]
+
+    def flush(self, cart_ids=None, batch_size=None):
+        """Nothing is buffered; kept so callers (checkout) can flush unconditionally."""
+        return 0
+
+    def flush_pending(self, batch_size=None, max_carts=None):
+        return 0
+
+    def _touch(self, cart_id):
+        Cart.objects.filter(pk=cart_id).update(updated_at=timezone.now())
+
+
+# ==========================
+# 2. REDIS STORE WITH WRITE-BEHIND
+#  One hash per cart:  cart:<id>  { "_": "1", "q:<variant>": qty, "p:<variant>": unit price }
+#  The "_" field marks a hash loaded from (or created after) the database rows.
+#  Changed carts are queued in the "cart:dirty" set and persisted in batches by flush().
+#  Changes run as Lua scripts that refuse a hash without the "_" field: a hash that expired between
+#  loading and changing it is reloaded first instead of being re-created from the change alone
+#  (flush() would then delete every persisted line the change did not mention).
+# ==========================
+
+DIRTY_KEY = 'cart:dirty'
+LOADED_FIELD = '_'
+
+# KEYS: cart hash; ARGV: ttl, then the field/value pairs of the persisted lines
+LOAD_SCRIPT = """
+if redis.call('HEXISTS', KEYS[1], '_') == 0 then
+  redis.call('DEL', KEYS[1])
+  redis.call('HSET', KEYS[1], unpack(ARGV, 2))
+end
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+return 1
+"""
+
+# KEYS: cart hash, dirty set; ARGV: ttl, cart id, operation, variant id, quantity, unit price.
+# Returns 0 (nothing changed) when the hash is not loaded.
+CHANGE_SCRIPT = """
+if redis.call('HEXISTS', KEYS[1], '_') == 0 then
+  return 0
+end
+local quantity, price = 'q:' .. ARGV[4], 'p:' .. ARGV[4]
+if ARGV[3] == 'add' then
+  redis.call('HINCRBY', KEYS[1], quantity, ARGV[5])
+  redis.call('HSETNX', KEYS[1], price, ARGV[6])
+elseif ARGV[3] == 'set' then
+  if redis.call('HEXISTS', KEYS[1], price) == 0 then
+    return 1
+  end
+  redis.call('HSET', KEYS[1], quantity, ARGV[5])
+else
+  redis.call('HDEL', KEYS[1], quantity, price)
+end
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+redis.call('SADD', KEYS[2], ARGV[2])
+return 1
+"""
+
+
+class RedisCartStore:
+    """
+    Keeps active carts in Redis and persists them to Cart/CartItem in batches (or on demand at
+    checkout), so quantity tweaks on mostly-abandoned carts never hit the primary database.
+    One hash field per variant gives the same (cart, variant) uniqueness as CartItem.
+    """
+
+    def __init__(self, client, ttl=None):
+        self.client = client
+        self.ttl = settings.CART_TTL if ttl is None else ttl
+        self._load_script = client.register_script(LOAD_SCRIPT)
+        self._change_script = client.register_script(CHANGE_SCRIPT)
+
+    @staticmethod
+    def key(cart_id):
+        return f'cart:{cart_id}'
+
+    def create_cart(self):
+        cart_id = Cart.objects.create().pk
+        self.client.hset(self.key(cart_id), LOADED_FIELD, '1')
+        self.client.expire(self.key(cart_id), self.ttl)
+        return cart_id
+
+    def _load(self, cart_id):
+        """Brings the persisted lines into Redis unless the hash is already loaded (a concurrent load wins)."""
+        args = [self.ttl, LOADED_FIELD, '1']
+        for line in DatabaseCartStore().get_items(cart_id):
+            args += [f'q:{line.variant_id}', line.quantity, f'p:{line.variant_id}', str(line.unit_price)]
+        self._load_script(keys=[self.key(cart_id)], args=args)
+
+    def _change(self, cart_id, operation, variant_id, quantity=0, unit_price=''):
+        """Applies one change to a loaded hash and queues the cart; (re)loads the hash when it is missing."""
+        keys = [self.key(cart_id), DIRTY_KEY]
+        args = [self.ttl, cart_id, operation, variant_id, quantity, str(unit_price)]
+        while not self._change_script(keys=keys, args=args):
+            self._load(cart_id)
+
+    def add_item(self, cart_id, variant_id, quantity, unit_price):
+        self._change(cart_id, 'add', variant_id, quantity, unit_price)
+
+    def set_quantity(self, cart_id, variant_id, quantity):
+        if quantity <= 0:
+            return self.remove_item(cart_id, variant_id)
+        self._change(cart_id, 'set', variant_id, quantity)
+
+    def remove_item(self, cart_id, variant_id):
+        self._change(cart_id, 'remove', variant_id)
+
+    def clear(self, cart_id):
+        pipe = self.client.pipeline()
+        pipe.delete(self.key(cart_id))
+        pipe.hset(self.key(cart_id), LOADED_FIELD, '1')
+        pipe.expire(self.key(cart_id), self.ttl)
+        pipe.sadd(DIRTY_KEY, cart_id)
+        pipe.execute()
+
+    @staticmethod
+    def _parse(raw):
+        lines = []
+        for field, value in raw.items():
+            field = field.decode() if isinstance(field, bytes) else field
+            if field.startswith('q:'):
+                variant_id = int(field[2:])
+                price = raw.get(f'p:{variant_id}'.encode()) or raw.get(f'p:{variant_id}')
+                price = price.decode() if isinstance(price, bytes) else price
+                if int(value) > 0 and price is not None:
+                    lines.append(CartLine(variant_id, int(value), Decimal(price)))
+        return sorted(lines)
+
+    def get_items(self, cart_id):
+        raw = self.client.hgetall(self.key(cart_id))
+        while LOADED_FIELD.encode() not in raw and LOADED_FIELD not in raw:
+            self._load(cart_id)
+            raw = self.client.hgetall(self.key(cart_id))
+        return self._parse(raw)
+
+    def flush(self, cart_ids=None, batch_size=500):
+        """
+        Persists dirty carts: explicit ``cart_ids`` (e.g. at checkout) or up to ``batch_size``
+        queued ones. One DELETE for removed lines, one upsert for the rest and one UPDATE of
+        Cart.updated_at per batch. Returns the number of carts written.
+        """
+        if cart_ids is None:
+            cart_ids = [int(cart_id) for cart_id in self.client.spop(DIRTY_KEY, batch_size) or []]
+        else:
+            cart_ids = [int(cart_id) for cart_id in cart_ids]
+            if cart_ids:
+                self.client.srem(DIRTY_KEY, *cart_ids)
+        if not cart_ids:
+            return 0
+
+        try:
+            pipe = self.client.pipeline()
+            for cart_id in cart_ids:
+                pipe.hgetall(self.key(cart_id))
+            # Carts whose hash expired before being flushed keep their last persisted state
+            carts = {cart_id: self._parse(raw) for cart_id, raw in zip(cart_ids, pipe.execute()) if raw}
+            if carts:
+                self._persist(carts)
+        except Exception:
+            self.client.sadd(DIRTY_KEY, *cart_ids)
+            raise
+        return len(carts)
+
+    def flush_pending(self, batch_size=500, max_carts=None):
+        """
+        Flushes queued carts batch by batch until the dirty set is empty or ``max_carts`` carts were
+        taken from it (settings.CART_FLUSH_MAX_CARTS), so a run ends even while shoppers keep the set
+        filling; the rest waits for the next run. Returns the number of carts written. A batch of
+        expired carts writes nothing, so the loop checks the set, not the count.
+        """
+        max_carts = settings.CART_FLUSH_MAX_CARTS if max_carts is None else max_carts
+        total = taken = 0
+        while taken < max_carts and self.client.scard(DIRTY_KEY):
+            size = min(batch_size, max_carts - taken)
+            total += self.flush(batch_size=size)
+            taken += size
+        return total
+
+    @staticmethod
+    def _persist(carts):
+        stale = Q()
+        for cart_id, lines in carts.items():
+            stale |= Q(cart_id=cart_id) & ~Q(variant_id__in=[line.variant_id for line in lines])
+        items = [
+            CartItem(cart_id=cart_id, variant_id=line.variant_id, quantity=line.quantity,
+                     unit_price_snapshot=line.unit_price)
+            for cart_id, lines in carts.items() for line in lines
+        ]
+        with transaction.atomic():
+            CartItem.objects.filter(stale).delete()
+            if items:
+                CartItem.objects.bulk_create(
+                    items, update_conflicts=True, unique_fields=['cart', 'variant'],
+                    update_fields=['quantity', 'unit_price_snapshot'],
+                )
+            Cart.objects.filter(pk__in=list(carts)).update(updated_at=timezone.now())
+
+
+# ==========================
+# 3. FACTORY
+# ==========================
+
+_store = None
+
+
+def get_cart_store():
+    """Redis store when settings.CART_REDIS_URL is set, database store otherwise (one per process)."""
+    global _store
+    if _store is None:
+        if settings.CART_REDIS_URL:
+            import redis
+
+            _store = RedisCartStore(redis.Redis.from_url(settings.CART_REDIS_URL))
+        else:
+            _store = DatabaseCartStore()
+    return _store
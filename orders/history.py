@@ -0,0 +1,89 @@
+import base64
+import binascii
+import datetime
+from dataclasses import dataclass
+
+from django.db.models import Count, IntegerField, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from .models import Order, OrderItem
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+# Orders still waiting on the branch (the fulfilment queue)
+OPEN_STATUSES = ('pending', 'confirmed', 'packed')
+# The columns of a history row; both history indexes hold all of them, so pages are read index-only
+SUMMARY_FIELDS = ('id', 'customer', 'branch', 'status', 'payment_status', 'total', 'shipping_fee', 'placed_at')
+
+
+# ==========================
+# 1. CURSORS
+#  A cursor is the (placed_at, id) of the last row of the previous page, so the next page is an
+#  index range scan starting right after it instead of an OFFSET that re-reads every skipped row.
+# ==========================
+
+class InvalidCursor(ValueError):
+    """The cursor query parameter could not be decoded."""
+
+
+def encode_cursor(order):
+    raw = f"{order.placed_at.isoformat()}|{order.pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        placed_at, _, pk = base64.urlsafe_b64decode(cursor.encode()).decode().partition('|')
+        return datetime.datetime.fromisoformat(placed_at), int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise InvalidCursor(f"Invalid cursor {cursor!r}")
+
+
+@dataclass
+class Page:
+    orders: list
+    next_cursor: str = None
+
+
+def keyset_page(orders, cursor=None, size=DEFAULT_PAGE_SIZE):
+    """
+    One page of ``orders`` newest first, ordered by (placed_at, id) to match the composite indexes.
+    Fetches one extra row to know whether a next page exists; no COUNT query is ever issued.
+    """
+    size = max(1, min(size, MAX_PAGE_SIZE))
+    if cursor:
+        placed_at, pk = decode_cursor(cursor)
+        orders = orders.filter(Q(placed_at__lt=placed_at) | Q(placed_at=placed_at, pk__lt=pk))
+    rows = list(orders.order_by('-placed_at', '-pk')[:size + 1])
+    has_next = len(rows) > size
+    rows = rows[:size]
+    return Page(rows, encode_cursor(rows[-1]) if has_next else None)
+
+
+# ==========================
+# 2. HISTORY AND QUEUES
+# ==========================
+
+def _line_total(aggregate):
+    lines = OrderItem.objects.filter(order=OuterRef('pk')).order_by().values('order')
+    return Coalesce(Subquery(lines.annotate(total=aggregate).values('total'), output_field=IntegerField()), 0)
+
+
+def _with_line_totals(orders):
+    """
+    Item count and units per order as correlated subqueries in the page query: they are evaluated
+    for the rows the LIMIT keeps, where a JOIN + GROUP BY would aggregate the whole history first.
+    """
+    return orders.only(*SUMMARY_FIELDS).annotate(item_count=_line_total(Count('pk')),
+                                                 units=_line_total(Sum('quantity')))
+
+
+def customer_order_history(customer_id, cursor=None, size=DEFAULT_PAGE_SIZE):
+    """A customer's orders, newest first (served by orders_customer_placed_idx)."""
+    return keyset_page(_with_line_totals(Order.objects.filter(customer_id=customer_id)), cursor, size)
+
+
+def branch_fulfilment_queue(branch_id, statuses=OPEN_STATUSES, cursor=None, size=DEFAULT_PAGE_SIZE):
+    """A branch's orders in the given statuses, newest first (served by orders_branch_queue_idx)."""
+    orders = Order.objects.filter(branch_id=branch_id, status__in=statuses)
+    return keyset_page(_with_line_totals(orders), cursor, size)
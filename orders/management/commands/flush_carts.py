@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from orders.cart_store import get_cart_store
+
+
+class Command(BaseCommand):
+    help = "Persists carts changed in the cart store (Redis) to Cart/CartItem, in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help="Carts written per transaction.")
+
+    def handle(self, *args, **options):
+        total = get_cart_store().flush_pending(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Flushed {total} cart(s)."))
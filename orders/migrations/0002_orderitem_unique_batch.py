@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:23
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0001_initial'),
+        ('inventory', '0002_inventorybatch_variant_fefo_index'),
+        ('orders', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='orderitem',
+            unique_together={('order', 'variant', 'batch')},
+        ),
+    ]
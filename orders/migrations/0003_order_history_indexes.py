@@ -0,0 +1,25 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:39
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0005_stocklevel'),
+        ('orders', '0002_orderitem_unique_batch'),
+        ('users', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['customer', '-placed_at', '-id'], include=('status', 'total'), name='orders_customer_placed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['branch', 'status', '-placed_at', '-id'], include=('total',), name='orders_branch_queue_idx'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0002_search_indexes'),
+        ('orders', '0003_order_history_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='review',
+            name='variant',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='reviews', to='catalog.productvariant', verbose_name='Product Variant'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.6 on 2026-10-18 13:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0004_review_variant'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='orderitem',
+            constraint=models.UniqueConstraint(condition=models.Q(('batch__isnull', True)), fields=('order', 'variant'), name='orders_item_unallocated_uniq'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.6 on 2026-10-18 13:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0005_orderitem_unallocated_unique'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='order',
+            name='orders_customer_placed_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='order',
+            name='orders_branch_queue_idx',
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['customer', '-placed_at', '-id'], include=('status', 'total', 'branch', 'payment_status', 'shipping_fee'), name='orders_customer_placed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['branch', 'status', '-placed_at', '-id'], include=('total', 'customer', 'payment_status', 'shipping_fee'), name='orders_branch_queue_idx'),
+        ),
+    ]
@@ -86,6 +86,16 @@ class Order(models.Model):
         verbose_name = _("Order")
         verbose_name_plural = _("Orders")
         ordering = ['-placed_at']
+        # Keyset pagination (orders.history) walks these newest first; INCLUDE makes them covering on PostgreSQL
+        indexes = [
+            # INCLUDE: the rest of orders.history.SUMMARY_FIELDS, so history pages are index-only scans
+            models.Index(fields=['customer', '-placed_at', '-id'],
+                         include=['status', 'total', 'branch', 'payment_status', 'shipping_fee'],
+                         name='orders_customer_placed_idx'),
+            models.Index(fields=['branch', 'status', '-placed_at', '-id'],
+                         include=['total', 'customer', 'payment_status', 'shipping_fee'],
+                         name='orders_branch_queue_idx'),
+        ]
 
 
 class OrderItem(models.Model):
@@ -106,8 +116,13 @@ class OrderItem(models.Model):
     class Meta:
         verbose_name = _("Order Item")
         verbose_name_plural = _("Order Items")
-        # This constraint now correctly references the 'variant' field above
-        unique_together = ('order', 'variant')
+        # A line may be split across batches by FEFO allocation, so the batch is part of the key
+        unique_together = ('order', 'variant', 'batch')
+        constraints = [
+            # NULLs never collide in the key above, so unallocated lines need their own constraint
+            models.UniqueConstraint(fields=['order', 'variant'], condition=models.Q(batch__isnull=True),
+                                    name='orders_item_unallocated_uniq'),
+        ]
 
 
 # ===========
@@ -139,7 +154,9 @@ class Shipment(models.Model):
 class Review(models.Model):
     """Customer feedback on a product or service."""
     # customer = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name=_("Customer"))
-    # variant = models.ForeignKey('catalog.ProductVariant', on_delete=models.CASCADE, verbose_name=_("Product Variant"))
+    # Nullable: reviews written before variants were linked stay as general feedback
+    variant = models.ForeignKey('catalog.ProductVariant', on_delete=models.CASCADE, null=True, blank=True,
+                                related_name='reviews', verbose_name=_("Product Variant"))
 
     rating = models.IntegerField(choices=[(i, str(i)) for i in range(1, 6)], verbose_name=_("Rating (1-5)"))
     comment = models.TextField(verbose_name=_("Comment"))
@@ -0,0 +1,142 @@
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F
+
+from inventory.allocation import sellable_batches
+from inventory.availability import invalidate_availability
+from inventory.exceptions import InsufficientStock, NoFulfillingBranch
+from inventory.ledger import record_movements
+from inventory.models import InventoryBatch, InventoryMovement
+from inventory.reservation import release_reference
+from inventory.routing import route_address
+from users.models import Address
+
+from .cart_store import get_cart_store
+from .models import Order, OrderItem
+
+
+# ==========================
+# ORDER PLACEMENT (CART -> ORDER IN ONE TRANSACTION)
+# ==========================
+
+@dataclass
+class PlacementResult:
+    order: Order
+    items: list
+    # {phase: milliseconds}; phases in execution order, plus 'total'
+    timings: dict = field(default_factory=dict)
+
+
+@contextmanager
+def _phase(timings, name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = round((time.perf_counter() - started) * 1000, 3)
+
+
+def _plan_lines(lines, batches):
+    """Splits cart lines over the locked batches FEFO; raises InsufficientStock on the first short line."""
+    pools = defaultdict(list)
+    for batch in batches:
+        batch.free_qty = batch.qty_on_hand - batch.qty_reserved
+        pools[batch.variant_id].append(batch)
+
+    plan = []
+    for line in lines:
+        pool = pools.get(line.variant_id, [])
+        available = sum(batch.free_qty for batch in pool)
+        if available < line.quantity:
+            raise InsufficientStock(line.variant_id, line.quantity, available)
+        remaining = line.quantity
+        for batch in pool:
+            take = min(batch.free_qty, remaining)
+            if take:
+                batch.free_qty -= take
+                remaining -= take
+                plan.append((batch, take))
+            if remaining == 0:
+                break
+    return plan
+
+
+def _route(lines, shipping_address_id):
+    """Nearest branch that can ship every line to the address (see inventory.routing)."""
+    address = Address.objects.only('geo_lat', 'geo_lng').get(pk=shipping_address_id)
+    quantities = defaultdict(int)
+    for line in lines:
+        quantities[line.variant_id] += line.quantity
+    routed = route_address(address, quantities)
+    if not routed:
+        raise NoFulfillingBranch(shipping_address_id)
+    return routed[0][0]
+
+
+def place_order(cart_id, customer, branch_id, shipping_address_id, shipping_fee=Decimal('0'), store=None):
+    """
+    Turns a cart into an Order with a number of queries that does not depend on the line count:
+    one SELECT ... FOR UPDATE over the candidate batches, one INSERT for the order, one multi-row
+    INSERT for the items, one UPDATE for the batch quantities and the bulk sale movements.
+
+    Lines are split across batches FEFO and priced from ``InventoryBatch.sale_price`` of the
+    locked rows, so the total matches what was sold. The stock is committed here, so the order
+    starts out 'confirmed' (see orders.transitions). Reservations held under ``cart:<id>`` are
+    released first and the cart is emptied once the transaction commits. Raises
+    InsufficientStock (rolling everything back) if any line cannot be covered.
+
+    With ``branch_id=None`` the order goes to the nearest branch able to ship the whole cart to
+    the shipping address (two more queries); NoFulfillingBranch when there is none.
+    """
+    store = store or get_cart_store()
+    timings = {}
+    started = time.perf_counter()
+
+    with transaction.atomic():
+        with _phase(timings, 'cart'):
+            release_reference(f'cart:{cart_id}')
+            lines = [line for line in store.get_items(cart_id) if line.quantity > 0]
+            if not lines:
+                raise ValueError("Cannot place an order from an empty cart")
+
+        if branch_id is None:
+            with _phase(timings, 'route'):
+                branch_id = _route(lines, shipping_address_id)
+
+        with _phase(timings, 'lock'):
+            batches = list(sellable_batches([branch_id], [line.variant_id for line in lines]).select_for_update())
+            plan = _plan_lines(lines, batches)
+
+        with _phase(timings, 'write'):
+            subtotal = sum(batch.sale_price * qty for batch, qty in plan)
+            order = Order.objects.create(customer=customer, branch_id=branch_id,
+                                         shipping_address_id=shipping_address_id,
+                                         total=subtotal + shipping_fee, shipping_fee=shipping_fee,
+                                         status='confirmed')
+            items = OrderItem.objects.bulk_create([
+                OrderItem(order=order, variant_id=batch.variant_id, batch=batch, quantity=qty,
+                          unit_price=batch.sale_price)
+                for batch, qty in plan
+            ])
+            sold = []
+            for batch, qty in plan:
+                batch.qty_on_hand = F('qty_on_hand') - qty
+                sold.append(batch)
+            InventoryBatch.objects.bulk_update(sold, ['qty_on_hand'])
+            invalidate_availability([branch_id])
+
+        with _phase(timings, 'ledger'):
+            record_movements(
+                InventoryMovement(batch=batch, type='sale', delta_qty=-qty, created_by=customer)
+                for batch, qty in plan
+            )
+
+        transaction.on_commit(lambda: store.clear(cart_id))
+
+    timings['total'] = round((time.perf_counter() - started) * 1000, 3)
+    return PlacementResult(order, items, timings)
@@ -0,0 +1,27 @@
+from rest_framework import serializers
+
+from .models import Order
+
+
+class OrderSummarySerializer(serializers.ModelSerializer):
+    """Order list row; ``item_count`` and ``units`` are annotated by the history queries."""
+    item_count = serializers.IntegerField(read_only=True)
+    units = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Order
+        fields = ['id', 'customer', 'branch', 'status', 'payment_status', 'total', 'shipping_fee', 'placed_at',
+                  'item_count', 'units']
+        read_only_fields = fields
+
+
+class OrderTransitionSerializer(serializers.Serializer):
+    """Input of the bulk transition endpoint."""
+    orders = serializers.ListField(child=serializers.IntegerField(), allow_empty=False, max_length=10000)
+    status = serializers.ChoiceField(choices=Order.STATUS_CHOICES)
+
+
+class CheckoutSerializer(serializers.Serializer):
+    """Input of the checkout endpoint; the fulfilling branch is chosen from the address."""
+    cart = serializers.IntegerField()
+    shipping_address = serializers.IntegerField()
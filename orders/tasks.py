@@ -0,0 +1,9 @@
+from celery import shared_task
+
+from .cart_store import get_cart_store
+
+
+@shared_task
+def flush_carts_task(batch_size=500):
+    """Periodic (beat) write-behind of the carts changed in Redis; returns the number of carts written."""
+    return get_cart_store().flush_pending(batch_size=batch_size)
@@ -1,3 +1,440 @@
-from django.test import TestCase
+import datetime
+from decimal import Decimal
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from catalog.models import ProductVariant
+
+from inventory.allocation import allocate_orders
+from inventory.exceptions import InsufficientStock, NoFulfillingBranch
+from inventory.models import Branch, InventoryMovement, StockLevel
+from inventory.reservation import reserve_stock
+from inventory.routing import branch_locator
+from inventory.tests import InventoryTestData
+from pharma_store_v01.query_budget import QueryBudgetTestMixin
+from users.models import Address
+
+from .cart_store import DIRTY_KEY, CartLine, DatabaseCartStore, RedisCartStore
+from .models import Cart, CartItem, Order, OrderItem, Shipment
+from .history import customer_order_history, keyset_page
+from .placement import place_order
+from .serializers import OrderSummarySerializer
+from .transitions import transition_orders
+
+
+class OrdersAdminQueryBudgetTests(QueryBudgetTestMixin, InventoryTestData):
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser('admin', password='x'))
+        batch = self.make_batch(100, 30)
+        for _ in range(10):
+            OrderItem.objects.filter(order=self.make_order(2)).update(batch=batch)
+
+    def test_changelists_stay_within_budget(self):
+        for model in ('order', 'orderitem'):
+            with self.subTest(model=model), self.assertQueryBudget(10):
+                response = self.client.get(reverse(f'admin:orders_{model}_changelist'))
+                self.assertEqual(response.status_code, 200)
+
+    def test_order_change_form_inlines_do_not_query_per_line(self):
+        order = Order.objects.first()
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, variant=self.variant, batch=self.make_batch(1, 30), quantity=1,
+                      unit_price=Decimal('1'))
+            for _ in range(6)
+        ])
+        with self.assertQueryBudget(None):
+            self.client.get(reverse('admin:orders_order_change', args=[order.pk]))
+
+
+class CartStoreBehaviour:
+    """Cart store contract; subclasses provide ``self.store``."""
+
+    def setUp(self):
+        self.other = ProductVariant.objects.create(product=self.product, dosage_form=self.dosage_form,
+                                                   strength_text='500 mg', pack_size=40)
+        self.cart_id = self.store.create_cart()
+
+    def test_adding_the_same_variant_twice_merges_quantities(self):
+        self.store.add_item(self.cart_id, self.variant.pk, 2, Decimal('8.00'))
+        self.store.add_item(self.cart_id, self.variant.pk, 3, Decimal('9.00'))
+        self.store.add_item(self.cart_id, self.other.pk, 1, Decimal('15.00'))
+
+        self.assertEqual(self.store.get_items(self.cart_id), [
+            CartLine(self.variant.pk, 5, Decimal('8.00')),
+            CartLine(self.other.pk, 1, Decimal('15.00')),
+        ])
+
+    def test_set_quantity_and_remove(self):
+        self.store.add_item(self.cart_id, self.variant.pk, 2, Decimal('8.00'))
+        self.store.add_item(self.cart_id, self.other.pk, 1, Decimal('15.00'))
+        self.store.set_quantity(self.cart_id, self.variant.pk, 7)
+        self.store.set_quantity(self.cart_id, self.other.pk, 0)
+
+        self.assertEqual(self.store.get_items(self.cart_id), [CartLine(self.variant.pk, 7, Decimal('8.00'))])
+
+        self.store.clear(self.cart_id)
+        self.assertEqual(self.store.get_items(self.cart_id), [])
+
+    def test_flush_persists_cart_items(self):
+        self.store.add_item(self.cart_id, self.variant.pk, 2, Decimal('8.00'))
+        self.store.add_item(self.cart_id, self.other.pk, 1, Decimal('15.00'))
+        self.store.flush([self.cart_id])
+        self.store.remove_item(self.cart_id, self.other.pk)
+        self.store.flush([self.cart_id])
+
+        self.assertEqual(
+            list(CartItem.objects.filter(cart_id=self.cart_id).values_list('variant_id', 'quantity')),
+            [(self.variant.pk, 2)],
+        )
+
+
+class DatabaseCartStoreTests(CartStoreBehaviour, InventoryTestData):
+
+    def setUp(self):
+        self.store = DatabaseCartStore()
+        super().setUp()
+
+
+@skipUnless(settings.CART_REDIS_URL, "CART_REDIS_URL is not configured")
+class RedisCartStoreTests(CartStoreBehaviour, QueryBudgetTestMixin, InventoryTestData):
+
+    def setUp(self):
+        import redis
+
+        self.client = redis.Redis.from_url(settings.CART_REDIS_URL)
+        self.store = RedisCartStore(self.client, ttl=60)
+        super().setUp()
+        self.addCleanup(self.client.delete, self.store.key(self.cart_id))
+
+    def test_cart_changes_do_not_touch_the_database_until_flushed(self):
+        self.store.get_items(self.cart_id)
+        with self.assertQueryBudget(0):
+            for quantity in range(1, 6):
+                self.store.set_quantity(self.cart_id, self.variant.pk, quantity)
+                self.store.add_item(self.cart_id, self.other.pk, 1, Decimal('15.00'))
+        self.assertFalse(CartItem.objects.filter(cart_id=self.cart_id).exists())
+
+        self.assertEqual(self.store.flush(), 1)
+        self.assertEqual(CartItem.objects.get(cart_id=self.cart_id, variant=self.other).quantity, 5)
+
+    def test_flush_pending_continues_past_batches_of_expired_carts(self):
+        expired = self.store.create_cart()
+        self.store.add_item(expired, self.variant.pk, 1, Decimal('8.00'))
+        self.client.delete(self.store.key(expired))
+        self.store.add_item(self.cart_id, self.variant.pk, 2, Decimal('8.00'))
+
+        def spop_in_order(key, count):  # the expired cart comes out first, alone
+            popped = [cart_id for cart_id in (expired, self.cart_id) if self.client.sismember(key, cart_id)][:count]
+            self.client.srem(key, *popped)
+            return popped
+
+        with mock.patch.object(self.client, 'spop', side_effect=spop_in_order):
+            self.assertEqual(self.store.flush_pending(batch_size=1), 1)
+
+        self.assertEqual(self.client.scard(DIRTY_KEY), 0)
+        self.assertEqual(CartItem.objects.get(cart_id=self.cart_id).quantity, 2)
+
+    def test_flush_pending_stops_after_max_carts(self):
+        other = self.store.create_cart()
+        self.addCleanup(self.client.delete, self.store.key(other))
+        self.store.add_item(self.cart_id, self.variant.pk, 2, Decimal('8.00'))
+        self.store.add_item(other, self.variant.pk, 1, Decimal('8.00'))
+
+        self.assertEqual(self.store.flush_pending(batch_size=1, max_carts=1), 1)
+
+        self.assertEqual(self.client.scard(DIRTY_KEY), 1)
+        self.assertEqual(self.store.flush_pending(batch_size=1, max_carts=1), 1)
+
+    def test_hash_expiring_between_load_and_change_is_reloaded(self):
+        CartItem.objects.create(cart_id=self.cart_id, variant=self.other, quantity=3,
+                                unit_price_snapshot=Decimal('15.00'))
+        self.client.delete(self.store.key(self.cart_id))
+        load, expired = self.store._load, []
+
+        def load_then_expire(cart_id):
+            load(cart_id)
+            if not expired:
+                expired.append(self.client.delete(self.store.key(cart_id)))
+
+        with mock.patch.object(self.store, '_load', side_effect=load_then_expire):
+            self.store.add_item(self.cart_id, self.variant.pk, 1, Decimal('8.00'))
+        self.store.flush([self.cart_id])
+
+        self.assertEqual(
+            sorted(CartItem.objects.filter(cart_id=self.cart_id).values_list('variant_id', 'quantity')),
+            sorted([(self.variant.pk, 1), (self.other.pk, 3)]),
+        )
+
+    def test_persisted_lines_are_loaded_into_redis(self):
+        CartItem.objects.create(cart_id=self.cart_id, variant=self.variant, quantity=3,
+                                unit_price_snapshot=Decimal('8.00'))
+        self.client.delete(self.store.key(self.cart_id))
+
+        self.store.add_item(self.cart_id, self.variant.pk, 1, Decimal('9.00'))
+
+        self.assertEqual(self.store.get_items(self.cart_id), [CartLine(self.variant.pk, 4, Decimal('8.00'))])
+
+
+class OrderPlacementTests(QueryBudgetTestMixin, InventoryTestData):
+
+    def setUp(self):
+        self.store = DatabaseCartStore()
+        self.cart_id = self.store.create_cart()
+
+    def place(self):
+        return place_order(self.cart_id, self.user, self.branch.pk, self.address.pk, Decimal('10.00'), self.store)
+
+    def test_cart_becomes_priced_fefo_order(self):
+        early = self.make_batch(3, 30, sale_price=Decimal('7.00'))
+        late = self.make_batch(10, 300, sale_price=Decimal('9.00'))
+        self.store.add_item(self.cart_id, self.variant.pk, 5, Decimal('1.00'))
+
+        result = self.place()
+
+        self.assertEqual(
+            sorted(result.order.items.values_list('batch_id', 'quantity', 'unit_price')),
+            [(early.pk, 3, Decimal('7.00')), (late.pk, 2, Decimal('9.00'))],
+        )
+        self.assertEqual(result.order.total, Decimal('49.00'))
+        early.refresh_from_db()
+        self.assertEqual(early.qty_on_hand, 0)
+        self.assertEqual(
+            sum(InventoryMovement.objects.filter(type='sale').values_list('delta_qty', flat=True)), -5,
+        )
+        # Batches were created without purchase movements, so the snapshot only holds the sale
+        self.assertEqual(StockLevel.objects.get(variant=self.variant).qty_on_hand, -5)
+        self.assertEqual(set(result.timings), {'cart', 'lock', 'write', 'ledger', 'total'})
+
+    def test_query_count_does_not_depend_on_line_count(self):
+        def run(line_count):
+            cart_id = self.store.create_cart()
+            for pack_size in range(line_count):
+                variant = ProductVariant.objects.create(product=self.product, dosage_form=self.dosage_form,
+                                                        strength_text='x', pack_size=100 + pack_size + line_count)
+                for expiry in (30, 60):
+                    self.make_batch(1, expiry, variant=variant)
+                self.store.add_item(cart_id, variant.pk, 2, Decimal('1.00'))
+            with self.captureOnCommitCallbacks(execute=True), self.assertQueryBudget(None) as recorder:
+                place_order(cart_id, self.user, self.branch.pk, self.address.pk, store=self.store)
+            return recorder.count
+
+        self.assertEqual(run(1), run(8))
+
+    def test_shortage_rolls_back_everything(self):
+        self.make_batch(2, 30)
+        self.store.add_item(self.cart_id, self.variant.pk, 3, Decimal('1.00'))
+
+        with self.assertRaises(InsufficientStock):
+            self.place()
+
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(InventoryMovement.objects.exists())
+        self.assertEqual(self.store.get_items(self.cart_id), [CartLine(self.variant.pk, 3, Decimal('1.00'))])
+
+    def test_cart_reservations_are_consumed_and_cart_emptied(self):
+        batch = self.make_batch(4, 30)
+        reserve_stock(self.branch.pk, self.variant.pk, 4, reference=f'cart:{self.cart_id}')
+        self.store.add_item(self.cart_id, self.variant.pk, 4, Decimal('1.00'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.place()
+
+        batch.refresh_from_db()
+        self.assertEqual((batch.qty_on_hand, batch.qty_reserved), (0, 0))
+        self.assertEqual(self.store.get_items(self.cart_id), [])
+        self.assertTrue(Cart.objects.filter(pk=self.cart_id).exists())
+
+    def test_checkout_routes_to_the_nearest_branch_with_the_whole_cart(self):
+        branch_locator.invalidate()
+        self.addCleanup(branch_locator.invalidate)
+        Address.objects.filter(pk=self.address.pk).update(geo_lat=Decimal('30.04'), geo_lng=Decimal('31.23'))
+        near, far = (
+            Branch.objects.create(company=self.company, name=name, address=Address.objects.create(
+                governorate='Cairo', city='Cairo', district=name, street=name, building_no='1',
+                geo_lat=lat, geo_lng=Decimal('31.24')))
+            for name, lat in (('Near', Decimal('30.05')), ('Far', Decimal('30.60')))
+        )
+        self.make_batch(1, 30, branch=near)
+        self.make_batch(5, 30, branch=far)
+        self.store.add_item(self.cart_id, self.variant.pk, 3, Decimal('1.00'))
+        url = reverse('orders:checkout')
+        self.client.force_login(self.user)
+
+        with mock.patch('orders.placement.get_cart_store', return_value=self.store):
+            response = self.client.post(url, {'cart': self.cart_id, 'shipping_address': self.address.pk})
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Order.objects.get(pk=response.json()['id']).branch, far)
+        self.client.force_login(User.objects.create_user('other'))
+        response = self.client.post(url, {'cart': self.cart_id, 'shipping_address': self.address.pk})
+        self.assertEqual(response.status_code, 404)
+
+    def test_no_branch_able_to_ship_refuses_the_order(self):
+        self.store.add_item(self.cart_id, self.variant.pk, 1, Decimal('1.00'))
+        with self.assertRaises(NoFulfillingBranch):
+            place_order(self.cart_id, self.user, None, self.address.pk, store=self.store)
+        self.assertFalse(Order.objects.exists())
+
+
+class OrderHistoryTests(QueryBudgetTestMixin, InventoryTestData):
+
+    def setUp(self):
+        # Pairs of orders share a timestamp so the id tie-breaker is exercised
+        self.orders = [self.make_order(i + 1) for i in range(7)]
+        base = self.orders[0].placed_at
+        for i, order in enumerate(self.orders):
+            Order.objects.filter(pk=order.pk).update(placed_at=base + datetime.timedelta(minutes=i // 2))
+
+    def test_cursor_pages_cover_every_order_once_newest_first(self):
+        seen, cursor = [], None
+        while True:
+            with self.assertQueryBudget(1):
+                page = customer_order_history(self.user.pk, cursor, size=3)
+            seen.extend(page.orders)
+            cursor = page.next_cursor
+            if cursor is None:
+                break
+
+        expected = list(Order.objects.order_by('-placed_at', '-pk').values_list('pk', flat=True))
+        self.assertEqual([order.pk for order in seen], expected)
+        self.assertEqual({(order.item_count, order.units) for order in seen[-1:]}, {(1, 1)})
+
+    def test_page_query_reads_only_summary_columns_without_joins(self):
+        OrderItem.objects.create(order=self.orders[-1], variant=self.variant, batch=self.make_batch(5, 30),
+                                 quantity=4, unit_price=Decimal('1'))
+        with CaptureQueriesContext(connection) as ctx:
+            rows = OrderSummarySerializer(customer_order_history(self.user.pk, size=2).orders, many=True).data
+        self.assertEqual(len(ctx.captured_queries), 1)
+        sql = ctx.captured_queries[0]['sql']
+        self.assertEqual([(row['item_count'], row['units']) for row in rows], [(2, 11), (1, 6)])
+        self.assertNotIn('JOIN', sql)
+        self.assertNotIn('shipping_address', sql)
+
+    def test_branch_queue_api_filters_statuses(self):
+        Order.objects.filter(pk__in=[order.pk for order in self.orders[:3]]).update(status='delivered')
+        self.client.force_login(self.user)
+
+        response = self.client.get(reverse('orders:branch-queue', args=[self.branch.pk]), {'limit': 3})
+        body = response.json()
+        self.assertEqual(len(body['results']), 3)
+        second = self.client.get(body['next']).json()
+        self.assertEqual(len(second['results']), 1)
+        self.assertIsNone(second['next'])
+
+        delivered = self.client.get(reverse('orders:branch-queue', args=[self.branch.pk]), {'status': 'delivered'})
+        self.assertEqual(len(delivered.json()['results']), 3)
+
+    def test_branch_queue_is_limited_to_the_owner_and_staff(self):
+        url = reverse('orders:branch-queue', args=[self.branch.pk])
+        self.client.force_login(User.objects.create_user('customer', password='x'))
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.client.force_login(User.objects.create_user('clerk', password='x', is_staff=True))
+        self.assertEqual(len(self.client.get(url).json()['results']), 7)
+
+    def test_history_api_requires_login_and_valid_cursor(self):
+        self.assertEqual(self.client.get(reverse('orders:order-history')).status_code, 403)
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(reverse('orders:order-history'), {'cursor': 'nope'}).status_code, 400)
+        self.assertEqual(len(self.client.get(reverse('orders:order-history')).json()['results']), 7)
+
+    def test_page_size_is_capped(self):
+        self.assertEqual(len(keyset_page(Order.objects.all(), size=0).orders), 1)
+
+
+class OrderTransitionTests(QueryBudgetTestMixin, InventoryTestData):
+
+    def setUp(self):
+        self.batch = self.make_batch(10, 30)
+
+    def statuses(self):
+        return dict(Order.objects.values_list('pk', 'status'))
+
+    def test_confirm_turns_reservations_into_sales_and_rejects_short_orders(self):
+        covered = [self.make_order(3), self.make_order(4)]
+        short = self.make_order(50)
+
+        result = transition_orders([order.pk for order in covered + [short]], 'confirmed')
+
+        self.assertEqual(sorted(result.updated), sorted(order.pk for order in covered))
+        self.assertEqual(result.rejected, {short.pk: 'insufficient stock'})
+        self.batch.refresh_from_db()
+        self.assertEqual((self.batch.qty_on_hand, self.batch.qty_reserved), (3, 0))
+        self.assertEqual(InventoryMovement.objects.get(type='sale').delta_qty, -7)
+
+    def test_confirm_rejects_only_orders_whose_lines_hold_no_reservation(self):
+        reserved = self.make_order(3)
+        allocate_orders(reserved)
+        by_hand, other_batch = self.make_order(2), self.make_batch(5, 60)
+        OrderItem.objects.filter(order=by_hand).update(batch=other_batch)
+
+        result = transition_orders([by_hand.pk, reserved.pk], 'confirmed')
+
+        self.assertEqual((result.updated, result.rejected), ([reserved.pk], {by_hand.pk: 'stock not reserved'}))
+        self.batch.refresh_from_db()
+        other_batch.refresh_from_db()
+        self.assertEqual((self.batch.qty_on_hand, self.batch.qty_reserved), (7, 0))
+        self.assertEqual((other_batch.qty_on_hand, other_batch.qty_reserved), (5, 0))
+        self.assertEqual(self.statuses()[by_hand.pk], 'pending')
+
+    def test_lifecycle_keeps_shipments_in_step(self):
+        order = self.make_order(1)
+        for target in ('confirmed', 'packed'):
+            transition_orders([order.pk], target)
+        self.assertEqual(Shipment.objects.get(order=order).status, 'ready')
+
+        transition_orders([order.pk], 'shipped')
+        self.assertEqual(Shipment.objects.get(order=order).status, 'in_transit')
+
+        transition_orders([order.pk], 'delivered')
+        shipment = Shipment.objects.get(order=order)
+        self.assertEqual(shipment.status, 'delivered')
+        self.assertIsNotNone(shipment.delivered_at)
+
+    def test_invalid_transitions_are_rejected(self):
+        order = self.make_order(1)
+
+        result = transition_orders([order.pk, 0], 'shipped')
+
+        self.assertEqual(result.updated, [])
+        self.assertEqual(result.rejected, {order.pk: 'cannot go from pending to shipped', 0: 'not found'})
+        self.assertEqual(self.statuses()[order.pk], 'pending')
+
+    def test_cancel_releases_or_returns_stock(self):
+        confirmed, pending = self.make_order(2), self.make_order(3)
+        transition_orders([confirmed.pk], 'confirmed')
+        allocate_orders(pending)
+
+        transition_orders([confirmed.pk, pending.pk], 'cancelled')
+
+        self.batch.refresh_from_db()
+        self.assertEqual((self.batch.qty_on_hand, self.batch.qty_reserved), (10, 0))
+        self.assertEqual(InventoryMovement.objects.get(type='adjustment').delta_qty, 2)
+        self.assertEqual(set(self.statuses().values()), {'cancelled'})
+
+    def test_query_count_does_not_depend_on_order_count(self):
+        def run(count):
+            ids = [self.make_order(1).pk for _ in range(count)]
+            with self.assertQueryBudget(None) as recorder:
+                transition_orders(ids, 'confirmed')
+                transition_orders(ids, 'packed')
+            return recorder.count
+
+        self.assertEqual(run(1), run(5))
+
+    def test_api_requires_staff(self):
+        order = self.make_order(1)
+        url = reverse('orders:order-transitions')
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.post(url, {'orders': [order.pk], 'status': 'confirmed'},
+                                          content_type='application/json').status_code, 403)
+
+        self.client.force_login(User.objects.create_superuser('admin', password='x'))
+        response = self.client.post(url, {'orders': [order.pk], 'status': 'confirmed'},
+                                    content_type='application/json')
+        self.assertEqual(response.json(), {'updated': [order.pk], 'rejected': {}})
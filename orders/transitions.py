@@ -0,0 +1,212 @@
+from collections import defaultdict
+from dataclasses import dataclass, field
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from analytics.rollups import reverse_orders
+from inventory.allocation import allocate_orders
+from inventory.availability import invalidate_availability
+from inventory.ledger import record_movements
+from inventory.models import InventoryBatch, InventoryMovement
+
+from .models import Order, OrderItem, Shipment
+
+# ==========================
+# 1. STATE MACHINE
+#  pending -> confirmed -> packed -> shipped -> delivered, and cancelled from any status before shipping.
+#  Stock is committed when an order is confirmed: reserved batch stock becomes a 'sale' movement.
+#  Orders placed through orders.placement start out confirmed, since they are sold at checkout.
+# ==========================
+
+ORDER_TRANSITIONS = {
+    'pending': {'confirmed', 'cancelled'},
+    'confirmed': {'packed', 'cancelled'},
+    'packed': {'shipped', 'cancelled'},
+    'shipped': {'delivered'},
+    'delivered': set(),
+    'cancelled': set(),
+}
+
+# Shipment.status kept in step with the order; the row is created when the order is packed
+SHIPMENT_STATUS_FOR = {
+    'packed': 'ready',
+    'shipped': 'in_transit',
+    'delivered': 'delivered',
+}
+
+# Statuses in which the order's stock has already left the batches (confirmed and later)
+STOCK_COMMITTED = {'confirmed', 'packed', 'shipped', 'delivered'}
+
+
+class InvalidTransition(ValueError):
+    """Unknown target status."""
+
+
+@dataclass
+class TransitionResult:
+    updated: list = field(default_factory=list)
+    # {order_id: reason}
+    rejected: dict = field(default_factory=dict)
+
+
+def can_transition(source, target):
+    return target in ORDER_TRANSITIONS.get(source, ())
+
+
+# ==========================
+# 2. STOCK SIDE EFFECTS (SET-BASED)
+# ==========================
+
+def _batch_quantities(order_ids):
+    """{batch_id: quantity} over the allocated lines of the given orders (one query)."""
+    per_batch = defaultdict(int)
+    for batch_id, qty in (
+        OrderItem.objects.filter(order_id__in=order_ids, batch__isnull=False).values_list('batch_id', 'quantity')
+    ):
+        per_batch[batch_id] += qty
+    return per_batch
+
+
+def _adjust_batches(per_batch, on_hand=0, reserved=0):
+    """One UPDATE applying ``sign * quantity`` to qty_on_hand / qty_reserved of every batch."""
+    batches = []
+    for batch_id, qty in per_batch.items():
+        batch = InventoryBatch(pk=batch_id)
+        batch.qty_on_hand = F('qty_on_hand') + on_hand * qty
+        batch.qty_reserved = F('qty_reserved') + reserved * qty
+        batches.append(batch)
+    if batches:
+        InventoryBatch.objects.bulk_update(batches, ['qty_on_hand', 'qty_reserved'])
+
+
+def _reserved_orders(order_ids, result):
+    """
+    Keeps the orders whose allocated lines are covered by the reservations on their batches (one
+    query for the lines, one to lock the batches) and returns them with their {batch_id: quantity}.
+    A line given a batch by hand (e.g. in the admin) holds no reservation: releasing it would take
+    qty_reserved below zero and roll back every order of the transition, so only its order is rejected.
+    Reservations are counted per batch, not per line; orders are served in the order given.
+    """
+    per_order = defaultdict(lambda: defaultdict(int))
+    for order_id, batch_id, qty in (
+        OrderItem.objects.filter(order_id__in=order_ids, batch__isnull=False)
+        .values_list('order_id', 'batch_id', 'quantity')
+    ):
+        per_order[order_id][batch_id] += qty
+    reserved = dict(
+        InventoryBatch.objects.filter(pk__in={batch_id for lines in per_order.values() for batch_id in lines})
+        .select_for_update().values_list('pk', 'qty_reserved')
+    )
+
+    kept, per_batch = [], defaultdict(int)
+    for pk in order_ids:
+        lines = per_order.get(pk, {})
+        if any(qty > reserved[batch_id] for batch_id, qty in lines.items()):
+            result.rejected[pk] = 'stock not reserved'
+            continue
+        for batch_id, qty in lines.items():
+            reserved[batch_id] -= qty
+            per_batch[batch_id] += qty
+        kept.append(pk)
+    return kept, per_batch
+
+
+def _confirm(order_ids, result, user):
+    """Allocates unassigned lines FEFO, then turns the reservations of fully covered orders into sales."""
+    shortfalls = allocate_orders([Order(pk=pk) for pk in order_ids]).shortfalls
+    if shortfalls:
+        short_orders = set(OrderItem.objects.filter(pk__in=shortfalls).values_list('order_id', flat=True))
+        for pk in short_orders:
+            result.rejected[pk] = 'insufficient stock'
+        order_ids = [pk for pk in order_ids if pk not in short_orders]
+
+    order_ids, per_batch = _reserved_orders(order_ids, result)
+    _adjust_batches(per_batch, on_hand=-1, reserved=-1)
+    record_movements(
+        InventoryMovement(batch_id=batch_id, type='sale', delta_qty=-qty, created_by=user)
+        for batch_id, qty in per_batch.items()
+    )
+    return order_ids
+
+
+def _cancel(orders_by_status, user):
+    """
+    Pending orders give back their reservations; confirmed/packed ones return their stock to the
+    batches. All of them leave the sales rollups.
+    """
+    reverse_orders([pk for ids in orders_by_status.values() for pk in ids])
+    reserved = [pk for status, ids in orders_by_status.items() if status not in STOCK_COMMITTED for pk in ids]
+    committed = [pk for status, ids in orders_by_status.items() if status in STOCK_COMMITTED for pk in ids]
+    _adjust_batches(_batch_quantities(reserved), reserved=-1)
+
+    per_batch = _batch_quantities(committed)
+    _adjust_batches(per_batch, on_hand=1)
+    record_movements(
+        InventoryMovement(batch_id=batch_id, type='adjustment', delta_qty=qty, created_by=user)
+        for batch_id, qty in per_batch.items()
+    )
+
+
+def _sync_shipments(order_ids, target):
+    shipments = Shipment.objects.filter(order_id__in=order_ids)
+    if target == 'cancelled':
+        shipments.exclude(status='delivered').update(status='failed')
+        return
+    status = SHIPMENT_STATUS_FOR.get(target)
+    if status is None:
+        return
+    Shipment.objects.bulk_create([Shipment(order_id=pk, status=status) for pk in order_ids], ignore_conflicts=True)
+    if target == 'delivered':
+        shipments.update(status=status, delivered_at=timezone.now())
+    else:
+        shipments.update(status=status)
+
+
+# ==========================
+# 3. BULK TRANSITIONS
+# ==========================
+
+def transition_orders(order_ids, target, user=None):
+    """
+    Moves many orders to ``target`` in one transaction with a fixed number of set-based statements:
+    lock and read the current statuses, apply the stock side effects in bulk, update the orders,
+    and create/update their shipments. Orders whose current status does not allow the transition
+    (or that lack stock when confirming) are left untouched and reported in ``rejected``.
+    """
+    if target not in ORDER_TRANSITIONS:
+        raise InvalidTransition(f"Unknown order status {target!r}")
+    order_ids = list(dict.fromkeys(order_ids))
+    result = TransitionResult()
+
+    with transaction.atomic():
+        current = {
+            pk: (status, branch_id) for pk, status, branch_id in
+            Order.objects.filter(pk__in=order_ids).select_for_update().values_list('pk', 'status', 'branch_id')
+        }
+        orders_by_status = defaultdict(list)
+        for pk in order_ids:
+            status = current.get(pk, (None, None))[0]
+            if status is None:
+                result.rejected[pk] = 'not found'
+            elif not can_transition(status, target):
+                result.rejected[pk] = f'cannot go from {status} to {target}'
+            else:
+                orders_by_status[status].append(pk)
+        valid = [pk for ids in orders_by_status.values() for pk in ids]
+        if not valid:
+            return result
+
+        if target == 'confirmed':
+            valid = _confirm(valid, result, user)
+        elif target == 'cancelled':
+            _cancel(orders_by_status, user)
+        if target in ('confirmed', 'cancelled'):
+            invalidate_availability(current[pk][1] for pk in valid)
+
+        if valid:
+            Order.objects.filter(pk__in=valid).update(status=target)
+            _sync_shipments(valid, target)
+        result.updated = valid
+    return result
@@ -0,0 +1,12 @@
+from django.urls import path
+
+from . import views
+
+app_name = 'orders'
+
+urlpatterns = [
+    path('checkout/', views.CheckoutView.as_view(), name='checkout'),
+    path('history/', views.CustomerOrderHistoryView.as_view(), name='order-history'),
+    path('branches/<int:branch_id>/queue/', views.BranchOrderQueueView.as_view(), name='branch-queue'),
+    path('transitions/', views.OrderTransitionView.as_view(), name='order-transitions'),
+]
@@ -1,3 +1,100 @@
-from django.shortcuts import render
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
 
-# Create your views here.
+from inventory.exceptions import InsufficientStock, NoFulfillingBranch
+from inventory.models import Branch
+from users.models import Address
+
+from .history import (
+    DEFAULT_PAGE_SIZE, OPEN_STATUSES, InvalidCursor, branch_fulfilment_queue, customer_order_history,
+)
+from .models import Order
+from .placement import place_order
+from .serializers import CheckoutSerializer, OrderSummarySerializer, OrderTransitionSerializer
+from .transitions import transition_orders
+
+
+def _page_size(request):
+    try:
+        return int(request.query_params.get('limit', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        return DEFAULT_PAGE_SIZE
+
+
+def _page_response(request, fetch):
+    try:
+        page = fetch(cursor=request.query_params.get('cursor'), size=_page_size(request))
+    except InvalidCursor:
+        return Response({'detail': 'Invalid cursor.'}, status=400)
+    next_url = None
+    if page.next_cursor:
+        params = request.query_params.copy()
+        params['cursor'] = page.next_cursor
+        next_url = request.build_absolute_uri(f"{request.path}?{params.urlencode()}")
+    return Response({'next': next_url, 'results': OrderSummarySerializer(page.orders, many=True).data})
+
+
+class CheckoutView(APIView):
+    """
+    POST {"cart": id, "shipping_address": id}: places the cart as an order with the nearest branch
+    that can ship all of it to the signed-in customer's address.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        serializer = CheckoutSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        address_id = serializer.validated_data['shipping_address']
+        if not Address.objects.filter(pk=address_id, user=request.user).exists():
+            return Response({'detail': 'Unknown address.'}, status=404)
+        try:
+            result = place_order(serializer.validated_data['cart'], request.user, None, address_id)
+        except ValueError as exc:
+            return Response({'detail': str(exc)}, status=400)
+        except NoFulfillingBranch as exc:
+            return Response({'detail': str(exc)}, status=409)
+        except InsufficientStock as exc:
+            return Response({'detail': str(exc), 'variant': exc.variant_id, 'available': exc.available}, status=409)
+        order = result.order
+        return Response({'id': order.pk, 'branch': order.branch_id, 'status': order.status,
+                         'total': str(order.total)}, status=201)
+
+
+class CustomerOrderHistoryView(APIView):
+    """GET ?cursor=<c>&limit=<n>: the signed-in customer's orders, newest first (keyset pagination)."""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        return _page_response(
+            request, lambda **page: customer_order_history(request.user.pk, **page),
+        )
+
+
+class BranchOrderQueueView(APIView):
+    """GET /branches/<id>/queue/?status=pending,packed&cursor=<c>: a branch's fulfilment queue (owner or staff)."""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, branch_id):
+        branches = Branch.objects.filter(pk=branch_id)
+        if not request.user.is_staff:
+            branches = branches.filter(company__owner=request.user)
+        if not branches.exists():
+            return Response({'detail': 'Unknown branch.'}, status=404)
+        valid = {status for status, _ in Order.STATUS_CHOICES}
+        statuses = [status for status in request.query_params.get('status', '').split(',') if status in valid]
+        return _page_response(
+            request, lambda **page: branch_fulfilment_queue(branch_id, statuses or OPEN_STATUSES, **page),
+        )
+
+
+class OrderTransitionView(APIView):
+    """POST {"orders": [ids], "status": "shipped"}: bulk status change; returns updated ids and rejections."""
+    permission_classes = [IsAdminUser]
+
+    def post(self, request):
+        serializer = OrderTransitionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        result = transition_orders(serializer.validated_data['orders'], serializer.validated_data['status'],
+                                   user=request.user)
+        return Response({'updated': result.updated, 'rejected': result.rejected})
@@ -0,0 +1,11 @@
+import os
+
+from celery import Celery
+
+# Background workers (Factor VIII: Concurrency) share the Django settings module
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'pharma_store_v01.settings')
+
+app = Celery('pharma_store_v01')
+# Every CELERY_* Django setting configures the app (CELERY_BROKER_URL, CELERY_BEAT_SCHEDULE, ...)
+app.config_from_object('django.conf:settings', namespace='CELERY')
+app.autodiscover_tasks()
@@ -0,0 +1,91 @@
+"""
+Primary / replica routing.
+
+Reads of the apps listed in ``settings.DATABASE_REPLICA_APPS`` (catalog browsing, analytics
+reports) go to the ``replica`` alias; exports pick it explicitly with ``read_alias()``. Everything
+else, and every write, goes to ``default``. Reads fall back to the primary when:
+
+* the primary connection is inside a transaction (the transaction's own writes must be visible);
+* the current request has already written something (``PrimaryPinMiddleware``), so a client never
+  reads its own write back from a lagging replica.
+
+The replica alias has its own connection pool, so reporting cannot exhaust checkout's connections.
+
+Shared-cache fills are the exception: the barcode, product detail and lookup-table caches read
+from the primary with ``using(DEFAULT_DB_ALIAS)``. The pin only protects the request that wrote.
+A fill from a lagging replica just after someone else's write would put the old row back into
+the cache, where it stays for the whole TTL (hours) instead of the replica's lag (seconds). The
+cost is that cache misses land on the primary. Hit rates are high, so that load is small.
+"""
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICA_DB_ALIAS = 'replica'
+
+# Per-request holder: [True] once the request wrote; None outside requests
+_primary_pin = ContextVar('primary_pin', default=None)
+
+
+def pin_to_primary():
+    pin = _primary_pin.get()
+    if pin is not None:
+        pin[0] = True
+
+
+def read_alias():
+    """Alias reporting-type reads should use right now: the replica unless a pin or transaction says otherwise."""
+    if REPLICA_DB_ALIAS not in settings.DATABASES or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+        return DEFAULT_DB_ALIAS
+    pin = _primary_pin.get()
+    return DEFAULT_DB_ALIAS if pin is not None and pin[0] else REPLICA_DB_ALIAS
+
+
+class PrimaryReplicaRouter:
+    """Routes DATABASE_REPLICA_APPS reads to the replica; all other traffic stays on the primary."""
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label in settings.DATABASE_REPLICA_APPS:
+            return read_alias()
+        # Explicit, so related lookups from replica-loaded instances do not follow them to the replica
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        pin_to_primary()
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class PrimaryPinMiddleware:
+    """Gives each request a fresh primary pin (see module docstring); sync and async capable."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = _primary_pin.set([False])
+        try:
+            return self.get_response(request)
+        finally:
+            _primary_pin.reset(token)
+
+    async def __acall__(self, request):
+        token = _primary_pin.set([False])
+        try:
+            return await self.get_response(request)
+        finally:
+            _primary_pin.reset(token)
@@ -0,0 +1,297 @@
+"""
+Per-request SQL, cache and latency metrics, exposed in the Prometheus text format.
+
+``MetricsMiddleware`` times every request and, for a sampled share of them
+(``settings.METRICS_SAMPLE_RATE``), counts the SQL statements and their time, remembers the
+slowest statement and counts cache hits and misses. Statements are seen by an execute-wrapper
+installed once on every new database connection (``install_sql_timer``); cache lookups by the
+``LocMemCache`` / ``RedisCache`` subclasses below (settings swaps them in). Both only do work
+while a sampled request is active, so unsampled requests pay for a context-variable read.
+
+Everything is aggregated in process memory, labelled by view and app, and rendered by
+``metrics_view`` (``/metrics``). Each worker process keeps its own numbers; Prometheus scrapes
+and sums them per instance.
+"""
+import hmac
+import random
+import threading
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache.backends import locmem, redis
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse, HttpResponseForbidden
+
+from .query_budget import fingerprint
+
+PREFIX = 'pharma'
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+FINGERPRINT_MAX_LENGTH = 300
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+_MISSING = object()
+_current = ContextVar('request_metrics', default=None)
+
+
+class RequestStats:
+    """What one sampled request did; filled by the SQL timer and the instrumented caches."""
+    __slots__ = ('queries', 'sql_seconds', 'slowest_sql', 'slowest_seconds', 'cache_hits', 'cache_misses')
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.slowest_sql = None
+        self.slowest_seconds = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+
+# ==========================
+# 1. IN-PROCESS AGGREGATION
+# ==========================
+
+class Histogram:
+    """Cumulative-bucket histogram (Prometheus semantics)."""
+    __slots__ = ('buckets', 'counts', 'total', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.total += value
+        self.count += 1
+
+    def cumulative(self):
+        running = 0
+        for bound, count in zip(self.buckets, self.counts):
+            running += count
+            yield bound, running
+
+
+class MetricsRegistry:
+    """All series, keyed by (app, view); one lock, held only for the few additions per request."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.requests = defaultdict(int)           # (app, view, status class) -> count
+        self.latency = {}                          # (app, view) -> Histogram of response seconds
+        self.sampled = defaultdict(int)            # (app, view) -> sampled requests
+        self.query_counts = {}                     # (app, view) -> Histogram of statements per request
+        self.sql_seconds = defaultdict(float)      # (app, view) -> total SQL seconds
+        self.cache = defaultdict(int)              # (app, view, 'hit' | 'miss') -> count
+        self.slowest = {}                          # (app, view) -> (seconds, fingerprint)
+
+    def record(self, app, view, status, seconds, stats=None):
+        key = (app, view)
+        with self._lock:
+            self.requests[app, view, f'{status // 100}xx'] += 1
+            self.latency.setdefault(key, Histogram(LATENCY_BUCKETS)).observe(seconds)
+            if stats is None:
+                return
+            self.sampled[key] += 1
+            self.query_counts.setdefault(key, Histogram(QUERY_COUNT_BUCKETS)).observe(stats.queries)
+            self.sql_seconds[key] += stats.sql_seconds
+            self.cache[app, view, 'hit'] += stats.cache_hits
+            self.cache[app, view, 'miss'] += stats.cache_misses
+            if stats.slowest_sql is not None and stats.slowest_seconds > self.slowest.get(key, (0.0,))[0]:
+                self.slowest[key] = (stats.slowest_seconds, stats.slowest_sql)
+
+    def render(self):
+        """The whole registry in the Prometheus text exposition format."""
+        with self._lock:
+            lines = []
+            _header(lines, 'http_requests_total', 'counter', 'Requests by view and status class.')
+            for (app, view, status), count in sorted(self.requests.items()):
+                lines.append(_sample('http_requests_total', {'app': app, 'view': view, 'status': status}, count))
+            _histogram(lines, 'http_response_seconds', 'Response time.', self.latency)
+            _header(lines, 'sampled_requests_total', 'counter', 'Requests with SQL and cache instrumentation.')
+            for (app, view), count in sorted(self.sampled.items()):
+                lines.append(_sample('sampled_requests_total', {'app': app, 'view': view}, count))
+            _histogram(lines, 'db_queries_per_request', 'SQL statements per sampled request.', self.query_counts)
+            _header(lines, 'db_query_seconds_total', 'counter', 'SQL time of sampled requests.')
+            for (app, view), seconds in sorted(self.sql_seconds.items()):
+                lines.append(_sample('db_query_seconds_total', {'app': app, 'view': view}, seconds))
+            _header(lines, 'cache_lookups_total', 'counter', 'Cache lookups of sampled requests.')
+            for (app, view, result), count in sorted(self.cache.items()):
+                lines.append(_sample('cache_lookups_total', {'app': app, 'view': view, 'result': result}, count))
+            _header(lines, 'db_slowest_query_seconds', 'gauge', 'Slowest statement seen per view.')
+            for (app, view), (seconds, sql) in sorted(self.slowest.items()):
+                lines.append(_sample('db_slowest_query_seconds',
+                                     {'app': app, 'view': view, 'fingerprint': sql}, seconds))
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _sample(name, labels, value, suffix=''):
+    label_text = ','.join(f'{key}="{_escape(val)}"' for key, val in labels.items())
+    return f'{PREFIX}_{name}{suffix}{{{label_text}}} {value}'
+
+
+def _header(lines, name, kind, help_text):
+    lines.append(f'# HELP {PREFIX}_{name} {help_text}')
+    lines.append(f'# TYPE {PREFIX}_{name} {kind}')
+
+
+def _histogram(lines, name, help_text, histograms):
+    _header(lines, name, 'histogram', help_text)
+    for (app, view), histogram in sorted(histograms.items()):
+        labels = {'app': app, 'view': view}
+        for bound, count in histogram.cumulative():
+            lines.append(_sample(name, {**labels, 'le': bound}, count, '_bucket'))
+        lines.append(_sample(name, {**labels, 'le': '+Inf'}, histogram.count, '_bucket'))
+        lines.append(_sample(name, labels, histogram.total, '_sum'))
+        lines.append(_sample(name, labels, histogram.count, '_count'))
+
+
+registry = MetricsRegistry()
+
+
+# ==========================
+# 2. INSTRUMENTATION (SQL AND CACHE)
+# ==========================
+
+def sql_timer(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        seconds = time.perf_counter() - started
+        stats.queries += 1
+        stats.sql_seconds += seconds
+        if seconds > stats.slowest_seconds:
+            stats.slowest_seconds, stats.slowest_sql = seconds, sql
+
+
+def install_sql_timer(sender, connection, **kwargs):
+    """connection_created receiver: puts the timer first, under any execute_wrapper() blocks."""
+    if sql_timer not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, sql_timer)
+
+
+connection_created.connect(install_sql_timer)
+
+
+class InstrumentedCacheMixin:
+    """Counts hits and misses of get()/get_many() (and their async forms) for the sampled request."""
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _MISSING, version)
+        stats = _current.get()
+        if stats is not None:
+            if value is _MISSING:
+                stats.cache_misses += 1
+            else:
+                stats.cache_hits += 1
+        return default if value is _MISSING else value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        found = super().get_many(keys, version)
+        stats = _current.get()
+        if stats is not None:
+            stats.cache_hits += len(found)
+            stats.cache_misses += len(keys) - len(found)
+        return found
+
+
+class LocMemCache(InstrumentedCacheMixin, locmem.LocMemCache):
+    pass
+
+
+class RedisCache(InstrumentedCacheMixin, redis.RedisCache):
+    pass
+
+
+# ==========================
+# 3. MIDDLEWARE AND ENDPOINT
+# ==========================
+
+class MetricsMiddleware:
+    """Times every request; instruments a sampled share of them. Sync and async capable."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        # Connections opened before this module was imported missed the connection_created signal
+        for connection in connections.all(initialized_only=True):
+            install_sql_timer(None, connection)
+
+    def _sample(self, request):
+        request.metrics_view = ('unresolved', 'unresolved')
+        rate = getattr(settings, 'METRICS_SAMPLE_RATE', 1.0)
+        return RequestStats() if rate >= 1 or random.random() < rate else None
+
+    def _record(self, request, response, started, stats):
+        if stats is not None and stats.slowest_sql is not None:
+            stats.slowest_sql = fingerprint(stats.slowest_sql)[:FINGERPRINT_MAX_LENGTH]
+        app, view = request.metrics_view
+        registry.record(app, view, response.status_code, time.perf_counter() - started, stats)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats, started = self._sample(request), time.perf_counter()
+        token = _current.set(stats)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self._record(request, response, started, stats)
+        return response
+
+    async def __acall__(self, request):
+        stats, started = self._sample(request), time.perf_counter()
+        token = _current.set(stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self._record(request, response, started, stats)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view = getattr(view_func, 'view_class', view_func)
+        module = view.__module__
+        request.metrics_view = (module.split('.')[0], f"{module}.{getattr(view, '__qualname__', view)}")
+
+
+def _may_scrape(request):
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if not token:
+        return request.user.is_active and request.user.is_staff
+    # Bytes, because compare_digest raises TypeError for non-ASCII str
+    return hmac.compare_digest(request.headers.get('Authorization', '').encode(), f'Bearer {token}'.encode())
+
+
+def metrics_view(request):
+    """
+    GET /metrics: Prometheus scrape target (view names and SQL fingerprints, so never public). Requires
+    ``Authorization: Bearer <METRICS_TOKEN>``, or a staff session when no token is configured.
+    """
+    if not _may_scrape(request):
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(), content_type=CONTENT_TYPE)
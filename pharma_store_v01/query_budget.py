@@ -0,0 +1,169 @@
+"""
+Query budgets and N+1 detection.
+
+``record_queries`` captures every SQL statement executed inside a block (through
+``connection.execute_wrapper``). ``check_query_budget`` compares the capture with a declared
+budget and looks for one statement shape repeated many times, the usual signature of an N+1
+loop. In strict mode violations raise ``QueryBudgetExceeded``; otherwise they are logged.
+
+``query_budget`` combines both for a code block, ``QueryBudgetMiddleware`` applies them to every
+request (budget from ``@view_query_budget`` / a ``query_budget`` view attribute, or
+``settings.QUERY_BUDGET_DEFAULT``), and ``QueryBudgetTestMixin`` exposes them to tests.
+"""
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_IN_LISTS = re.compile(r"\bIN \((?:[^()]|\([^()]*\))*\)", re.IGNORECASE)
+_SAVEPOINTS = re.compile(r'^\s*(?:SAVEPOINT|RELEASE SAVEPOINT|ROLLBACK TO SAVEPOINT)\b', re.IGNORECASE)
+
+
+class QueryBudgetExceeded(AssertionError):
+    """A block ran more queries than its budget, or repeated one statement shape too often."""
+
+
+def fingerprint(sql):
+    """Statement shape: literals and IN-lists replaced by placeholders, whitespace collapsed."""
+    shape = _IN_LISTS.sub('IN (...)', sql)
+    shape = _LITERALS.sub('?', shape)
+    return ' '.join(shape.split())
+
+
+class QueryRecorder:
+    """Execute-wrapper collecting (sql, seconds) for every statement run on a connection."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - started))
+
+    @property
+    def statements(self):
+        """Recorded statements minus transaction bookkeeping (savepoints)."""
+        return [sql for sql, _ in self.queries if not _SAVEPOINTS.match(sql)]
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def repeated_shapes(self, threshold):
+        counts = Counter(fingerprint(sql) for sql in self.statements)
+        return {shape: count for shape, count in counts.items() if count >= threshold}
+
+
+@contextmanager
+def record_queries(using=None):
+    """Yields a QueryRecorder filled with the statements run on ``using`` (default: every alias)."""
+    aliases = [using] if isinstance(using, str) else (using or list(connections))
+    recorder = QueryRecorder()
+    with ExitStack() as stack:
+        for alias in aliases:
+            stack.enter_context(connections[alias].execute_wrapper(recorder))
+        yield recorder
+
+
+def check_query_budget(recorder, budget=None, name='block', strict=None, repeat_threshold=None):
+    """
+    Returns the list of violations found in ``recorder`` (empty when within budget).
+    ``budget=None`` skips the count check; ``repeat_threshold=0`` skips N+1 detection. Defaults
+    come from settings.QUERY_BUDGET_STRICT and settings.QUERY_BUDGET_REPEAT_THRESHOLD.
+    """
+    strict = getattr(settings, 'QUERY_BUDGET_STRICT', False) if strict is None else strict
+    if repeat_threshold is None:
+        repeat_threshold = getattr(settings, 'QUERY_BUDGET_REPEAT_THRESHOLD', 5)
+
+    violations = []
+    if budget is not None and recorder.count > budget:
+        violations.append(f"{name}: {recorder.count} queries, budget is {budget}")
+    if repeat_threshold:
+        for shape, count in sorted(recorder.repeated_shapes(repeat_threshold).items(), key=lambda i: -i[1]):
+            violations.append(f"{name}: same statement executed {count} times (possible N+1): {shape[:300]}")
+
+    if violations:
+        if strict:
+            raise QueryBudgetExceeded('\n'.join(violations))
+        for violation in violations:
+            logger.warning(violation)
+    return violations
+
+
+@contextmanager
+def query_budget(budget=None, name='block', strict=None, repeat_threshold=None, using=None):
+    """Context manager enforcing a query budget (and N+1 detection) over the enclosed block."""
+    with record_queries(using) as recorder:
+        yield recorder
+    check_query_budget(recorder, budget, name, strict, repeat_threshold)
+
+
+def view_query_budget(budget):
+    """Declares the query budget of a view function or class (read by QueryBudgetMiddleware)."""
+    def decorator(view):
+        view.query_budget = budget
+        return view
+    return decorator
+
+
+class QueryBudgetMiddleware:
+    """
+    Records each request's queries and reports budget / N+1 violations for the resolved view.
+    Sync and async capable, so async views under ASGI are not pushed onto a thread per request.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        request.query_budget = getattr(settings, 'QUERY_BUDGET_DEFAULT', None)
+        request.query_budget_name = request.path
+        with record_queries() as recorder:
+            response = self.get_response(request)
+        check_query_budget(recorder, request.query_budget, request.query_budget_name)
+        return response
+
+    async def __acall__(self, request):
+        request.query_budget = getattr(settings, 'QUERY_BUDGET_DEFAULT', None)
+        request.query_budget_name = request.path
+        # Connections are per thread: the wrapper is installed (and removed) on the thread that runs
+        # this request's async ORM calls, i.e. the thread-sensitive executor of the request.
+        stack = ExitStack()
+        recorder = await sync_to_async(stack.enter_context)(record_queries())
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        check_query_budget(recorder, request.query_budget, request.query_budget_name)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view = getattr(view_func, 'view_class', view_func)
+        budget = getattr(view, 'query_budget', None)
+        if budget is not None:
+            request.query_budget = budget
+        request.query_budget_name = f"{view.__module__}.{getattr(view, '__qualname__', view)}"
+
+
+class QueryBudgetTestMixin:
+    """TestCase mixin: ``with self.assertQueryBudget(5): ...`` fails on overruns and N+1 patterns."""
+
+    def assertQueryBudget(self, budget, repeat_threshold=None):
+        return query_budget(budget, name=self.id(), strict=True, repeat_threshold=repeat_threshold)
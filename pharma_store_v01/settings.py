@@ -13,6 +13,8 @@ import environ
 # django-environ
 from pathlib import Path
 
+from celery.schedules import crontab
+
 
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -49,18 +51,23 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres', # trigram / full-text search lookups
     'rest_framework', # rest needed for APIs
+    'adrf', # async APIView for the ASGI read endpoints
     #Custom Pharma ERP Apps (The Modular Monolith)
     'users',
     'catalog',
     'inventory',
     'orders',
+    'analytics', # sales rollups (reporting layer)
+    'benchmarks', # synthetic data + performance benchmarks (dev tooling, no models)
 ]
 
 # INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_APPS + LOCAL_APPS
 #I think later we will use this methods
 
 MIDDLEWARE = [
+    'pharma_store_v01.metrics.MetricsMiddleware', # first, so its timing covers the whole stack
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -68,8 +75,21 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'pharma_store_v01.query_budget.QueryBudgetMiddleware',
+    'pharma_store_v01.db_router.PrimaryPinMiddleware',
 ]
 
+# Request metrics (see pharma_store_v01/metrics.py): share of requests whose SQL and cache use is
+# instrumented (all requests are timed); /metrics requires 'Authorization: Bearer <METRICS_TOKEN>', or a staff
+# session when no token is set
+METRICS_SAMPLE_RATE = env.float('METRICS_SAMPLE_RATE', default=0.1)
+METRICS_TOKEN = env('METRICS_TOKEN', default='')
+
+# Query budgets per request (see pharma_store_v01/query_budget.py): violations are logged, or raised when strict
+QUERY_BUDGET_DEFAULT = env.int('QUERY_BUDGET_DEFAULT', default=50)
+QUERY_BUDGET_STRICT = env.bool('QUERY_BUDGET_STRICT', default=False)
+QUERY_BUDGET_REPEAT_THRESHOLD = env.int('QUERY_BUDGET_REPEAT_THRESHOLD', default=5)
+
 ROOT_URLCONF = 'pharma_store_v01.urls'
 
 TEMPLATES = [
@@ -98,8 +118,79 @@ DATABASES = {
     'default': env.db_url(
         'DATABASE_URL',
         default='sqlite:///db.sqlite3' # Fallback default, though we prefer Postgres
-    )
+    ),
+    # Catalog reads, analytics and exports (see pharma_store_v01/db_router.py). Without
+    # DATABASE_REPLICA_URL this is a second connection pool to the primary, so reporting still
+    # cannot take checkout's connections; tests mirror it onto the test database (so they check
+    # which connection runs each query rather than which rows come back).
+    'replica': env.db_url(
+        'DATABASE_REPLICA_URL',
+        default=env('DATABASE_URL', default='sqlite:///db.sqlite3')
+    ),
+}
+DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+
+# Connection reuse: psycopg 3 pools on PostgreSQL (Django 5.1+), persistent connections elsewhere
+DATABASE_POOL_SIZES = {
+    'default': (env.int('DATABASE_POOL_MIN_SIZE', default=2), env.int('DATABASE_POOL_MAX_SIZE', default=20)),
+    'replica': (env.int('DATABASE_REPLICA_POOL_MIN_SIZE', default=1),
+                env.int('DATABASE_REPLICA_POOL_MAX_SIZE', default=8)),
+}
+for alias, (min_size, max_size) in DATABASE_POOL_SIZES.items():
+    database = DATABASES[alias]
+    if database['ENGINE'] == 'django.db.backends.postgresql' and env.bool('DATABASE_POOL', default=True):
+        database.setdefault('OPTIONS', {})['pool'] = {
+            'min_size': min_size,
+            'max_size': max_size,
+            # Seconds a request waits for a free connection before failing
+            'timeout': env.int('DATABASE_POOL_TIMEOUT', default=10),
+        }
+    else:
+        database['CONN_MAX_AGE'] = env.int('CONN_MAX_AGE', default=60)
+        database['CONN_HEALTH_CHECKS'] = True
+
+DATABASE_ROUTERS = ['pharma_store_v01.db_router.PrimaryReplicaRouter']
+# Apps whose reads go to the replica (unless the request already wrote, or inside a transaction)
+DATABASE_REPLICA_APPS = {'catalog', 'analytics'}
+
+# Cache (Factor IV: Backing Services) - Redis when REDIS_URL is set, per-process memory otherwise
+CACHES = {
+    'default': env.cache_url('REDIS_URL', default='locmemcache://'),
 }
+# Same backends, counting hits and misses for the request metrics
+INSTRUMENTED_CACHE_BACKENDS = {
+    'django.core.cache.backends.locmem.LocMemCache': 'pharma_store_v01.metrics.LocMemCache',
+    'django.core.cache.backends.redis.RedisCache': 'pharma_store_v01.metrics.RedisCache',
+}
+CACHES['default']['BACKEND'] = INSTRUMENTED_CACHE_BACKENDS.get(CACHES['default']['BACKEND'],
+                                                               CACHES['default']['BACKEND'])
+
+# How long a resolved barcode stays in the shared cache (seconds); entries are also invalidated on save
+BARCODE_CACHE_TIMEOUT = env.int('BARCODE_CACHE_TIMEOUT', default=24 * 60 * 60)
+
+# How long the static part of a product detail page stays in the shared cache; entries are also invalidated on save
+PRODUCT_DETAIL_CACHE_TIMEOUT = env.int('PRODUCT_DETAIL_CACHE_TIMEOUT', default=60 * 60)
+
+# Availability matrix entries (per branch and variant) expire after this many seconds; batch writes also invalidate them
+AVAILABILITY_CACHE_TIMEOUT = env.int('AVAILABILITY_CACHE_TIMEOUT', default=10 * 60)
+
+# Stock reservations (carts) are released automatically after this many seconds
+STOCK_RESERVATION_TTL = env.int('STOCK_RESERVATION_TTL', default=15 * 60)
+
+# Active carts live in this Redis (write-behind to Cart/CartItem); empty = carts are written straight to the database
+CART_REDIS_URL = env('CART_REDIS_URL', default=env('REDIS_URL', default=''))
+# Idle carts expire from Redis after this many seconds (their last flushed state stays in the database)
+CART_TTL = env.int('CART_TTL', default=7 * 24 * 60 * 60)
+# One write-behind run persists at most this many queued carts; the rest are left for the next run
+CART_FLUSH_MAX_CARTS = env.int('CART_FLUSH_MAX_CARTS', default=5000)
+
+# Raw inventory movements of months older than this many whole months are moved to gzip files under
+# MOVEMENT_ARCHIVE_DIR (monthly balance checkpoints keep history answerable); 0 keeps every movement in the database
+MOVEMENT_RETENTION_MONTHS = env.int('MOVEMENT_RETENTION_MONTHS', default=24)
+MOVEMENT_ARCHIVE_DIR = env('MOVEMENT_ARCHIVE_DIR', default=str(BASE_DIR / 'archive' / 'movements'))
+
+# Covering indexes (INCLUDE columns) only exist on PostgreSQL; SQLite development databases just skip them
+SILENCED_SYSTEM_CHECKS = ['models.W040']
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -141,3 +232,48 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Celery (Factor VIII: Concurrency) - broker defaults to REDIS_URL
+CELERY_BROKER_URL = env('CELERY_BROKER_URL', default=env('REDIS_URL', default='memory://'))
+CELERY_TASK_IGNORE_RESULT = True
+CELERY_TIMEZONE = TIME_ZONE
+CELERY_BEAT_SCHEDULE = {
+    # STOCK_RESERVATION_TTL is only enforced by this job, so it runs often
+    'release-expired-reservations': {
+        'task': 'inventory.tasks.release_expired_reservations_task',
+        'schedule': crontab(minute='*'),
+    },
+    # Runs after midnight so batches that expired the day before are withdrawn before the pharmacies open
+    'scan-expiry-risk': {
+        'task': 'inventory.tasks.scan_expiry_risk_task',
+        'schedule': crontab(hour=env.int('EXPIRY_SCAN_HOUR', default=1), minute=0),
+    },
+    # A month's partition cannot be created once the default partition holds rows of that month
+    'ensure-movement-partitions': {
+        'task': 'inventory.tasks.ensure_movement_partitions_task',
+        'schedule': crontab(hour=0, minute=30),
+    },
+    'forecast-demand': {
+        'task': 'inventory.tasks.forecast_demand_task',
+        'schedule': crontab(hour=env.int('FORECAST_HOUR', default=2), minute=0),
+    },
+    # Closes last month's movement checkpoints and archives old movements; a no-op on most days
+    'compact-movements': {
+        'task': 'inventory.tasks.compact_movements_task',
+        'schedule': crontab(hour=env.int('MOVEMENT_COMPACTION_HOUR', default=3), minute=0),
+    },
+    # Bounds how many minutes of cart changes a Redis failure can lose
+    'flush-carts': {
+        'task': 'orders.tasks.flush_carts_task',
+        'schedule': crontab(minute=f"*/{env.int('CART_FLUSH_MINUTES', default=1)}"),
+    },
+    # After the compaction, so the archived balances it reads are the final ones for the night
+    'reconcile-stock-levels': {
+        'task': 'inventory.tasks.reconcile_stock_levels_task',
+        'schedule': crontab(hour=env.int('STOCK_RECONCILE_HOUR', default=4), minute=0),
+    },
+    'refresh-sales-rollups': {
+        'task': 'analytics.tasks.refresh_sales_rollups_task',
+        'schedule': crontab(minute='*/5'),
+    },
+}
@@ -0,0 +1,183 @@
+from asgiref.sync import async_to_sync, sync_to_async
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connections, transaction
+from django.test import Client, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from catalog.barcode import resolve_barcode
+from catalog.lookups import LOOKUP_CACHES
+from catalog.models import DosageForm, Manufacturer, Product, ProductVariant
+from orders.models import Order
+
+from .db_router import PrimaryPinMiddleware, PrimaryReplicaRouter, read_alias
+from .metrics import registry
+from .query_budget import QueryBudgetExceeded, fingerprint, query_budget
+
+
+class QueryBudgetTests(TestCase):
+
+    def test_fingerprint_ignores_literals_and_in_lists(self):
+        self.assertEqual(
+            fingerprint("SELECT * FROM t WHERE id IN (1, 2, 3) AND name = 'x'   AND n > 10"),
+            fingerprint("SELECT * FROM t WHERE id IN (4) AND name = 'y' AND n > 2"),
+        )
+
+    def test_over_budget_raises_in_strict_mode(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            with query_budget(1, strict=True):
+                User.objects.count()
+                User.objects.exists()
+
+    def test_repeated_statement_shape_is_reported_as_n_plus_one(self):
+        users = [User.objects.create_user(f'user{i}') for i in range(5)]
+        with self.assertLogs('pharma_store_v01.query_budget', level='WARNING') as logs:
+            with query_budget(strict=False, repeat_threshold=5):
+                for user in users:
+                    User.objects.get(pk=user.pk)
+        self.assertIn('possible N+1', logs.output[0])
+
+    @override_settings(QUERY_BUDGET_DEFAULT=0, QUERY_BUDGET_STRICT=True)
+    def test_middleware_enforces_the_request_budget(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            self.client.get('/api/catalog/search/', {'q': 'x'})
+
+
+class PrimaryReplicaRoutingTests(TransactionTestCase):
+    """
+    The replica alias mirrors the test database, so routed reads see the committed rows. Results
+    alone cannot tell the aliases apart, hence the checks on the router and on each connection.
+    """
+    databases = {'default', 'replica'}
+
+    def test_router_sends_replica_app_reads_to_the_replica_outside_transactions(self):
+        router = PrimaryReplicaRouter()
+        self.assertEqual((router.db_for_read(Manufacturer), router.db_for_read(Order)), ('replica', 'default'))
+        self.assertEqual(router.db_for_write(Manufacturer), 'default')
+        with transaction.atomic():
+            self.assertEqual(router.db_for_read(Manufacturer), 'default')
+
+    def test_routed_reads_run_on_the_replica_connection_until_the_request_writes(self):
+        Manufacturer.objects.create(name='GSK')
+        captured = {}
+
+        def view(request):
+            with CaptureQueriesContext(connections['replica']) as replica, \
+                    CaptureQueriesContext(connections['default']) as primary:
+                self.assertEqual(Manufacturer.objects.count(), 1)
+                Manufacturer.objects.create(name='Pfizer')
+                self.assertEqual(Manufacturer.objects.count(), 2)
+            captured.update(replica=replica.captured_queries, primary=primary.captured_queries)
+
+        PrimaryPinMiddleware(view)(RequestFactory().get('/'))
+
+        counts = 'SELECT COUNT(*) AS "__count" FROM "catalog_manufacturer"'
+        self.assertEqual([query['sql'] for query in captured['replica']], [counts])
+        # The write, the catalog signal handlers' own primary reads, then the pinned count
+        self.assertTrue(captured['primary'][0]['sql'].startswith('INSERT'))
+        self.assertEqual(captured['primary'][-1]['sql'], counts)
+
+    def test_async_requests_are_pinned_too(self):
+        seen = []
+
+        async def view(request):
+            seen.append(await sync_to_async(read_alias)())
+            await Manufacturer.objects.acreate(name='GSK')
+            seen.append(await sync_to_async(read_alias)())
+
+        async_to_sync(PrimaryPinMiddleware(view))(RequestFactory().get('/'))
+        self.assertEqual(seen, ['replica', 'default'])
+
+    def test_replica_apps_read_from_the_replica(self):
+        Manufacturer.objects.create(name='GSK')
+        self.assertEqual(Manufacturer.objects.all().db, 'replica')
+        self.assertEqual(Manufacturer.objects.get().name, 'GSK')
+        self.assertEqual(Order.objects.all().db, 'default')
+        self.assertEqual(Manufacturer.objects.select_for_update().db, 'default')
+
+    def test_reads_inside_a_transaction_stay_on_the_primary(self):
+        with transaction.atomic():
+            Manufacturer.objects.create(name='GSK')
+            self.assertEqual(read_alias(), 'default')
+            self.assertTrue(Manufacturer.objects.filter(name='GSK').exists())
+
+    def test_request_is_pinned_to_the_primary_after_a_write(self):
+        seen = []
+
+        def view(request):
+            seen.append(Manufacturer.objects.all().db)
+            Manufacturer.objects.create(name=f'Manufacturer {len(seen)}')
+            seen.append(Manufacturer.objects.all().db)
+            return None
+
+        middleware = PrimaryPinMiddleware(view)
+        middleware(RequestFactory().get('/'))
+        self.assertEqual(seen, ['replica', 'default'])
+
+        # The next request starts unpinned
+        middleware(RequestFactory().get('/'))
+        self.assertEqual(seen[2:], ['replica', 'default'])
+
+    def test_shared_cache_fills_read_the_primary(self):
+        cache.clear()
+        with CaptureQueriesContext(connections['default']) as primary:
+            resolve_barcode('routing-test')
+        self.assertEqual(len(primary), 1)
+
+
+@override_settings(METRICS_SAMPLE_RATE=1, METRICS_TOKEN='')
+class RequestMetricsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        product = Product.objects.create(brand_name='Panadol', manufacturer=Manufacturer.objects.create(name='GSK'))
+        cls.variant = ProductVariant.objects.create(product=product, dosage_form=DosageForm.objects.create(name='Tablet'),
+                                                    strength_text='500 mg', pack_size=24)
+
+    def setUp(self):
+        cache.clear()
+        for table in LOOKUP_CACHES.values():
+            table.all()  # load the lookup tables outside the measured requests
+        registry.reset()
+        self.staff = Client()
+        self.staff.force_login(User.objects.create_user('ops', password='x', is_staff=True))
+
+    def scrape(self):
+        response = self.staff.get('/metrics')
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        return response.content.decode()
+
+    def test_sql_cache_and_latency_are_labelled_by_view_and_app(self):
+        url = f'/api/catalog/variants/{self.variant.pk}/'
+        self.client.get(url)
+        self.client.get(url)
+        text = self.scrape()
+
+        labels = 'app="catalog",view="catalog.views.VariantDetailView"'
+        self.assertIn(f'pharma_http_requests_total{{{labels},status="2xx"}} 2', text)
+        self.assertIn(f'pharma_http_response_seconds_count{{{labels}}} 2', text)
+        # The cold request misses the card and reads the three lookup versions; the warm one hits the card
+        self.assertIn(f'pharma_cache_lookups_total{{{labels},result="hit"}} 4', text)
+        self.assertIn(f'pharma_cache_lookups_total{{{labels},result="miss"}} 1', text)
+        # 4 statements on the cold request, 2 on the warm one
+        self.assertIn(f'pharma_db_queries_per_request_sum{{{labels}}} 6.0', text)
+        self.assertIn(f'pharma_db_slowest_query_seconds{{{labels},fingerprint="SELECT ', text)
+
+    @override_settings(METRICS_SAMPLE_RATE=0)
+    def test_unsampled_requests_are_only_timed(self):
+        self.client.get('/api/catalog/search/', {'q': 'pan'})
+        text = self.scrape()
+        self.assertIn('pharma_http_requests_total{app="catalog",view="catalog.views.VariantSearchView",status="2xx"} 1',
+                      text)
+        self.assertNotIn('pharma_sampled_requests_total{', text)
+
+    def test_endpoint_is_staff_only_without_a_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        self.client.force_login(User.objects.create_user('customer', password='x'))
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_endpoint_requires_the_token_when_set(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer sécret').status_code, 403)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer secret').status_code, 200)
@@ -1,3 +1,21 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import Address, UserProfile
+
+
+@admin.register(UserProfile)
+class UserProfileAdmin(admin.ModelAdmin):
+    # __str__ falls back to user.username
+    list_display = ('__str__', 'user', 'phone', 'role', 'default_language')
+    list_select_related = ('user',)
+    list_filter = ('role',)
+    search_fields = ('full_name', 'phone', 'user__username')
+    raw_id_fields = ('user',)
+
+
+@admin.register(Address)
+class AddressAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'user', 'governorate', 'district', 'is_default')
+    list_select_related = ('user',)
+    search_fields = ('city', 'street', 'user__username')
+    raw_id_fields = ('user',)